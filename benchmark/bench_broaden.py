@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+bench_broaden.py
+Speed and accuracy of the stick broadening in pysub/broaden.py, checked against the example curves.
+
+"time" broadens random stick spectra onto grids of up to 10^5 points and compares direct
+evaluation, FFT convolution and the method picked by "auto"; the error of the FFT method is
+reported relative to the highest peak of the direct result.
+"check" recovers the sticks of every Multiwfn curve in the example folder by least squares
+(Lorentzian line shape, one FWHM shared by all sticks), broadens them again with
+pysub.broaden and reports the largest difference from the Multiwfn curve. It exits with
+status 1 when a difference exceeds the tolerance, so it can be used in CI.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+Usage:
+    python benchmark/bench_broaden.py time
+    python benchmark/bench_broaden.py time --sticks 1000 5000 --points 100000 --fwhm 8 1
+    python benchmark/bench_broaden.py check
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pysub.broaden import PROFILES, broaden, lorentzian
+
+# example 文件夹
+EXAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "example")
+
+
+def best_time(func, repeat):
+    """运行 repeat 次，返回最短的时间以及最后一次的结果"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def run_time(args):
+    """对不同的谱线数、网格点数、线型和半高全宽计时"""
+    rng = np.random.default_rng(0)
+    print(f"{'sticks':>7}{'points':>8}{'profile':>14}{'fwhm':>6}{'direct ms':>11}{'fft ms':>9}{'auto ms':>9}"
+          f"{'fft error':>11}")
+    for sticks in args.sticks:
+        positions = rng.uniform(0, 4000, sticks)
+        intensities = rng.exponential(100, sticks)
+        for points in args.points:
+            grid = np.linspace(0, 4000, points)
+            for profile in args.profiles:
+                for fwhm in args.fwhm:
+                    direct_time, direct = best_time(
+                        lambda: broaden(positions, intensities, grid, profile, fwhm, method="direct"), args.repeat)
+                    fft_time, fft = best_time(
+                        lambda: broaden(positions, intensities, grid, profile, fwhm, method="fft"), args.repeat)
+                    auto_time, _ = best_time(lambda: broaden(positions, intensities, grid, profile, fwhm),
+                                             args.repeat)
+                    error = np.abs(fft - direct).max() / direct.max()
+                    print(f"{sticks:>7}{points:>8}{profile:>14}{fwhm:>6g}{direct_time * 1000:>11.1f}"
+                          f"{fft_time * 1000:>9.1f}{auto_time * 1000:>9.1f}{error:>11.1e}")
+    return 0
+
+
+def fit_intensities(x, y, centers, fwhm):
+    """给定谱线的位置和半高全宽，用线性最小二乘得到强度，返回强度以及拟合的曲线"""
+    shape = lorentzian(x[:, None] - centers[None, :], fwhm)
+    intensities = np.linalg.lstsq(shape, y, rcond=None)[0]
+    return intensities, shape @ intensities
+
+
+def recover_sticks(x, y, fwhm=10.0, rounds=20, tolerance=1e-6, step=1e-4):
+    """
+    用最小二乘法从洛伦兹展宽的曲线中得到谱线
+
+    Notes:
+        以曲线的局部极大值作为初始的谱线，用 Gauss-Newton 方法拟合所有谱线的位置以及共同的半高全宽，
+        强度总是由线性最小二乘得到 (variable projection)，Jacobian 由差分计算；
+        残差仍然较大时，在残差最大处加入一条新的谱线 (被相邻的峰掩盖的谱线)，再重新拟合
+
+    Args:
+        x(ndarray): 曲线的 x 值
+        y(ndarray): 曲线的 y 值
+        fwhm(float): 半高全宽的初始值
+        rounds(int): 最多加入的谱线数
+        tolerance(float): 残差相对于最高峰的阈值
+        step(float): 差分的步长
+
+    Returns:
+        tuple(ndarray, ndarray, float): 谱线的位置、强度以及半高全宽
+    """
+    peaks = np.flatnonzero((y[1:-1] > y[:-2]) & (y[1:-1] >= y[2:])) + 1
+    params = np.append(x[peaks].astype(np.float64), fwhm)
+    for round_index in range(rounds + 1):
+        if round_index:
+            params = np.insert(params, -1, x[np.argmax(np.abs(y - model))])
+        for _ in range(30):
+            intensities, model = fit_intensities(x, y, params[:-1], params[-1])
+            jacobian = np.empty((len(x), len(params)))
+            for index in range(len(params)):
+                shifted = params.copy()
+                shifted[index] += step
+                jacobian[:, index] = (fit_intensities(x, y, shifted[:-1], shifted[-1])[1] - model) / step
+            delta = np.linalg.lstsq(jacobian, y - model, rcond=None)[0]
+            params = params + delta
+            if np.abs(delta).max() < 1e-9:
+                break
+        intensities, model = fit_intensities(x, y, params[:-1], params[-1])
+        if np.abs(y - model).max() < tolerance * y.max():
+            break
+    return params[:-1], intensities, params[-1]
+
+
+def run_check(args):
+    """
+    从 example 文件夹中的曲线得到谱线，再用 pysub.broaden 展宽，与原来的曲线比较
+
+    Returns:
+        int: 超出误差时为 1，否则为 0
+    """
+    failures = 0
+    print(f"{'curve':<18}{'sticks':>7}{'fwhm':>11}{'direct error':>14}{'fft error':>12}{'fit s':>7}")
+    for file_path in sorted(glob.glob(os.path.join(args.folder, "*.txt"))):
+        data = np.loadtxt(file_path)
+        x, y = data[:, 0], data[:, 1]
+        start = time.perf_counter()
+        centers, intensities, fwhm = recover_sticks(x, y)
+        elapsed = time.perf_counter() - start
+        # Multiwfn 的网格为降序，展宽在升序的网格上进行
+        grid = np.sort(x)
+        order = np.argsort(x)
+        errors = []
+        for method in ("direct", "fft"):
+            curve = broaden(centers, intensities, grid, "lorentzian", fwhm, method=method)
+            errors.append(np.abs(curve - y[order]).max() / y.max())
+        if errors[0] > args.tolerance or errors[1] > args.fft_tolerance:
+            failures += 1
+        print(f"{os.path.basename(file_path):<18}{len(centers):>7}{fwhm:>11.6f}{errors[0]:>14.1e}{errors[1]:>12.1e}"
+              f"{elapsed:>7.1f}")
+    print("Check failed." if failures else "All curves reproduced.")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speed and accuracy of the stick broadening.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    time_parser = commands.add_parser("time", help="Time direct evaluation against FFT convolution")
+    time_parser.add_argument("--sticks", type=int, nargs="+", default=[100, 1000, 5000],
+                             help="Numbers of sticks (default: 100 1000 5000)")
+    time_parser.add_argument("--points", type=int, nargs="+", default=[3000, 100000],
+                             help="Numbers of grid points (default: 3000 100000)")
+    time_parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=["lorentzian", "gaussian"],
+                             help="Line shapes (default: lorentzian gaussian)")
+    time_parser.add_argument("--fwhm", type=float, nargs="+", default=[8.0], help="FWHM values (default: 8)")
+    time_parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per case (default: 3)")
+
+    check_parser = commands.add_parser("check", help="Reproduce the example curves from recovered sticks")
+    check_parser.add_argument("--folder", default=EXAMPLE_DIR, help="Folder of the Multiwfn curves (default: example)")
+    check_parser.add_argument("--tolerance", type=float, default=1e-5,
+                              help="Largest error of direct evaluation relative to the highest peak (default: 1e-5)")
+    check_parser.add_argument("--fft-tolerance", type=float, default=1e-3,
+                              help="Largest error of FFT convolution relative to the highest peak (default: 1e-3)")
+
+    args = parser.parse_args()
+    sys.exit(run_time(args) if args.command == "time" else run_check(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+bench_decimate.py
+Compare full and decimated renders of a high-resolution spectrum.
+
+The same synthetic spectrum is drawn with and without decimate() on an Agg canvas of the
+size used by one subplot. Both renders are compared against an exact render with matplotlib's
+own path simplification turned off, so the pixel difference of the decimated curve can be read
+against the difference matplotlib already introduces by default. The script also reports the
+render time and the size of the PDF and SVG output.
+
+The check compares the curves rather than single pixels, because antialiasing on the steep
+flanks of the peaks changes many pixels by a little: every solid pixel of one render must lie
+within --max-distance pixels of an inked pixel of the other, in both directions. Decimation
+keeps the minimum and maximum of every pixel column, so the decimated curve stays within one
+pixel of the exact render, the same as matplotlib's default simplification; dropping points
+without keeping the extremes shaves the peaks and fails. The script exits with status 1 when
+the decimated render is further away than --max-distance, so it can be used in CI.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+Usage:
+    python benchmark/bench_decimate.py
+    python benchmark/bench_decimate.py --points 5000000 --width 3 --dpi 400
+    python benchmark/bench_decimate.py --max-distance 1
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pysub.subplots import decimate
+
+# 视为实心墨迹以及任意墨迹的像素值上限 (白色背景上的黑色曲线，取 RGB 中的最小值)
+SOLID_INK = 64
+ANY_INK = 224
+
+
+def synthetic_spectrum(points):
+    """
+    生成一个降序排列、带有尖锐吸收峰和噪声的高分辨率光谱
+    """
+    rng = np.random.default_rng(0)
+    x = np.linspace(4000, 0, points)
+    y = rng.normal(0, 5, points)
+    for center, height in zip(rng.uniform(100, 3900, 60), rng.uniform(100, 3000, 60)):
+        y += height / (1 + ((x - center) / 1.5) ** 2)
+    return x, y
+
+
+def render(x, y, width, dpi, fmt, simplify=True):
+    """
+    在一个子图大小的画布上绘制曲线，返回绘制所用的时间和输出的内容
+    """
+    matplotlib.rcParams["path.simplify"] = simplify
+    fig = plt.figure(figsize=(width, width * 0.75), dpi=dpi)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_axis_off()
+    ax.set_xlim(0, 4000)
+    ax.set_ylim(-50, 3500)
+    start = time.perf_counter()
+    ax.plot(x, y, linewidth=1.3, color="black")
+    buffer = io.BytesIO()
+    if fmt == "rgba":
+        fig.canvas.draw()
+        output = np.asarray(fig.canvas.buffer_rgba()).copy()
+    else:
+        fig.savefig(buffer, format=fmt)
+        output = buffer.getvalue()
+    elapsed = time.perf_counter() - start
+    plt.close(fig)
+    return elapsed, output
+
+
+def dilate(mask, radius):
+    """
+    将二值图像向周围扩展 radius 个像素 (切比雪夫距离)
+    """
+    mask = mask.copy()
+    for _ in range(radius):
+        grown = mask.copy()
+        grown[1:] |= mask[:-1]
+        grown[:-1] |= mask[1:]
+        mask = grown.copy()
+        mask[:, 1:] |= grown[:, :-1]
+        mask[:, :-1] |= grown[:, 1:]
+    return mask
+
+
+def ink_distance(pixels, reference, max_radius=8):
+    """
+    pixels 中每一个实心像素到 reference 中最近的墨迹的最大距离 (像素)
+
+    Returns:
+        tuple(int, int): 最大距离，以及超过 max_radius 时仍然没有被覆盖的实心像素数 (否则为 0)
+    """
+    solid = pixels[..., :3].min(axis=-1) < SOLID_INK
+    ink = reference[..., :3].min(axis=-1) < ANY_INK
+    for radius in range(max_radius + 1):
+        uncovered = solid & ~ink
+        if not uncovered.any():
+            return radius, 0
+        ink = dilate(ink, 1)
+    return max_radius + 1, int(uncovered.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and decimated renders.")
+    parser.add_argument("--points", type=int, default=1000000, help="Number of points (default: 1000000)")
+    parser.add_argument("--width", type=float, default=5, help="Width of the subplot in inches (default: 5)")
+    parser.add_argument("--dpi", type=int, default=300, help="Resolution in dpi (default: 300)")
+    parser.add_argument("--max-distance", type=int, default=2,
+                        help="Largest distance in pixels between the decimated and the exact curve (default: 2)")
+    args = parser.parse_args()
+
+    x, y = synthetic_spectrum(args.points)
+    n_bins = int(np.ceil(args.width * args.dpi))
+    start = time.perf_counter()
+    x_small, y_small = decimate(x, y, n_bins, [0, 4000])
+    print(f"decimate: {len(x)} -> {len(x_small)} points in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    _, exact = render(x, y, args.width, args.dpi, "rgba", simplify=False)
+    distance = 0
+    for label, (x_plot, y_plot) in (("full", (x, y)), ("decimated", (x_small, y_small))):
+        elapsed, pixels = render(x_plot, y_plot, args.width, args.dpi, "rgba")
+        different = np.any(np.abs(pixels.astype(np.int16) - exact.astype(np.int16)) > 8, axis=-1)
+        # 两个方向都要检查：曲线多出来的部分以及缺少的部分 (例如被削掉的峰)
+        (forward, extra), (backward, missing) = ink_distance(pixels, exact), ink_distance(exact, pixels)
+        print(f"raster, {label}: {elapsed * 1000:.1f} ms, {different.sum()} of {different.size} pixels "
+              f"differ from the exact render ({different.mean() * 100:.3f} %), curve within "
+              f"{max(forward, backward)} px ({extra + missing} solid pixels further than 8 px)")
+        if label == "decimated":
+            distance = max(forward, backward)
+
+    for fmt in ("pdf", "svg"):
+        full_time, full = render(x, y, args.width, args.dpi, fmt)
+        small_time, small = render(x_small, y_small, args.width, args.dpi, fmt)
+        print(f"{fmt}: {full_time * 1000:.1f} ms, {len(full) / 1024:.0f} KiB -> "
+              f"{small_time * 1000:.1f} ms, {len(small) / 1024:.0f} KiB")
+
+    if distance > args.max_distance:
+        print(f"Check failed: the decimated curve is {distance} px from the exact render "
+              f"(allowed: {args.max_distance} px).")
+        return 1
+    print(f"Decimated curve within {args.max_distance} px of the exact render.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
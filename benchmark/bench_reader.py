@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+bench_reader.py
+Benchmark of read_multiwfn against the original pandas reader.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+Usage:
+    python benchmark/bench_reader.py
+    python benchmark/bench_reader.py --rows 1000000 5000000 --repeat 3
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pysub.subplots import read_multiwfn
+from synthetic import write_spectrum
+
+# example 文件夹的路径
+EXAMPLE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "example")
+
+
+def read_pandas(file_path):
+    """原来 read_path 读取 txt 文件的方式"""
+    return pd.read_csv(file_path, delim_whitespace=True, header=None)
+
+
+def bench(file_path, repeat):
+    """
+    分别计时 pandas、read_multiwfn 以及 float32 模式的 read_multiwfn，返回每一种方式的最短时间
+    """
+    readers = [
+        ("pandas", lambda: read_pandas(file_path)),
+        ("read_multiwfn", lambda: read_multiwfn(file_path)),
+        ("read_multiwfn(float32)", lambda: read_multiwfn(file_path, dtype=np.float32)),
+    ]
+    return [(name, min(timeit.repeat(reader, number=1, repeat=repeat))) for name, reader in readers]
+
+
+def report(label, results):
+    """在屏幕上打印一个文件的计时结果"""
+    baseline = results[0][1]
+    print(label)
+    for name, seconds in results:
+        print(f"  {name:<24}{seconds * 1000:>12.2f} ms{baseline / seconds:>10.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the Multiwfn txt reader.")
+    parser.add_argument("--rows", type=int, nargs="*", default=[100000, 1000000, 5000000],
+                        help="Row counts of the synthetic spectra (default: 100000 1000000 5000000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of repeats, the best one is kept")
+    args = parser.parse_args()
+
+    for file_path in sorted(glob.glob(os.path.join(EXAMPLE_FOLDER, "*.txt"))):
+        report(os.path.basename(file_path), bench(file_path, args.repeat))
+
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in args.rows:
+            file_path = os.path.join(folder, f"synthetic_{rows}.txt")
+            write_spectrum(file_path, rows)
+            report(f"synthetic, {rows} rows", bench(file_path, args.repeat))
+            os.remove(file_path)
+
+
+if __name__ == "__main__":
+    main()
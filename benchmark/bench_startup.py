@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+bench_startup.py
+Startup time of pySubplots.
+
+Runs "python -X importtime" on pysub.subplots in a fresh interpreter and reports the
+cumulative import time together with the heaviest imported modules, then times the
+"--version" and "--help" commands end to end. Heavy modules such as proplot, pandas and
+wx should not appear in the import list, they are only imported when they are needed.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+Usage:
+    python benchmark/bench_startup.py
+    python benchmark/bench_startup.py --repeat 10 --top 15
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# 项目的根目录
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# 以命令行参数运行 main() 的代码
+MAIN_CODE = "import sys; sys.argv = ['subplots'] + sys.argv[1:]; from pysub.subplots import main; main()"
+
+
+def import_times(module):
+    """
+    使用 python -X importtime 导入一个模块，返回每一个被导入的模块的累计导入时间
+
+    Returns:
+        list[tuple[str, float]]: 由模块名和累计导入时间 (秒) 组成的列表
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             cwd=ROOT, capture_output=True, text=True, check=True)
+    times = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times.append((name.strip(), int(cumulative) / 1e6))
+    return times
+
+
+def command_time(arguments, repeat):
+    """
+    在新的解释器中运行 main()，返回多次运行中最短的时间 (秒)
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", MAIN_CODE] + arguments, cwd=ROOT,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of pySubplots.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of repeats, the best one is kept")
+    parser.add_argument("--top", type=int, default=10, help="Number of heaviest imports to show")
+    args = parser.parse_args()
+
+    times = import_times("pysub.subplots")
+    total = dict(times).get("pysub.subplots", 0.0)
+    print(f"import pysub.subplots: {total * 1000:.1f} ms")
+    # 只显示顶层的包，避免同一个包的子模块重复出现
+    top_level = [(name, seconds) for name, seconds in times if "." not in name and name != "pysub"]
+    for name, seconds in sorted(top_level, key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {name:<24}{seconds * 1000:>10.1f} ms")
+    heavy = [name for name, _ in top_level if name in ("proplot", "matplotlib", "pandas", "wx")]
+    print(f"heavy modules imported at startup: {', '.join(heavy) if heavy else 'none'}")
+
+    for arguments in (["--version"], ["--help"]):
+        print(f"subplots {' '.join(arguments)}: {command_time(arguments, args.repeat) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
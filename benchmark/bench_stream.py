@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+bench_stream.py
+Peak memory of the streaming reader against reading the whole file, as the input grows.
+
+Every measurement runs in a fresh child process, so its peak RSS (ru_maxrss) belongs to one
+reader only. The whole-file reader grows linearly with the file, while stream_curve stays flat.
+Unix only, because it relies on the resource module.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+Usage:
+    python benchmark/bench_stream.py
+    python benchmark/bench_stream.py --rows 1000000 10000000 30000000 --block 16
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pysub.subplots import clip_range, decimate, read_multiwfn, stream_curve
+from synthetic import write_spectrum
+
+# 绘图时的 x 轴范围以及像素列数量，与 4000 cm^-1 的红外光谱、10 英寸 2 列 400 dpi 的图片相当
+X_RANGE = [500, 3500]
+N_BINS = 2000
+
+
+def child(mode, file_path, block_size):
+    """在子进程中读取一次文件，打印用时、保留的点数以及峰值 RSS (MB)"""
+    start = time.perf_counter()
+    if mode == "full":
+        data = read_multiwfn(file_path)
+        x, y = clip_range(data[:, 0], data[:, 1], X_RANGE)
+        x, y = decimate(x, y, N_BINS, X_RANGE)
+    else:
+        x, y = stream_curve(file_path, X_RANGE, N_BINS, block_size=block_size)
+    elapsed = time.perf_counter() - start
+    # Linux 上 ru_maxrss 的单位为 KB，macOS 上为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+    print(f"{elapsed} {len(x)} {peak}")
+
+
+def measure(mode, file_path, block_size):
+    """启动一个子进程测量一种读取方式，返回 (用时, 点数, 峰值 RSS)"""
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, file_path,
+                             "--block", str(block_size / 1024 / 1024)],
+                            check=True, capture_output=True, text=True).stdout
+    elapsed, points, peak = output.split()
+    return float(elapsed), int(points), float(peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of the streaming reader.")
+    parser.add_argument("--rows", type=int, nargs="*", default=[100000, 1000000, 5000000, 10000000],
+                        help="Row counts of the synthetic spectra (default: 100000 1000000 5000000 10000000)")
+    parser.add_argument("--block", type=float, default=16, help="Block size of the streaming reader in MB")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    block_size = int(args.block * 1024 * 1024)
+
+    if args.child:
+        child(args.child[0], args.child[1], block_size)
+        return
+
+    print(f"x range {X_RANGE}, {N_BINS} pixel columns, block {args.block:g} MB")
+    print(f"{'rows':>12}{'file MB':>10}{'full MB':>10}{'full s':>9}{'stream MB':>11}{'stream s':>10}{'points':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in args.rows:
+            file_path = os.path.join(folder, f"{rows}.txt")
+            write_spectrum(file_path, rows)
+            size = os.path.getsize(file_path) / 1024 ** 2
+            full_time, _, full_peak = measure("full", file_path, block_size)
+            stream_time, points, stream_peak = measure("stream", file_path, block_size)
+            print(f"{rows:>12}{size:>10.1f}{full_peak:>10.1f}{full_time:>9.2f}"
+                  f"{stream_peak:>11.1f}{stream_time:>10.2f}{points:>8}")
+            os.remove(file_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+bench_suite.py
+Benchmark suite of the reading and drawing pipeline, with a JSON report and regression check.
+
+"run" generates synthetic spectra with synthetic.py and times read_path, read_toml,
+auto_layout, draw_spectrum and save_figure (once per output format). Every case is timed
+several times and the best wall time is kept; one more run under tracemalloc records the
+peak memory allocated by Python and numpy. The results are written as JSON.
+"compare" reads two reports and flags the cases that became slower or use more memory.
+It exits with status 1 when there is a regression, so it can be used in CI.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+Usage:
+    python benchmark/bench_suite.py run --out base.json
+    python benchmark/bench_suite.py run --points 1000 1000000 10000000 --panels 1 200 --out new.json
+    python benchmark/bench_suite.py compare base.json new.json --threshold 0.2
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pysub.subplots import SubConfig, build_figure, draw_spectrum, read_path, read_toml, save_figure
+from synthetic import write_spectrum, write_toml
+
+# auto_layout 的一次计时中调用的次数
+LAYOUT_CALLS = 1000
+
+
+def measure(func, repeat):
+    """
+    对一个用例计时，保留最短的时间，再在 tracemalloc 下运行一次得到峰值内存
+
+    Args:
+        func(callable): 需要计时的函数
+        repeat(int): 计时的次数
+
+    Returns:
+        dict: wall 为最短的时间，mean 为平均时间 (秒)，peak_mb 为峰值内存 (MB)
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return dict(wall=min(times), mean=sum(times) / len(times), repeat=repeat, peak_mb=peak / 1024 ** 2)
+
+
+def build_cases(args, folder):
+    """
+    生成所有用例所需要的数据，并返回 (用例名称, 函数, 计时次数) 组成的列表
+    """
+    cases = []
+    for points in args.points:
+        data_path = os.path.join(folder, f"spectrum_{points}_0.txt")
+        if not os.path.exists(data_path):
+            write_spectrum(data_path, points)
+        # 数据很大时减少计时的次数
+        repeat = args.repeat if points < 5000000 else 1
+        cases.append((f"read_path[points={points}]", lambda path=data_path: read_path(path), repeat))
+
+    for panels in args.panels:
+        toml_file = write_toml(folder, panels, args.toml_points)
+        cases.append((f"read_toml[panels={panels},points={args.toml_points}]",
+                      lambda path=toml_file: read_toml(path), args.repeat))
+        cases.append((f"auto_layout[panels={panels}]x{LAYOUT_CALLS}",
+                      lambda n=panels: [SubConfig(sub_num=n).auto_layout() for _ in range(LAYOUT_CALLS)],
+                      args.repeat))
+
+    out_dir = os.path.join(folder, "figures")
+    os.makedirs(out_dir, exist_ok=True)
+    for panels in args.draw_panels:
+        spectrum_list = read_toml(write_toml(folder, panels, args.toml_points))
+        for fmt in args.formats:
+            config = SubConfig(sub_num=panels, save_format=fmt)
+            save_path = os.path.join(out_dir, f"figure.{fmt}")
+            cases.append((f"draw_spectrum[{fmt},panels={panels},points={args.toml_points}]",
+                          lambda c=config, s=spectrum_list, p=save_path: draw_spectrum(c, s, save_path=p),
+                          args.repeat))
+    return cases
+
+
+def bench_savefig(args, folder, panels):
+    """
+    在同一个已经创建好的图像上分别对每一种格式的 save_figure 计时
+
+    Returns:
+        dict: 用例名称到计时结果的映射
+    """
+    import proplot as pplt
+
+    spectrum_list = read_toml(write_toml(folder, panels, args.toml_points))
+    fig, _ = build_figure(SubConfig(sub_num=panels), spectrum_list)
+    try:
+        results = {}
+        for fmt in args.formats:
+            config = SubConfig(sub_num=panels, save_format=fmt)
+            save_path = os.path.join(folder, "figures", f"saved.{fmt}")
+            name = f"savefig[{fmt},panels={panels},points={args.toml_points}]"
+            results[name] = measure(lambda: save_figure(fig, config, save_path), args.repeat)
+        return results
+    finally:
+        pplt.close(fig)
+
+
+def git_commit():
+    """当前仓库的 commit，不在 git 仓库中时为 None"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    """执行所有用例，并将结果写入 JSON 文件"""
+    results = {}
+    with tempfile.TemporaryDirectory() as temp:
+        folder = args.data or temp
+        os.makedirs(folder, exist_ok=True)
+        for name, func, repeat in build_cases(args, folder):
+            try:
+                result = measure(func, repeat)
+            except Exception as e:
+                # 例如没有安装 proplot 时，绘图的用例记录为失败，其他用例继续执行
+                result = dict(error=f"{type(e).__name__}: {e}")
+            results[name] = result
+            print_case(name, result)
+        for panels in args.draw_panels:
+            try:
+                saved = bench_savefig(args, folder, panels)
+            except Exception as e:
+                name = f"savefig[panels={panels},points={args.toml_points}]"
+                saved = {name: dict(error=f"{type(e).__name__}: {e}")}
+            for name, result in saved.items():
+                results[name] = result
+                print_case(name, result)
+
+    report = dict(
+        meta=dict(time=datetime.now().isoformat(timespec="seconds"), commit=git_commit(),
+                  python=platform.python_version(), numpy=np.__version__, platform=platform.platform()),
+        cases=results,
+    )
+    with open(args.out, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.out}")
+    return 0
+
+
+def print_case(name, result):
+    """在屏幕上打印一个用例的结果"""
+    if "error" in result:
+        print(f"{name:<56} error: {result['error']}")
+    else:
+        print(f"{name:<56}{result['wall'] * 1000:>12.2f} ms{result['peak_mb']:>10.1f} MB")
+
+
+def compare(args):
+    """
+    比较两次运行的结果，时间或者峰值内存超过阈值的用例记为退化
+
+    Returns:
+        int: 有退化时为 1，否则为 0
+    """
+    with open(args.base, encoding="utf-8") as file:
+        base = json.load(file)["cases"]
+    with open(args.new, encoding="utf-8") as file:
+        new = json.load(file)["cases"]
+
+    regressions = []
+    print(f"{'case':<56}{'base ms':>11}{'new ms':>11}{'time':>8}{'memory':>9}")
+    for name in sorted(set(base) & set(new)):
+        old, current = base[name], new[name]
+        if "error" in old or "error" in current:
+            continue
+        time_ratio = current['wall'] / old['wall'] if old['wall'] > 0 else 1.0
+        memory_ratio = current['peak_mb'] / old['peak_mb'] if old['peak_mb'] > 0 else 1.0
+        # 用时很短的用例容易受到噪声影响，需要同时超过绝对阈值
+        slower = time_ratio > 1 + args.threshold and current['wall'] - old['wall'] > args.min_time
+        larger = memory_ratio > 1 + args.memory_threshold and current['peak_mb'] - old['peak_mb'] > args.min_memory
+        flag = "  REGRESSION" if slower or larger else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<56}{old['wall'] * 1000:>11.2f}{current['wall'] * 1000:>11.2f}"
+              f"{time_ratio:>7.2f}x{memory_ratio:>8.2f}x{flag}")
+    for name in sorted(set(base) ^ set(new)):
+        print(f"{name:<56} only in {'base' if name in base else 'new'}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) found.")
+        return 1
+    print("No regression found.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite of pySubplots.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks and write a JSON report")
+    run_parser.add_argument("--out", default="bench.json", help="JSON report (default: bench.json)")
+    run_parser.add_argument("--points", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                            help="Points of the spectra read by read_path (default: 1000 10000 100000 1000000)")
+    run_parser.add_argument("--panels", type=int, nargs="+", default=[1, 16, 200],
+                            help="Panel counts for read_toml and auto_layout (default: 1 16 200)")
+    run_parser.add_argument("--draw-panels", type=int, nargs="+", default=[4, 16],
+                            help="Panel counts for draw_spectrum and save_figure (default: 4 16)")
+    run_parser.add_argument("--toml-points", type=int, default=10000,
+                            help="Points of every spectrum in the toml files (default: 10000)")
+    run_parser.add_argument("--formats", nargs="+", default=["png", "pdf", "svg"],
+                            help="Output formats (default: png pdf svg)")
+    run_parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per case (default: 5)")
+    run_parser.add_argument("--data", default=None, metavar="DIR",
+                            help="Keep the generated spectra in DIR and reuse them in later runs")
+
+    compare_parser = commands.add_parser("compare", help="Compare two JSON reports and flag regressions")
+    compare_parser.add_argument("base", help="Report of the baseline")
+    compare_parser.add_argument("new", help="Report to check")
+    compare_parser.add_argument("--threshold", type=float, default=0.2,
+                                help="Relative slowdown counted as a regression (default: 0.2)")
+    compare_parser.add_argument("--memory-threshold", type=float, default=0.1,
+                                help="Relative growth of peak memory counted as a regression (default: 0.1)")
+    compare_parser.add_argument("--min-time", type=float, default=0.002,
+                                help="Ignore slowdowns smaller than this many seconds (default: 0.002)")
+    compare_parser.add_argument("--min-memory", type=float, default=1.0,
+                                help="Ignore memory growth smaller than this many MB (default: 1)")
+
+    args = parser.parse_args()
+    sys.exit(run(args) if args.command == "run" else compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+synthetic.py
+Generator of synthetic Multiwfn-style spectra and toml files for the benchmarks.
+
+Every spectrum is a descending frequency axis from 4000 to 0 with Lorentzian absorption
+peaks and a little noise, written in the same fixed-width format as Multiwfn. The data is
+generated and written in chunks, so files of 10^7 points and more need little memory.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+Usage:
+    python benchmark/synthetic.py OUT_DIR --points 1000000 --panels 16
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import argparse
+import os
+
+import numpy as np
+
+# Multiwfn 输出的 txt 文件的格式
+MULTIWFN_FORMAT = ["%13.5f", "%18.8E"]
+# proplot 的颜色，依次用于每一个子图
+COLORS = ["pink9", "blue9", "teal9", "orange9", "violet9", "green9"]
+
+
+def spectrum_chunks(points, seed=0, chunk=1000000):
+    """
+    分块生成一个降序排列的光谱
+
+    Args:
+        points(int): 光谱的点数
+        seed(int): 随机数种子，相同的种子得到相同的光谱
+        chunk(int): 每一块的点数
+
+    Yields:
+        tuple(ndarray, ndarray): 一块光谱的 x 值和 y 值
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(100, 3900, 40)
+    heights = rng.uniform(100, 3000, 40)
+    widths = rng.uniform(2, 30, 40)
+    step = 4000 / max(points - 1, 1)
+    for start in range(0, points, chunk):
+        stop = min(start + chunk, points)
+        x = 4000 - np.arange(start, stop) * step
+        y = rng.normal(0, 5, stop - start)
+        for center, height, width in zip(centers, heights, widths):
+            y += height / (1 + ((x - center) / width) ** 2)
+        yield x, y
+
+
+def write_spectrum(file_path, points, seed=0):
+    """
+    生成一个与 Multiwfn 输出格式相同的 txt 文件
+
+    Args:
+        file_path(str): 生成的 txt 文件路径
+        points(int): 光谱的点数
+        seed(int): 随机数种子
+    """
+    with open(file_path, "w") as file:
+        for x, y in spectrum_chunks(points, seed):
+            np.savetxt(file, np.column_stack((x, y)), fmt=MULTIWFN_FORMAT)
+
+
+def write_toml(folder, panels, points, files=None):
+    """
+    在 folder 中生成一个包含 panels 个 [[file]] 的 toml 文件以及它引用的数据文件
+
+    Notes:
+        数据文件按照 "spectrum_{points}_{seed}.txt" 命名，已经存在的文件直接复用，
+        因此多次生成同样大小的数据集时只需要写入一次
+
+    Args:
+        folder(str): 生成的文件所在的文件夹
+        panels(int): 子图的数量
+        points(int): 每一个光谱的点数
+        files(int): 不同数据文件的数量，子图依次循环使用这些文件，默认为 None，即每一个子图使用不同的文件
+
+    Returns:
+        str: 生成的 toml 文件路径
+    """
+    os.makedirs(folder, exist_ok=True)
+    files = min(files or panels, panels)
+    blocks = []
+    for panel in range(panels):
+        seed = panel % files
+        name = f"spectrum_{points}_{seed}.txt"
+        data_path = os.path.join(folder, name)
+        if not os.path.exists(data_path):
+            write_spectrum(data_path, points, seed)
+        blocks.append("\n".join([
+            "[[file]]",
+            f'path = "{name}"',
+            f'colors = "{COLORS[panel % len(COLORS)]}"',
+            'styles = "-"',
+            f'legend = "Spectrum {panel + 1}"',
+            "xlim = [0, 4000, 500]",
+            "ylim = [0, 3000, 1000]",
+            'xlabel = "Frequency (in cm^-1)"',
+            'ylabel = "Absorption (in L/mol/cm)"',
+            "iszero = 0",
+            "islegend = 1",
+        ]))
+
+    toml_file = os.path.join(folder, f"synthetic_{panels}x{points}.toml")
+    with open(toml_file, "w", encoding="utf-8") as file:
+        file.write("\n\n".join(blocks) + "\n")
+    return toml_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Multiwfn-style spectra and a toml file.")
+    parser.add_argument("out", help="Folder of the generated files")
+    parser.add_argument("--points", type=int, default=100000, help="Points of every spectrum (default: 100000)")
+    parser.add_argument("--panels", type=int, default=4, help="Number of subplots (default: 4)")
+    parser.add_argument("--files", type=int, default=None,
+                        help="Number of distinct data files, reused across subplots (default: one per subplot)")
+    args = parser.parse_args()
+    print(write_toml(args.out, args.panels, args.points, args.files))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+"""
+batch.py
+Headless, non-interactive rendering of toml files.
+
+"pysub render a.toml b.toml --out DIR" renders every input without prompting and without
+creating a wx.App, so it can run in CI or on render nodes. The SubConfig settings come from
+the [config] table of each toml file and can be overridden by command line flags.
+With --watch a single toml file is re-rendered whenever it or its data files change.
+With --processes the toml files are spread across a process pool, where every worker
+imports proplot once and renders many jobs. Parsed data files are kept in a MemoryCache
+shared by all toml files of the run (one per worker), so a data file referenced by many
+toml files is parsed once. With --render-cache a toml file whose settings, styles and data
+files have not changed since an earlier run is not rendered again: its figures are copied
+from the RenderCache.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+@author:
+Kimariyb (kimariyb@163.com)
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import argparse
+import os
+import signal
+import sys
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from importlib import metadata
+
+import numpy as np
+import toml
+
+from pysub.cache import MemoryCache, RenderCache, default_cache_dir
+from pysub.profiler import add_profile_arguments, profile_from_args, stage
+from pysub.subplots import (CONFIG_KEYS, SubConfig, add_config_arguments, add_read_arguments, config_options,
+                            draw_spectrum, load_spectra, parse_config, read_options, resolve_source,
+                            spectrum_from_block, __version__)
+
+# Spectrum 中决定曲线样式的属性，与数据一起决定绘制结果
+STYLE_SLOTS = ('x_limit', 'y_limit', 'x_label', 'y_label', 'colors', 'line_style', 'legend_text', 'is_zero',
+               'is_legend')
+# 版本会影响绘制结果的包，升级之后不再复用之前的绘制结果
+RENDER_PACKAGES = ('proplot', 'matplotlib', 'numpy')
+
+
+class RenderResult:
+    """
+    一个 toml 文件的绘制结果
+
+    Attributes:
+        toml_file (str): toml 文件路径
+        save_names (list[str]): 每一种格式的图片保存路径，绘制失败时为 None
+        error (str): 绘制失败的原因，绘制成功时为 None
+        elapsed (float): 绘制所用的时间，单位为秒
+        cached (bool): 图片是否直接从 RenderCache 中复制，没有重新绘制
+    """
+
+    def __init__(self, toml_file, save_names=None, error=None, elapsed=0.0, cached=False):
+        self.toml_file = toml_file
+        self.save_names = save_names
+        self.error = error
+        self.elapsed = elapsed
+        self.cached = cached
+
+    @property
+    def ok(self):
+        """是否绘制成功"""
+        return self.error is None
+
+    def __str__(self):
+        if self.ok:
+            action = "Reused" if self.cached else "Rendered"
+            return f"{action}: {self.toml_file} -> {', '.join(self.save_names)} ({self.elapsed:.2f} s)"
+        return f"Failed: {self.toml_file} ({self.elapsed:.2f} s)\n{self.error}"
+
+
+def report(result):
+    """打印一个 toml 文件的绘制结果，绘制失败时打印到标准错误"""
+    print(result, file=sys.stdout if result.ok else sys.stderr)
+
+
+@contextmanager
+def time_limit(seconds):
+    """
+    限制代码块的运行时间，超时抛出 TimeoutError
+
+    Notes:
+        依赖 SIGALRM 信号，只能在主线程中使用；在没有 SIGALRM 的平台 (Windows) 上不限制运行时间
+
+    Args:
+        seconds(float): 运行时间的上限，为 None 时不限制
+    """
+    if not seconds or not hasattr(signal, 'SIGALRM'):
+        yield
+        return
+
+    def handler(signum, frame):
+        raise TimeoutError(f"Rendering timed out after {seconds} s")
+
+    previous = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def output_path(toml_file, out_dir, config):
+    """
+    得到 toml 文件所对应的图片路径，即 out_dir 中与 toml 文件同名的文件
+
+    Args:
+        toml_file(str): toml 文件路径
+        out_dir(str): 保存图片的文件夹
+        config(SubConfig): 一个 SubConfig 对象
+
+    Returns:
+        str: 图片的保存路径，有多种格式时为第一种格式的路径，save_figure() 会将扩展名替换为各个格式
+    """
+    stem = os.path.splitext(os.path.basename(toml_file))[0]
+    return os.path.join(out_dir, f"{stem}.{config.save_formats()[0]}")
+
+
+def output_collisions(toml_files):
+    """
+    找出会保存为同一个图片的 toml 文件，即不同文件夹中同名的 toml 文件 (例如 a/IR.toml 和 b/IR.toml)
+
+    Args:
+        toml_files(list[str]): toml 文件路径组成的集合
+
+    Returns:
+        dict: 图片的文件名 (不含扩展名) 到对应的所有 toml 文件的映射，只包含有多个 toml 文件的文件名
+    """
+    stems = {}
+    for toml_file in toml_files:
+        stem = os.path.normcase(os.path.splitext(os.path.basename(toml_file))[0])
+        paths = stems.setdefault(stem, [])
+        # 同一个 toml 文件重复出现时保存为同一个图片，不算冲突
+        if os.path.abspath(toml_file) not in map(os.path.abspath, paths):
+            paths.append(toml_file)
+    return {stem: paths for stem, paths in stems.items() if len(paths) > 1}
+
+
+def package_version(name):
+    """得到一个已安装的包的版本，没有安装时为 None"""
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def render_description(config, blocks, dtype=np.float64):
+    """
+    得到 RenderCache 的键所需要的描述，即除了数据文件的内容以外所有决定绘制结果的内容
+
+    Notes:
+        包括解析后的 SubConfig (包含排版、页大小和保存格式等，不包含保存路径)、每一个 [[file]] 表解析得到的 Spectrum 的样式
+        和展宽设置 (broaden 表)、读取数据的类型，以及 pySubplots 和 RENDER_PACKAGES 的版本
+
+    Args:
+        config(SubConfig): 一个 SubConfig 对象
+        blocks(list[dict]): toml 文件中的 [[file]] 表组成的集合
+        dtype: 读取数据的类型
+
+    Returns:
+        dict: 可以转换为 JSON 的描述
+    """
+    spectra = [spectrum_from_block(block) for block in blocks]
+    return dict(
+        config={key: getattr(config, key) for key in CONFIG_KEYS | {'sub_num'}},
+        spectra=[dict({slot: getattr(spectrum, slot) for slot in STYLE_SLOTS}, broaden=block.get('broaden'))
+                 for spectrum, block in zip(spectra, blocks)],
+        dtype=np.dtype(dtype).str,
+        versions=dict(pysub=__version__, **{name: package_version(name) for name in RENDER_PACKAGES}),
+    )
+
+
+def render_file(toml_file, out_dir, overrides=None, render_cache=None, force=False, **kwargs):
+    """
+    绘制一个 toml 文件，图片保存为 out_dir 中与 toml 文件同名的文件
+
+    Notes:
+        指定 render_cache 时，先根据设置、样式和数据文件的内容计算缓存的键，只读取 toml 文件和计算数据文件的哈希值，
+        不解析数据文件；命中缓存时直接复制缓存的图片，否则绘制后将图片写入缓存，写入缓存失败时只打印警告。
+
+    Args:
+        toml_file(str): toml 文件路径
+        out_dir(str): 保存图片的文件夹
+        overrides(dict): 覆盖 [config] 表的 SubConfig 关键字参数，默认为 None
+        render_cache(RenderCache): 绘制结果的缓存，默认为 None，即总是重新绘制
+        force(bool): 是否忽略 render_cache 中已有的结果重新绘制 (并替换缓存项)，默认为 False
+        **kwargs: 传递给 load_spectra() 的关键字参数
+
+    Returns:
+        tuple(list[str], bool): 每一种格式的图片保存路径，以及图片是否从 render_cache 中复制
+    """
+    with open(toml_file, 'r', encoding='utf-8') as file, stage("read_toml", path=str(toml_file)):
+        content = toml.load(file)
+    blocks = content['file']
+    folder = os.path.dirname(os.path.abspath(toml_file))
+    # [config] 表中的设置优先级低于命令行参数
+    options = parse_config(content.get('config', {}))
+    options.update(overrides or {})
+    config = SubConfig(sub_num=len(blocks), **options)
+    save_path = output_path(toml_file, out_dir, config)
+    stem = os.path.splitext(save_path)[0]
+
+    key = None
+    if render_cache is not None:
+        data_files = [resolve_source(block['path'], folder) for block in blocks]
+        try:
+            with stage("render_key", path=str(toml_file)):
+                key = render_cache.key(render_description(config, blocks, kwargs.get('dtype', np.float64)),
+                                       data_files)
+        except OSError:
+            # 数据文件不存在等情况，交给 load_spectra() 统一报告
+            key = None
+        if key is not None and not force:
+            save_names = render_cache.load(key, stem)
+            if save_names is not None:
+                return save_names, True
+
+    spectrum_list = load_spectra(blocks, folder, **kwargs)
+    save_names = draw_spectrum(config, spectrum_list, release=kwargs.get('lazy', False), save_path=save_path)
+    if key is not None:
+        try:
+            render_cache.store(key, stem, save_names)
+        except (OSError, ValueError) as e:
+            # 图片已经保存，缓存只影响之后的运行，写入失败 (例如磁盘已满或者没有权限) 时不算绘制失败
+            print(f"Warning: Failed to store {toml_file} in the render cache\n{type(e).__name__}: {e}", file=sys.stderr)
+    return save_names, False
+
+
+def render_job(toml_file, out_dir, overrides=None, timeout=None, render_cache=None, force=False, **kwargs):
+    """
+    绘制一个 toml 文件，并将结果或者异常记录为 RenderResult，不会抛出异常
+
+    Args:
+        toml_file(str): toml 文件路径
+        out_dir(str): 保存图片的文件夹
+        overrides(dict): 覆盖 [config] 表的 SubConfig 关键字参数
+        timeout(float): 绘制一个 toml 文件的时间上限，单位为秒，默认为 None，即不限制
+        render_cache(RenderCache): 绘制结果的缓存，默认为 None
+        force(bool): 是否忽略 render_cache 中已有的结果重新绘制
+        **kwargs: 传递给 load_spectra() 的关键字参数
+
+    Returns:
+        RenderResult: 绘制结果
+    """
+    start = time.perf_counter()
+    try:
+        with time_limit(timeout):
+            save_names, cached = render_file(toml_file, out_dir, overrides, render_cache, force, **kwargs)
+    except Exception as e:
+        return RenderResult(toml_file, error=f"{type(e).__name__}: {e}", elapsed=time.perf_counter() - start)
+    return RenderResult(toml_file, save_names=save_names, elapsed=time.perf_counter() - start, cached=cached)
+
+
+# 进程池中每一个 worker 的内存缓存和绘制结果的缓存，由 init_worker() 设置，同一个 worker 中的所有任务共享
+_worker_cache = None
+_worker_render_cache = None
+
+
+def init_worker(cache=None, render_cache=None):
+    """
+    进程池中每一个 worker 的初始化函数，提前导入 proplot，之后的所有任务都复用已经导入的模块
+
+    Args:
+        cache(MemoryCache): 这个 worker 中所有任务共享的缓存，默认为 None
+        render_cache(RenderCache): 这个 worker 中所有任务共享的绘制结果的缓存，默认为 None
+    """
+    global _worker_cache, _worker_render_cache
+    import proplot  # noqa: F401
+
+    _worker_cache = cache
+    _worker_render_cache = render_cache
+
+
+def worker_job(toml_file, out_dir, overrides=None, timeout=None, force=False, **kwargs):
+    """在进程池的 worker 中执行 render_job()，使用 init_worker() 设置的缓存"""
+    return render_job(toml_file, out_dir, overrides, timeout, _worker_render_cache, force, cache=_worker_cache,
+                      **kwargs)
+
+
+def render_batch(toml_files, out_dir, overrides=None, processes=1, timeout=None, render_cache=None, force=False,
+                 **kwargs):
+    """
+    批量绘制多个 toml 文件，processes 大于 1 时使用进程池并行绘制
+
+    Args:
+        toml_files(list[str]): toml 文件路径组成的集合
+        out_dir(str): 保存图片的文件夹
+        overrides(dict): 覆盖 [config] 表的 SubConfig 关键字参数
+        processes(int): 进程池中 worker 的数量，为 None 时等于 CPU 核数，为 1 时在当前进程中依次绘制
+        timeout(float): 绘制一个 toml 文件的时间上限，单位为秒，默认为 None，即不限制
+        render_cache(RenderCache): 绘制结果的缓存，默认为 None，即总是重新绘制
+        force(bool): 是否忽略 render_cache 中已有的结果重新绘制
+        **kwargs: 传递给 load_spectra() 的关键字参数，其中的 cache 在所有 toml 文件之间共享，
+            使用进程池时每一个 worker 得到一份 cache 的副本 (MemoryCache 的副本为空)
+
+    Returns:
+        list[RenderResult]: 与 toml_files 顺序一致的绘制结果
+    """
+    if processes is not None and processes <= 1:
+        results = []
+        for toml_file in toml_files:
+            result = render_job(toml_file, out_dir, overrides, timeout, render_cache, force, **kwargs)
+            report(result)
+            results.append(result)
+        return results
+
+    cache = kwargs.pop('cache', None)
+    with ProcessPoolExecutor(max_workers=processes, initializer=init_worker,
+                             initargs=(cache, render_cache)) as pool:
+        futures = [pool.submit(worker_job, toml_file, out_dir, overrides, timeout, force, **kwargs)
+                   for toml_file in toml_files]
+        results = []
+        for toml_file, future in zip(toml_files, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # worker 进程异常退出等情况
+                result = RenderResult(toml_file, error=f"{type(e).__name__}: {e}")
+            report(result)
+            results.append(result)
+    return results
+
+
+def print_summary(results, elapsed):
+    """
+    在屏幕上打印批量绘制的汇总信息，失败的 toml 文件及其完整的错误信息打印到标准错误
+
+    Args:
+        results(list[RenderResult]): 绘制结果
+        elapsed(float): 批量绘制所用的总时间，单位为秒
+    """
+    failures = [result for result in results if not result.ok]
+    reused = sum(result.cached for result in results)
+    print(f"{len(results) - len(failures)} succeeded ({reused} reused), {len(failures)} failed in {elapsed:.2f} s.")
+    for result in failures:
+        # 错误信息可能有多行 (例如 DataLoadError 列出每一个读取失败的文件)，后续的行缩进对齐
+        print(f"  {result.toml_file}:\n{textwrap.indent(result.error.rstrip(), '    ')}", file=sys.stderr)
+
+
+def render_main(argv=None):
+    """
+    "pysub render" 子命令的入口
+
+    Args:
+        argv(list[str]): 命令行参数，默认为 None，即 sys.argv[2:]
+
+    Returns:
+        int: 退出状态码，0 表示全部成功，1 表示至少有一个 toml 文件绘制失败
+    """
+    parser = argparse.ArgumentParser(prog='pysub render',
+                                     description='Render toml files without prompting.')
+    parser.add_argument('--version', '-v', action='version', help='Show the version information',
+                        version=__version__)
+    parser.add_argument('inputs', nargs='+', metavar='TOML', help='toml files to render')
+    parser.add_argument('--out', '-o', default='.', metavar='DIR',
+                        help='Folder of the rendered figures, named after the toml files (default: .)')
+    parser.add_argument('--processes', '-p', type=int, default=1, metavar='N',
+                        help='Render toml files in a pool of N processes, 0 for one per CPU (default: 1)')
+    parser.add_argument('--timeout', type=float, default=None, metavar='SECONDS',
+                        help='Time limit for rendering one toml file (not enforced on Windows)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and re-render when the toml file or its data files change')
+    parser.add_argument('--interval', type=float, default=0.5, metavar='SECONDS',
+                        help='Polling interval of --watch (default: 0.5)')
+    parser.add_argument('--debounce', type=float, default=0.3, metavar='SECONDS',
+                        help='Time the files must stay unchanged before --watch reloads them (default: 0.3)')
+    parser.add_argument('--memory', type=float, default=1024, metavar='MB',
+                        help='Keep parsed data files in memory, shared by all toml files, up to MB megabytes '
+                             '(default: 1024, 0 to turn off, not used with --lazy or --stream)')
+    parser.add_argument('--render-cache', nargs='?', const=os.path.join(default_cache_dir(), 'renders'),
+                        default=None, metavar='DIR',
+                        help='Reuse the figures of toml files whose settings, styles and data files have not changed '
+                             '(default DIR: renders in the cache folder)')
+    parser.add_argument('--render-cache-size', type=float, default=1024, metavar='MB',
+                        help='Maximum size of the render cache in MB (default: 1024)')
+    parser.add_argument('--force', action='store_true',
+                        help='Render every toml file even if the render cache has its figures')
+    add_read_arguments(parser)
+    add_config_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.watch and len(args.inputs) != 1:
+        parser.error("--watch takes exactly one toml file")
+    collisions = output_collisions(args.inputs)
+    if collisions:
+        # 图片以 toml 文件名命名，同名的 toml 文件会互相覆盖
+        parser.error("toml files with the same name would overwrite each other's figures in --out: "
+                     + "; ".join(", ".join(paths) for paths in collisions.values()))
+
+    os.makedirs(args.out, exist_ok=True)
+    options = read_options(args)
+    # --lazy 和 --stream 是为了让内存占用不随数据增长，此时不使用内存缓存
+    if args.memory > 0 and not options['lazy'] and options['block_size'] is None:
+        # --cache 指定的磁盘缓存作为内存缓存的下一级
+        options['cache'] = MemoryCache(max_size=int(args.memory * 1024 * 1024), backend=options['cache'],
+                                       use_hash=args.cache_hash)
+    if args.watch:
+        from pysub.watch import TomlWatcher
+
+        watcher = TomlWatcher(args.inputs[0], args.out, config_options(args), **options)
+        with profile_from_args(args):
+            watcher.run(interval=args.interval, debounce=args.debounce)
+        return 0
+
+    if args.processes != 1 and (args.profile or args.cprofile):
+        # 进程池中 worker 的各个阶段不会被记录
+        print("Warning: --profile and --cprofile only record the main process, use --processes 1 to profile rendering.")
+    render_cache = None
+    if args.render_cache is not None:
+        render_cache = RenderCache(args.render_cache, max_size=int(args.render_cache_size * 1024 * 1024))
+    start = time.perf_counter()
+    with profile_from_args(args):
+        results = render_batch(args.inputs, args.out, config_options(args), processes=args.processes or None,
+                               timeout=args.timeout, render_cache=render_cache, force=args.force, **options)
+    print_summary(results, time.perf_counter() - start)
+    return 0 if all(result.ok for result in results) else 1
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+broaden.py
+Broadening of stick spectra (positions and intensities) into curves.
+
+A [[file]] table with a "broaden" table reads its data file as a stick spectrum: the first
+column holds the positions (e.g. frequencies) and every further column the intensities of one
+curve. Every stick is broadened by a Gaussian, Lorentzian or pseudo-Voigt line shape of the
+given FWHM, normalized to unit area, onto an evenly spaced grid covering the xlim range,
+like the curves written by Multiwfn. Small problems are evaluated directly, one matrix
+product per block of sticks; large ones deposit the sticks on a finer grid and convolve it
+with the sampled line shape by FFT, so the cost grows with the grid size instead of with
+sticks * points.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+@author:
+Kimariyb (kimariyb@163.com)
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import math
+
+import numpy as np
+
+# 支持的线型
+PROFILES = ('gaussian', 'lorentzian', 'pseudo-voigt')
+# broaden 表中可以设置的键
+BROADEN_KEYS = {'profile', 'fwhm', 'eta', 'step', 'points', 'scale', 'factor', 'method'}
+# 没有指定 step 和 points 时网格的点数，与 Multiwfn 的默认值相同
+DEFAULT_POINTS = 3000
+# FFT 方法中细网格的间距不超过 fwhm / OVERSAMPLE，线性分配带来的误差不超过峰高的 1e-4
+OVERSAMPLE = 128
+# 直接计算时每一块的最大元素数 (谱线数 * 网格点数)
+DIRECT_CHUNK = 1 << 22
+
+
+def gaussian(dx, fwhm):
+    """
+    面积归一化的高斯线型
+
+    Args:
+        dx(ndarray): 与谱线位置的距离
+        fwhm(float): 半高全宽
+
+    Returns:
+        ndarray: 线型在 dx 处的值
+    """
+    sigma = fwhm / (2 * math.sqrt(2 * math.log(2)))
+    return np.exp(-0.5 * (dx / sigma) ** 2) / (sigma * math.sqrt(2 * math.pi))
+
+
+def lorentzian(dx, fwhm):
+    """
+    面积归一化的洛伦兹线型
+
+    Args:
+        dx(ndarray): 与谱线位置的距离
+        fwhm(float): 半高全宽
+
+    Returns:
+        ndarray: 线型在 dx 处的值
+    """
+    gamma = fwhm / 2
+    return gamma / math.pi / (dx ** 2 + gamma ** 2)
+
+
+def pseudo_voigt(dx, fwhm, eta=0.5):
+    """
+    面积归一化的赝 Voigt 线型，即相同半高全宽的洛伦兹线型和高斯线型的加权和
+
+    Args:
+        dx(ndarray): 与谱线位置的距离
+        fwhm(float): 半高全宽
+        eta(float): 洛伦兹线型的权重，0 为高斯线型，1 为洛伦兹线型，默认为 0.5
+
+    Returns:
+        ndarray: 线型在 dx 处的值
+    """
+    return eta * lorentzian(dx, fwhm) + (1 - eta) * gaussian(dx, fwhm)
+
+
+def line_shape(profile, fwhm, eta=0.5):
+    """
+    得到一个线型函数 shape(dx)
+
+    Args:
+        profile(str): 线型，gaussian、lorentzian 或者 pseudo-voigt
+        fwhm(float): 半高全宽
+        eta(float): 赝 Voigt 线型中洛伦兹线型的权重
+
+    Returns:
+        callable: 线型函数
+
+    Raises:
+        ValueError: 未知的线型，或者半高全宽不是正数
+    """
+    if not fwhm > 0:
+        raise ValueError("fwhm must be positive")
+    if profile == 'gaussian':
+        return lambda dx: gaussian(dx, fwhm)
+    if profile == 'lorentzian':
+        return lambda dx: lorentzian(dx, fwhm)
+    if profile == 'pseudo-voigt':
+        return lambda dx: pseudo_voigt(dx, fwhm, eta)
+    raise ValueError(f"Unknown line shape '{profile}', expected one of: {', '.join(PROFILES)}")
+
+
+def broaden_direct(positions, intensities, grid, shape):
+    """
+    直接计算每一条谱线在每一个网格点上的贡献，每次计算一块谱线，作为一次矩阵乘法
+
+    Args:
+        positions(ndarray): 谱线的位置，形状为 (谱线数,)
+        intensities(ndarray): 谱线的强度，形状为 (谱线数, 曲线数)
+        grid(ndarray): 网格点
+        shape(callable): 线型函数
+
+    Returns:
+        ndarray: 展宽后的曲线，形状为 (网格点数, 曲线数)
+    """
+    curves = np.zeros((len(grid), intensities.shape[1]))
+    chunk = max(1, DIRECT_CHUNK // max(len(grid), 1))
+    for start in range(0, len(positions), chunk):
+        stop = start + chunk
+        # (谱线数, 网格点数) 的线型矩阵
+        profile = shape(grid[None, :] - positions[start:stop, None])
+        curves += profile.T @ intensities[start:stop]
+    return curves
+
+
+def fine_grid(positions, grid, fwhm):
+    """
+    得到 broaden_fft() 所使用的细网格
+
+    Args:
+        positions(ndarray): 谱线的位置
+        grid(ndarray): 间距相等的升序网格点，至少两个点
+        fwhm(float): 半高全宽
+
+    Returns:
+        tuple(int, float, int, int): 细网格与网格间距的比值、细网格的间距、网格之前的细网格点数以及细网格的点数
+    """
+    step = (grid[-1] - grid[0]) / (len(grid) - 1)
+    ratio = max(1, math.ceil(step * OVERSAMPLE / fwhm))
+    fine_step = step / ratio
+    # 网格之前和之后需要的细网格点数，额外多一个点用于线性分配
+    before = max(math.ceil((grid[0] - positions.min()) / fine_step), 0) + 1
+    after = max(math.ceil((positions.max() - grid[-1]) / fine_step), 0) + 1
+    return ratio, fine_step, before, before + (len(grid) - 1) * ratio + 1 + after
+
+
+def broaden_fft(positions, intensities, grid, shape, fwhm):
+    """
+    将谱线线性分配到细网格上，再与线型做 FFT 卷积，计算量与谱线数几乎无关
+
+    Notes:
+        细网格的间距为网格间距的整数分之一，并且不超过 fwhm / OVERSAMPLE，网格点都落在细网格上；
+        细网格覆盖网格以及所有谱线，范围以外的谱线的尾部同样被计算。每一条谱线的强度按照距离分配给相邻的两个细网格点，
+        与精确值的误差不超过峰高的 (细网格间距 / fwhm)^2 倍，即 1e-4 以内。
+
+    Args:
+        positions(ndarray): 谱线的位置，形状为 (谱线数,)
+        intensities(ndarray): 谱线的强度，形状为 (谱线数, 曲线数)
+        grid(ndarray): 间距相等的升序网格点，至少两个点
+        shape(callable): 线型函数
+        fwhm(float): 半高全宽
+
+    Returns:
+        ndarray: 展宽后的曲线，形状为 (网格点数, 曲线数)
+    """
+    ratio, fine_step, before, size = fine_grid(positions, grid, fwhm)
+    origin = grid[0] - before * fine_step
+
+    # 线性分配到细网格上
+    offsets = (positions - origin) / fine_step
+    index = np.floor(offsets).astype(np.int64)
+    weight = offsets - index
+    deposit = np.zeros((size, intensities.shape[1]))
+    for curve in range(intensities.shape[1]):
+        deposit[:, curve] = (np.bincount(index, intensities[:, curve] * (1 - weight), minlength=size) +
+                             np.bincount(index + 1, intensities[:, curve] * weight, minlength=size))
+
+    # 细网格点之间的距离在 -(size - 1) 到 size - 1 个细网格间距之间，循环卷积的周期不小于 2 * size 时不会混叠，
+    # 线型按照循环的顺序排列，前一半为正的距离，后一半为负的距离
+    length = 1 << (2 * size - 1).bit_length()
+    distance = np.arange(length)
+    kernel = shape(np.where(distance < length // 2, distance, distance - length) * fine_step)
+    spectrum = np.fft.rfft(deposit, length, axis=0) * np.fft.rfft(kernel)[:, None]
+    fine = np.fft.irfft(spectrum, length, axis=0)
+    return fine[before:before + (len(grid) - 1) * ratio + 1:ratio]
+
+
+def broaden(positions, intensities, grid, profile='lorentzian', fwhm=8.0, eta=0.5, method='auto'):
+    """
+    将谱线展宽为网格上的曲线，每一条谱线的线型面积等于它的强度
+
+    Args:
+        positions(ndarray): 谱线的位置，形状为 (谱线数,)
+        intensities(ndarray): 谱线的强度，形状为 (谱线数,) 或者 (谱线数, 曲线数)
+        grid(ndarray): 升序的网格点，fft 方法要求间距相等
+        profile(str): 线型，gaussian、lorentzian 或者 pseudo-voigt，默认为 lorentzian
+        fwhm(float): 半高全宽，默认为 8.0
+        eta(float): 赝 Voigt 线型中洛伦兹线型的权重，默认为 0.5
+        method(str): direct 直接计算，fft 为 FFT 卷积，auto 根据谱线数 * 网格点数与 FFT 的长度估计两种方法的计算量，
+            选择较快的一种，默认为 auto
+
+    Returns:
+        ndarray: 展宽后的曲线，intensities 为一维时形状为 (网格点数,)，否则为 (网格点数, 曲线数)
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    intensities = np.asarray(intensities, dtype=np.float64)
+    grid = np.asarray(grid, dtype=np.float64)
+    flat = intensities.ndim == 1
+    intensities = intensities.reshape(len(positions), -1)
+    shape = line_shape(profile, fwhm, eta)
+    if method not in ('auto', 'direct', 'fft'):
+        raise ValueError(f"Unknown broadening method '{method}', expected one of: auto, direct, fft")
+
+    if method == 'auto' and len(positions) and len(grid) >= 2:
+        # 直接计算每个元素的代价约为 FFT 每个 length * log2(length) 的一半
+        length = 2 * fine_grid(positions, grid, fwhm)[3]
+        method = 'direct' if len(positions) * len(grid) <= 2 * length * math.log2(length) else 'fft'
+
+    if len(positions) == 0:
+        curves = np.zeros((len(grid), intensities.shape[1]))
+    elif method != 'fft' or len(grid) < 2:
+        curves = broaden_direct(positions, intensities, grid, shape)
+    else:
+        curves = broaden_fft(positions, intensities, grid, shape, fwhm)
+    return curves[:, 0] if flat else curves
+
+
+class Broadening:
+    """
+    [[file]] 表中 broaden 表的设置，将数据文件中的谱线展宽为 xlim 范围内的曲线
+
+    Attributes:
+        profile (str): 线型，gaussian、lorentzian 或者 pseudo-voigt
+        fwhm (float): 半高全宽
+        eta (float): 赝 Voigt 线型中洛伦兹线型的权重
+        step (float): 网格的间距，为 None 时由 points 决定
+        points (int): 网格的点数，只在没有指定 step 时使用
+        scale (float): 谱线位置的缩放因子，例如频率校正因子
+        factor (float): 谱线强度的缩放因子，例如单位换算
+        method (str): 计算方法，auto、direct 或者 fft
+    """
+
+    def __init__(self, **kwargs):
+        unknown = set(kwargs) - BROADEN_KEYS
+        if unknown:
+            raise ValueError(f"Unknown keys in broaden table: {', '.join(sorted(unknown))}")
+
+        # 线型，默认为 lorentzian
+        self.profile = kwargs.get('profile', 'lorentzian')
+        if self.profile not in PROFILES:
+            raise ValueError(f"profile must be one of: {', '.join(PROFILES)}")
+        # 半高全宽，默认为 8.0
+        self.fwhm = float(kwargs.get('fwhm', 8.0))
+        if self.fwhm <= 0:
+            raise ValueError("fwhm must be positive")
+        # 赝 Voigt 线型中洛伦兹线型的权重，默认为 0.5
+        self.eta = float(kwargs.get('eta', 0.5))
+        if not 0 <= self.eta <= 1:
+            raise ValueError("eta must be between 0 and 1")
+        # 网格的间距，默认为 None，即由 points 决定
+        self.step = kwargs.get('step')
+        if self.step is not None and self.step <= 0:
+            raise ValueError("step must be positive")
+        # 网格的点数，默认为 DEFAULT_POINTS
+        self.points = kwargs.get('points', DEFAULT_POINTS)
+        if not isinstance(self.points, int) or self.points < 2:
+            raise ValueError("points must be an int of at least 2")
+        # 谱线位置和强度的缩放因子，默认为 1.0
+        self.scale = float(kwargs.get('scale', 1.0))
+        self.factor = float(kwargs.get('factor', 1.0))
+        # 计算方法，默认为 auto
+        self.method = kwargs.get('method', 'auto')
+        if self.method not in ('auto', 'direct', 'fft'):
+            raise ValueError("method must be one of: auto, direct, fft")
+
+    def __str__(self):
+        return f"Broadening(profile='{self.profile}', fwhm={self.fwhm}, step={self.step}, scale={self.scale})"
+
+    def grid(self, x_range):
+        """
+        得到 x_range 范围内间距相等的升序网格
+
+        Args:
+            x_range(list): x 轴的范围，例如 [0, 4000]
+
+        Returns:
+            ndarray: 网格点
+        """
+        lower, upper = min(x_range), max(x_range)
+        if self.step is None:
+            return np.linspace(lower, upper, self.points)
+        # 最后一个点不超过 upper，允许微小的舍入误差
+        count = math.floor((upper - lower) / self.step + 1e-9) + 1
+        return lower + np.arange(count) * self.step
+
+    def apply(self, data, x_range):
+        """
+        将谱线数据展宽为曲线
+
+        Args:
+            data(ndarray): 形状为 (谱线数, 列数) 的数组，第一列为谱线位置，之后的每一列为一条曲线的谱线强度
+            x_range(list): x 轴的范围
+
+        Returns:
+            ndarray: 形状为 (网格点数, 列数) 的数组，第一列为网格点，之后的每一列为一条展宽后的曲线
+        """
+        data = np.asarray(data)
+        if data.ndim != 2 or data.shape[1] < 2:
+            raise ValueError(f"Stick data must have at least two columns (position and intensity), "
+                             f"got shape {data.shape}")
+        grid = self.grid(x_range)
+        curves = broaden(data[:, 0] * self.scale, data[:, 1:] * self.factor, grid, self.profile, self.fwhm,
+                         self.eta, self.method)
+        return np.column_stack((grid, curves)).astype(data.dtype, copy=False)
@@ -0,0 +1,601 @@
+# -*- coding: utf-8 -*-
+"""
+cache.py
+Persistent on-disk cache of parsed spectrum data.
+
+Parsing txt or xlsx files again on every run is wasteful when the files have not changed,
+so the parsed arrays are stored as .npy files in a cache directory and loaded back as
+memory-mapped arrays. Within one process, MemoryCache keeps the parsed arrays in memory,
+so a file shared by several [[file]] entries, toml files of a batch run or jobs of the render
+daemon is parsed once and its read-only array is shared; with use_hash it is addressed by the
+content of the data files, so identical files at different paths are parsed once as well.
+Both caches key an entry by the file's size and mtime taken before it is read, and skip
+storing it when the file changed while it was being read. A MemoryCache can sit in front of
+a SpectrumCache. RenderCache stores the rendered figures, keyed by everything that determines
+them, so an unchanged toml file is not rendered again.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+@author:
+Kimariyb (kimariyb@163.com)
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def default_cache_dir():
+    """
+    得到默认的缓存文件夹，优先使用 XDG_CACHE_HOME 环境变量，否则为 ~/.cache/pysub
+
+    Returns:
+        cache_dir(str): 缓存文件夹的路径
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "pysub")
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """
+    计算文件内容的哈希值
+
+    Args:
+        file_path(str): 文件路径
+        chunk_size(int): 每次读取的字节数
+
+    Returns:
+        digest(str): 文件内容的 blake2b 哈希值
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(file_path):
+    """
+    得到数据文件的大小和修改时间，读取数据文件之前记录，用来判断文件在读取的过程中是否被修改
+
+    Args:
+        file_path(str): 文件路径
+
+    Returns:
+        tuple(int, int): 文件的大小以及以纳秒为单位的修改时间
+    """
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def readonly(data):
+    """
+    得到列优先 (每一列都是连续的) 的只读数组，避免某一次绘制修改了其他 Spectrum 共享的数组
+
+    Notes:
+        内存映射的数组 (SpectrumCache 中的缓存文件) 保持原来的顺序，只设置为只读，转换顺序会把整个文件复制到内存中。
+        SpectrumCache 以列优先的顺序写入缓存文件，因此读取的内存映射数组本身就是列优先的
+
+    Args:
+        data(ndarray): 数组
+
+    Returns:
+        ndarray: 只读的数组，不需要转换时为原来的数组的视图
+    """
+    mapped = isinstance(data, np.memmap) or isinstance(getattr(data, 'base', None), np.memmap)
+    data = (data if mapped else np.asfortranarray(data)).view()
+    data.flags.writeable = False
+    return data
+
+
+class SpectrumCache:
+    """
+    光谱数据的磁盘缓存，每一个数据文件解析后的数组保存为缓存文件夹中的一个 .npy 文件
+
+    Notes:
+        缓存的键由数据文件的绝对路径、大小、修改时间以及数据类型决定，开启 use_hash 时还包含文件内容的哈希值。
+        大小和修改时间 (signature) 在读取数据文件之前记录，并一直传递到 store()；如果读取完成时文件已经被修改，
+        则不写入缓存，避免修改之前的数据被保存在修改之后的文件的键下。
+        缓存文件的修改时间用来记录最近一次使用的时间，缓存总大小超过 max_size 时，最久没有使用的缓存文件会被删除。
+
+    Attributes:
+        cache_dir (str): 缓存文件夹的路径
+        max_size (int): 缓存的最大字节数
+        use_hash (bool): 是否将文件内容的哈希值作为键的一部分
+    """
+
+    def __init__(self, cache_dir=None, max_size=1 << 30, use_hash=False):
+        # 缓存文件夹，默认为 default_cache_dir()
+        self.cache_dir = cache_dir or default_cache_dir()
+        # 缓存的最大字节数，默认为 1 GiB
+        self.max_size = max_size
+        # 是否计算文件内容的哈希值，默认为 False
+        self.use_hash = use_hash
+
+    def __str__(self):
+        return f"SpectrumCache(cache_dir='{self.cache_dir}', max_size={self.max_size}, use_hash={self.use_hash})"
+
+    def key(self, file_path, dtype=np.float64, signature=None):
+        """
+        根据数据文件的路径、大小、修改时间以及数据类型得到缓存的键
+
+        Args:
+            file_path(str): 数据文件的路径
+            dtype: 数据的类型
+            signature(tuple): 读取之前记录的 file_signature()，默认为 None，即使用文件当前的大小和修改时间
+
+        Returns:
+            key(str): 缓存的键
+        """
+        file_path = os.path.abspath(file_path)
+        size, mtime_ns = signature or file_signature(file_path)
+        parts = [file_path, str(size), str(mtime_ns), np.dtype(dtype).str]
+        if self.use_hash:
+            parts.append(file_digest(file_path))
+        return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=20).hexdigest()
+
+    def entry_path(self, key):
+        """返回键所对应的缓存文件路径"""
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def load(self, file_path, dtype=np.float64, signature=None):
+        """
+        从缓存中读取数据文件的数组
+
+        Args:
+            file_path(str): 数据文件的路径
+            dtype: 数据的类型
+            signature(tuple): 读取之前记录的 file_signature()，默认为 None
+
+        Returns:
+            data(ndarray or None): 只读的内存映射数组，如果缓存不存在则返回 None
+        """
+        entry = self.entry_path(self.key(file_path, dtype, signature))
+        try:
+            data = np.load(entry, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        # 更新缓存文件的修改时间，作为最近一次使用的时间
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return data
+
+    def store(self, file_path, data, dtype=np.float64, signature=None):
+        """
+        将数据文件解析得到的数组写入缓存，写入完成后根据 max_size 清理缓存
+
+        Args:
+            file_path(str): 数据文件的路径
+            data(ndarray): 数据文件解析得到的数组
+            dtype: 数据的类型
+            signature(tuple): 读取之前记录的 file_signature()，文件在读取的过程中被修改时不写入缓存；
+                默认为 None，即使用文件当前的大小和修改时间
+
+        Returns:
+            data(ndarray): 传入的数组，与 MemoryCache.store() 的接口一致
+        """
+        if signature is not None and file_signature(file_path) != signature:
+            return data
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = self.entry_path(self.key(file_path, dtype, signature))
+        # 先写入临时文件再重命名，保证多个线程或进程同时写入时缓存文件始终完整
+        descriptor, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                # 列优先写入，内存映射读取时每一列都是连续的，Spectrum 直接使用列的视图
+                np.save(file, np.asfortranarray(data, dtype=dtype))
+            os.replace(temp_path, entry)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict()
+        return data
+
+    def evict(self):
+        """
+        缓存总大小超过 max_size 时，按照最近一次使用的时间从旧到新删除缓存文件
+
+        Returns:
+            None
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # 其他进程已经删除了该文件，或者该文件正在被映射 (Windows)
+                continue
+            total_size -= size
+
+    def clear(self):
+        """删除所有缓存文件"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+
+
+class MemoryCache:
+    """
+    光谱数据的内存缓存，接口与 SpectrumCache 相同，用于在同一个进程中复用解析得到的数组
+
+    Notes:
+        缓存的键为数据文件的绝对路径、大小、修改时间以及数据类型，因此不同 [[file]] 表、不同 toml 文件引用的同一个文件
+        只解析一次，确定键时只需要一次 stat，不需要额外读取文件。开启 use_hash 时键为数据文件内容的哈希值以及数据类型，
+        不同路径下内容相同的文件也只解析一次，代价是每一个文件多读取一遍；哈希值按照路径、大小和修改时间记录，
+        文件没有变化时不会重新计算。文件变化后，下一次读取时得到新的键，旧的缓存项随后被淘汰。
+        与 SpectrumCache 一样，键由读取之前记录的 signature 决定，文件在读取的过程中被修改时不写入缓存。缓存的数组以列优先 (Fortran) 的顺序保存并且是只读的，
+        Spectrum 中的 x 值和 y 值直接为它的两列的视图，共享同一个文件的所有 Spectrum 对象不会各自复制数据。
+        总大小超过 max_size 时，最久没有使用的缓存项会被删除。
+        指定 backend 时，内存中没有的数组先从 backend (例如 SpectrumCache) 中读取，写入时也同时写入 backend。
+
+    Attributes:
+        max_size (int): 缓存的最大字节数，为 None 时不限制
+        backend (SpectrumCache): 下一级缓存，可以为 None
+        use_hash (bool): 是否按照文件内容的哈希值寻址
+        hits (int): 命中内存缓存的次数
+        misses (int): 没有命中内存缓存的次数
+    """
+
+    def __init__(self, max_size=1 << 30, backend=None, use_hash=False):
+        # 缓存的最大字节数，默认为 1 GiB
+        self.max_size = max_size
+        # 下一级缓存，默认为 None
+        self.backend = backend
+        # 是否按照文件内容的哈希值寻址，默认为 False
+        self.use_hash = use_hash
+        self.hits = 0
+        self.misses = 0
+        # 键到数组的映射，按照最近一次使用的时间排列
+        self._entries = OrderedDict()
+        # 绝对路径到 ((大小, 修改时间), 内容的哈希值) 的映射
+        self._digests = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return (f"MemoryCache(max_size={self.max_size}, entries={len(self)}, size={self.size}, "
+                f"use_hash={self.use_hash}, backend={self.backend})")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getstate__(self):
+        # 传递给进程池时只传递设置，子进程中的缓存为空
+        state = self.__dict__.copy()
+        state['_entries'] = OrderedDict()
+        state['_digests'] = {}
+        state['_size'] = 0
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        """缓存中所有数组的总字节数"""
+        return self._size
+
+    def key(self, file_path, dtype=np.float64, signature=None):
+        """
+        根据数据文件的路径、大小、修改时间 (开启 use_hash 时为文件内容) 以及数据类型得到缓存的键，
+        文件的大小和修改时间没有变化时复用已经计算的哈希值
+
+        Args:
+            file_path(str): 数据文件的路径
+            dtype: 数据的类型
+            signature(tuple): 读取之前记录的 file_signature()，默认为 None，即使用文件当前的大小和修改时间
+
+        Returns:
+            tuple: 缓存的键
+        """
+        file_path = os.path.abspath(file_path)
+        signature = signature or file_signature(file_path)
+        if not self.use_hash:
+            return file_path, signature, np.dtype(dtype).str
+        with self._lock:
+            known = self._digests.get(file_path)
+        if known is not None and known[0] == signature:
+            digest = known[1]
+        else:
+            digest = file_digest(file_path)
+            with self._lock:
+                self._digests[file_path] = (signature, digest)
+        return digest, np.dtype(dtype).str
+
+    def load(self, file_path, dtype=np.float64, signature=None):
+        """
+        从缓存中读取数据文件的数组
+
+        Args:
+            file_path(str): 数据文件的路径
+            dtype: 数据的类型
+            signature(tuple): 读取之前记录的 file_signature()，默认为 None
+
+        Returns:
+            data(ndarray or None): 只读的数组，如果缓存不存在则返回 None
+        """
+        key = self.key(file_path, dtype, signature)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        if self.backend is None:
+            return None
+        data = self.backend.load(file_path, dtype, signature)
+        if data is not None:
+            data = self._put(key, data)
+        return data
+
+    def store(self, file_path, data, dtype=np.float64, signature=None):
+        """
+        将数据文件解析得到的数组写入缓存，同时写入 backend
+
+        Args:
+            file_path(str): 数据文件的路径
+            data(ndarray): 数据文件解析得到的数组
+            dtype: 数据的类型
+            signature(tuple): 读取之前记录的 file_signature()，文件在读取的过程中被修改时不写入缓存；
+                默认为 None，即使用文件当前的大小和修改时间
+
+        Returns:
+            data(ndarray): 缓存中只读的数组，之后应当使用它代替传入的数组
+        """
+        if self.backend is not None:
+            self.backend.store(file_path, data, dtype, signature)
+        return self.put(file_path, data, dtype, signature)
+
+    def put(self, file_path, data, dtype=np.float64, signature=None):
+        """
+        只将数组写入内存缓存，不写入 backend，用于 backend 已经由其他进程写入的情况
+
+        Returns:
+            data(ndarray): 缓存中只读的数组；文件在读取的过程中被修改时为不写入缓存的只读数组
+        """
+        if signature is not None and file_signature(file_path) != signature:
+            return readonly(data)
+        return self._put(self.key(file_path, dtype, signature), data)
+
+    def _put(self, key, data):
+        """写入一个缓存项，然后根据 max_size 清理缓存，返回缓存中的数组"""
+        data = readonly(data)
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                # 其他线程已经写入了同样的内容，使用已有的数组
+                self._entries.move_to_end(key)
+                return existing
+            self._entries[key] = data
+            self._size += data.nbytes
+            # 最近写入的缓存项即使超过 max_size 也保留
+            while self.max_size is not None and self._size > self.max_size and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+        return data
+
+    def clear(self):
+        """删除所有缓存项，不影响 backend"""
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+            self._size = 0
+
+
+class RenderCache:
+    """
+    绘制结果的磁盘缓存，描述和数据文件都没有变化的绘制任务直接复用上一次保存的图片，不再读取数据和绘图
+
+    Notes:
+        缓存的键由调用者给出的描述 (例如解析后的 SubConfig 以及每一个 Spectrum 的样式) 和所有数据文件内容的哈希值决定，
+        数据文件只修改了修改时间而内容不变时仍然命中缓存。每一个缓存项是缓存文件夹中以键命名的文件夹，保存一次绘制得到的
+        所有图片 (多种格式以及分页时的每一页)，文件名为图片路径去掉共同前缀 (stem) 之后的部分，例如 ".png" 和 "_01.png"，
+        因此可以恢复到任意的保存路径。缓存项的修改时间记录最近一次使用的时间，总大小超过 max_size 时，
+        最久没有使用的缓存项会被删除。
+
+    Attributes:
+        cache_dir (str): 缓存文件夹的路径
+        max_size (int): 缓存的最大字节数
+        hits (int): 命中缓存的次数
+        misses (int): 没有命中缓存的次数
+    """
+    # 每一个缓存项中按顺序记录图片文件名的文件
+    MANIFEST = "manifest.json"
+
+    def __init__(self, cache_dir=None, max_size=1 << 30):
+        # 缓存文件夹，默认为 default_cache_dir() 中的 renders 文件夹
+        self.cache_dir = cache_dir or os.path.join(default_cache_dir(), "renders")
+        # 缓存的最大字节数，默认为 1 GiB
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # 绝对路径到 ((大小, 修改时间), 内容的哈希值) 的映射，同一个进程中没有变化的数据文件只计算一次哈希值
+        self._digests = {}
+
+    def __str__(self):
+        return f"RenderCache(cache_dir='{self.cache_dir}', max_size={self.max_size})"
+
+    def digest(self, file_path):
+        """
+        计算数据文件内容的哈希值，文件的大小和修改时间没有变化时复用已经计算的哈希值
+
+        Args:
+            file_path(str): 数据文件的路径
+
+        Returns:
+            digest(str): 文件内容的 blake2b 哈希值
+        """
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        known = self._digests.get(file_path)
+        if known is not None and known[0] == signature:
+            return known[1]
+        digest = file_digest(file_path)
+        self._digests[file_path] = (signature, digest)
+        return digest
+
+    def key(self, description, data_files):
+        """
+        根据绘制任务的描述以及数据文件的内容得到缓存的键
+
+        Args:
+            description(dict): 可以转换为 JSON 的描述，包含所有影响绘制结果的设置
+            data_files(list[str]): 绘制时读取的数据文件路径，顺序与子图一致
+
+        Returns:
+            key(str): 缓存的键
+        """
+        parts = [json.dumps(description, sort_keys=True, default=str)]
+        parts.extend(self.digest(file_path) for file_path in data_files)
+        return hashlib.blake2b("\n".join(parts).encode("utf-8"), digest_size=20).hexdigest()
+
+    def entry_path(self, key):
+        """返回键所对应的缓存项文件夹路径"""
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key, stem):
+        """
+        将缓存的图片复制到 stem 所对应的保存路径
+
+        Notes:
+            每一个图片先复制到同一个文件夹中的临时文件，再重命名为保存路径，其他程序不会读到只写了一半的图片。
+            缓存项不完整或者在复制时被其他进程删除时，视为没有命中缓存。
+
+        Args:
+            key(str): 缓存的键
+            stem(str): 图片保存路径的共同前缀，例如 "figures/IR"
+
+        Returns:
+            save_names(list[str] or None): 恢复得到的图片路径，顺序与保存时一致，如果缓存不存在则返回 None
+        """
+        entry = self.entry_path(key)
+        try:
+            with open(os.path.join(entry, self.MANIFEST), "r", encoding="utf-8") as file:
+                suffixes = json.load(file)
+            save_names = []
+            for suffix in suffixes:
+                save_name = f"{stem}{suffix}"
+                temp_path = f"{save_name}.tmp{os.getpid()}-{threading.get_ident()}"
+                try:
+                    shutil.copyfile(os.path.join(entry, suffix), temp_path)
+                    os.replace(temp_path, save_name)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                save_names.append(save_name)
+            # 更新缓存项的修改时间，作为最近一次使用的时间
+            os.utime(entry)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return save_names
+
+    def store(self, key, stem, save_names):
+        """
+        将一次绘制得到的图片写入缓存，已经存在的缓存项会被替换，写入完成后根据 max_size 清理缓存
+
+        Args:
+            key(str): 缓存的键
+            stem(str): 图片保存路径的共同前缀
+            save_names(list[str]): 绘制得到的图片路径，都必须以 stem 开头
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: 图片路径不以 stem 开头
+        """
+        if any(not save_name.startswith(stem) for save_name in save_names):
+            raise ValueError(f"Saved figures must start with '{stem}'")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = self.entry_path(key)
+        # 先写入临时文件夹再重命名，保证缓存项始终完整
+        temp_dir = tempfile.mkdtemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            suffixes = [save_name[len(stem):] for save_name in save_names]
+            for save_name, suffix in zip(save_names, suffixes):
+                shutil.copyfile(save_name, os.path.join(temp_dir, suffix))
+            with open(os.path.join(temp_dir, self.MANIFEST), "w", encoding="utf-8") as file:
+                json.dump(suffixes, file)
+            shutil.rmtree(entry, ignore_errors=True)
+            try:
+                os.rename(temp_dir, entry)
+            except OSError:
+                # 其他进程同时写入了同一个缓存项，内容相同，保留已有的缓存项
+                if not os.path.isdir(entry):
+                    raise
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """
+        缓存总大小超过 max_size 时，按照最近一次使用的时间从旧到新删除缓存项
+
+        Returns:
+            None
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            # 跳过正在写入的临时文件夹
+            if name.endswith(".tmp") or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                entries.append((os.stat(path).st_mtime_ns, size, path))
+            except OSError:
+                continue
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
+
+    def clear(self):
+        """删除所有缓存项"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if os.path.isdir(path) and not name.endswith(".tmp"):
+                shutil.rmtree(path, ignore_errors=True)
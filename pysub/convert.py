@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+convert.py
+Bulk conversion of spectrum data files to a fast binary format.
+
+"pysub convert" reads txt, xlsx or any other supported data file once and writes it as .npy
+(memory-mapped on load, the fastest input) or .npz. Toml files can be given as well: their
+data files are converted and a copy of the toml file that points to the converted files is
+written next to the original.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+@author:
+Kimariyb (kimariyb@163.com)
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import toml
+
+from pysub.subplots import COMPRESSIONS, read_path, resolve_source, __version__
+
+# 可以转换得到的格式
+FORMATS = ('npy', 'npz')
+
+
+def target_path(source, fmt, out_dir=None):
+    """
+    得到数据文件转换后的路径，与原文件同名，只替换扩展名，压缩文件同时去掉压缩的扩展名，例如 "IR.txt.gz" 得到 "IR.npy"
+
+    Args:
+        source(str): 数据文件的路径
+        fmt(str): 转换后的格式，npy 或者 npz
+        out_dir(str): 保存转换后文件的文件夹，默认为 None，即与原文件位于同一个文件夹
+
+    Returns:
+        str: 转换后的文件路径
+    """
+    stem = os.path.splitext(source)[0]
+    if Path(source).suffix.lower() in COMPRESSIONS:
+        stem = os.path.splitext(stem)[0]
+    if out_dir is not None:
+        stem = os.path.join(out_dir, os.path.basename(stem))
+    return f"{stem}.{fmt}"
+
+
+def convert_file(source, target, fmt='npy', dtype=np.float64, force=False):
+    """
+    将一个数据文件转换为 npy 或者 npz 文件
+
+    Notes:
+        npy 文件以列优先 (Fortran) 的顺序保存，读取时每一列都是连续的内存映射，不需要复制。
+        写入时先写入临时文件再重命名，转换中断时不会留下不完整的文件。
+
+    Args:
+        source(str): 数据文件的路径
+        target(str): 转换后的文件路径
+        fmt(str): 转换后的格式，npy 或者 npz
+        dtype: 保存的数据类型，默认为 np.float64
+        force(bool): 是否覆盖比原文件更新的目标文件，默认为 False，即跳过已经转换过的文件
+
+    Returns:
+        bool: 是否进行了转换，目标文件已经是最新时为 False
+    """
+    if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+        return False
+
+    data = np.asfortranarray(read_path(source, dtype=dtype))
+    temp_path = f"{target}.tmp{os.getpid()}"
+    try:
+        with open(temp_path, 'wb') as file:
+            if fmt == 'npy':
+                np.save(file, data)
+            else:
+                np.savez_compressed(file, data=data)
+        os.replace(temp_path, target)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return True
+
+
+def convert_job(source, target, fmt='npy', dtype=np.float64, force=False):
+    """
+    转换一个数据文件，并将结果或者异常记录下来，不会抛出异常
+
+    Returns:
+        tuple(bool, str): 是否进行了转换，以及转换失败的原因 (成功时为 None)
+    """
+    try:
+        return convert_file(source, target, fmt, dtype, force), None
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+def toml_sources(toml_file):
+    """得到一个 toml 文件中每一个 [[file]] 所指向的数据文件路径"""
+    with open(toml_file, 'r', encoding='utf-8') as file:
+        content = toml.load(file)
+    folder = os.path.dirname(os.path.abspath(toml_file))
+    return [resolve_source(block['path'], folder) for block in content['file']]
+
+
+def target_collisions(sources, targets):
+    """
+    找出转换后路径相同的不同数据文件，例如同一个文件夹中的 IR.txt 和 IR.xlsx 都会转换为 IR.npy
+
+    Args:
+        sources(list[str]): 数据文件的路径
+        targets(list[str]): 与 sources 顺序一致的转换后的文件路径
+
+    Returns:
+        dict: 转换后的文件路径到对应的所有数据文件的映射，只包含有多个数据文件的路径
+    """
+    groups = {}
+    for source, target in zip(sources, targets):
+        groups.setdefault(os.path.normcase(os.path.abspath(target)), []).append(source)
+    return {target: group for target, group in groups.items() if len(group) > 1}
+
+
+def convert_toml(toml_file, fmt, out_dir=None):
+    """
+    得到一个 toml 文件需要转换的数据文件，并写入一个指向转换后文件的 toml 文件副本
+
+    Args:
+        toml_file(str): toml 文件路径
+        fmt(str): 转换后的格式
+        out_dir(str): 保存转换后数据文件的文件夹，默认为 None
+
+    Returns:
+        tuple(list[str], str): 需要转换的数据文件路径，以及 toml 文件副本的路径
+    """
+    with open(toml_file, 'r', encoding='utf-8') as file:
+        content = toml.load(file)
+    folder = os.path.dirname(os.path.abspath(toml_file))
+    sources = []
+    for block in content['file']:
+        source = resolve_source(block['path'], folder)
+        sources.append(source)
+        # 副本与原来的 toml 文件位于同一个文件夹，使用相对路径
+        block['path'] = os.path.relpath(target_path(source, fmt, out_dir), folder).replace(os.sep, '/')
+
+    copy_path = f"{os.path.splitext(toml_file)[0]}_{fmt}.toml"
+    with open(copy_path, 'w', encoding='utf-8') as file:
+        toml.dump(content, file)
+    return sources, copy_path
+
+
+def convert_main(argv=None):
+    """
+    "pysub convert" 子命令的入口
+
+    Args:
+        argv(list[str]): 命令行参数，默认为 None，即 sys.argv[2:]
+
+    Returns:
+        int: 退出状态码，0 表示全部成功，1 表示至少有一个文件转换失败
+    """
+    parser = argparse.ArgumentParser(prog='pysub convert',
+                                     description='Convert spectrum data files to a fast binary format.')
+    parser.add_argument('--version', '-v', action='version', help='Show the version information',
+                        version=__version__)
+    parser.add_argument('inputs', nargs='+', metavar='FILE',
+                        help='Data files to convert, or toml files whose data files are converted')
+    parser.add_argument('--format', '-f', choices=FORMATS, default='npy',
+                        help='Target format, npy is memory-mapped on load, npz is compressed (default: npy)')
+    parser.add_argument('--out', '-o', default=None, metavar='DIR',
+                        help='Folder of the converted files (default: next to each source file)')
+    parser.add_argument('--processes', '-p', type=int, default=1, metavar='N',
+                        help='Convert files in a pool of N processes, 0 for one per CPU (default: 1)')
+    parser.add_argument('--float32', action='store_true', help='Store the data as float32')
+    parser.add_argument('--force', action='store_true', help='Convert files even if the target is up to date')
+    args = parser.parse_args(argv)
+
+    if args.out is not None:
+        os.makedirs(args.out, exist_ok=True)
+    # 先展开 toml 文件，同一个数据文件只转换一次
+    unique = {}
+    for path in args.inputs:
+        for source in toml_sources(path) if path.endswith('.toml') else [path]:
+            unique.setdefault(os.path.abspath(source), source)
+    sources = list(unique.values())
+    targets = [target_path(source, args.format, args.out) for source in sources]
+    # 不同的数据文件转换为同一个文件时，后转换的文件会覆盖先转换的文件，在写入任何文件之前报错
+    collisions = target_collisions(sources, targets)
+    if collisions:
+        parser.error("data files would be converted to the same file: "
+                     + "; ".join(f"{', '.join(group)} -> {target}" for target, group in collisions.items()))
+    for path in args.inputs:
+        if path.endswith('.toml'):
+            print(f"Wrote {convert_toml(path, args.format, args.out)[1]}")
+    dtype = np.float32 if args.float32 else np.float64
+
+    start = time.perf_counter()
+    jobs = [(source, target, args.format, dtype, args.force) for source, target in zip(sources, targets)]
+    if args.processes == 1 or len(jobs) <= 1:
+        results = [convert_job(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=args.processes or None) as pool:
+            results = list(pool.map(convert_job, *zip(*jobs)))
+
+    failures = 0
+    for source, target, (converted, error) in zip(sources, targets, results):
+        if error is not None:
+            failures += 1
+            print(f"Failed: {source}\n{error}")
+        else:
+            print(f"{'Converted' if converted else 'Up to date'}: {source} -> {target}")
+    print(f"{len(sources) - failures} succeeded, {failures} failed in {time.perf_counter() - start:.2f} s.")
+    return 0 if failures == 0 else 1
@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+"""
+daemon.py
+Long-lived render daemon with a local HTTP job API, and the client that submits jobs to it.
+
+"pysub serve" imports proplot once, warms up the font cache by drawing a tiny figure and then
+waits for render jobs on 127.0.0.1. Parsed data files are kept in a MemoryCache, so a job
+only pays for reading the files that changed and for the drawing itself.
+"pysub submit" sends a toml file, or inline toml from stdin, to the daemon and prints the
+saved paths, or writes the figure bytes to a file or stdout.
+
+Jobs are rendered one at a time, because matplotlib is not thread safe. The daemon writes its
+port and a random token to daemon.json in the cache folder (readable by the owner only); the
+client reads it and every request must carry the token, so other users of the machine cannot
+submit jobs.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+@author:
+Kimariyb (kimariyb@163.com)
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import argparse
+import io
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+import toml
+
+from pysub.batch import RenderResult, output_path
+from pysub.cache import MemoryCache, default_cache_dir
+from pysub.subplots import (SubConfig, add_config_arguments, add_read_arguments, build_figure, config_options,
+                            draw_spectrum, load_spectra, parse_config, read_options, render_bytes,
+                            spectrum_from_block, __version__)
+
+# 默认的端口
+DEFAULT_PORT = 8471
+# 记录端口和 token 的文件
+STATE_FILE = "daemon.json"
+# 返回图片内容时各个格式的 Content-Type
+CONTENT_TYPES = {
+    'png': 'image/png', 'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'tif': 'image/tiff', 'tiff': 'image/tiff',
+    'webp': 'image/webp', 'pdf': 'application/pdf', 'svg': 'image/svg+xml', 'eps': 'application/postscript',
+}
+
+
+class JobError(Exception):
+    """任务本身不合法时抛出的异常，例如缺少 toml 或者 out，返回 400 而不是 500"""
+
+
+def state_path():
+    """记录守护进程端口和 token 的文件路径"""
+    return os.path.join(default_cache_dir(), STATE_FILE)
+
+
+class RenderDaemon:
+    """
+    在同一个进程中依次执行绘制任务，复用已经导入的 proplot 以及内存中解析过的数据
+
+    Notes:
+        一个任务为一个 dict (即请求的 JSON)：
+        toml 为 toml 文件的绝对路径；或者 toml_text 为 toml 文件的内容，此时 folder 为相对路径所相对的文件夹。
+        config 为覆盖 [config] 表的设置，out 为保存图片的文件夹，name 为图片的文件名 (默认与 toml 文件同名，
+        内联 toml 为 figure)，return 为 "path" (默认，返回保存路径) 或者 "bytes" (直接返回图片内容，不保存)。
+
+    Attributes:
+        cache (MemoryCache): 解析过的数据文件的内存缓存
+        read_kwargs (dict): 传递给 load_spectra() 的其他关键字参数
+        jobs (int): 已经执行的任务数量
+        failures (int): 失败的任务数量
+    """
+
+    def __init__(self, read_kwargs=None, memory_size=1 << 30, use_hash=False):
+        read_kwargs = dict(read_kwargs or {})
+        # --cache 指定的磁盘缓存作为内存缓存的下一级
+        self.cache = MemoryCache(max_size=memory_size, backend=read_kwargs.pop('cache', None), use_hash=use_hash)
+        self.read_kwargs = read_kwargs
+        self.jobs = 0
+        self.failures = 0
+        self.started = time.time()
+
+    def warm_up(self):
+        """
+        导入 proplot 并绘制一个很小的图像，提前完成字体缓存等初始化工作
+
+        Returns:
+            float: 所用的时间，单位为秒
+        """
+        start = time.perf_counter()
+        import proplot as pplt
+
+        block = dict(colors='k', styles='-', legend='warm up', xlim=[0, 1, 0.5], ylim=[0, 1, 0.5],
+                     xlabel='x', ylabel='y', iszero=0, islegend=1)
+        spectrum = spectrum_from_block(block, plot_data=np.array([[0.0, 0.0], [1.0, 1.0]]))
+        fig, _ = build_figure(SubConfig(sub_num=1), [spectrum])
+        try:
+            fig.savefig(io.BytesIO(), format='png')
+        finally:
+            pplt.close(fig)
+        return time.perf_counter() - start
+
+    def status(self):
+        """守护进程的状态"""
+        return dict(version=__version__, pid=os.getpid(), uptime=time.time() - self.started, jobs=self.jobs,
+                    failures=self.failures, cache_entries=len(self.cache), cache_size=self.cache.size,
+                    cache_hits=self.cache.hits, cache_misses=self.cache.misses)
+
+    def render(self, job):
+        """
+        执行一个绘制任务
+
+        Args:
+            job(dict): 任务，见 RenderDaemon 的说明
+
+        Returns:
+            tuple(list[str], bytes): 图片的保存路径，以及 return 为 "bytes" 时图片的内容 (否则为 None)，
+                此时保存路径为 "<memory>.{格式}"
+
+        Raises:
+            JobError: 任务不合法
+        """
+        if job.get('toml'):
+            source = job['toml']
+            with open(source, 'r', encoding='utf-8') as file:
+                content = toml.load(file)
+            folder = os.path.dirname(os.path.abspath(source))
+        elif job.get('toml_text') is not None:
+            source = job.get('name') or 'figure'
+            content = toml.loads(job['toml_text'])
+            folder = job.get('folder')
+            if not folder:
+                raise JobError("'folder' is required with 'toml_text'")
+        else:
+            raise JobError("Either 'toml' or 'toml_text' is required")
+        if 'file' not in content:
+            raise JobError("The toml file has no [[file]] table")
+
+        spectrum_list = load_spectra(content['file'], folder, cache=self.cache, **self.read_kwargs)
+        # 任务中的设置优先级高于 [config] 表
+        options = parse_config(content.get('config', {}))
+        options.update(parse_config(job.get('config') or {}))
+        config = SubConfig(sub_num=len(spectrum_list), **options)
+        release = self.read_kwargs.get('lazy', False)
+
+        if job.get('return', 'path') == 'bytes':
+            formats = config.save_formats()
+            if len(formats) != 1:
+                raise JobError("'return': 'bytes' needs exactly one save format")
+            # 分页绘制 png 等格式时每一页为一个文件
+            if config.is_paginated(len(spectrum_list)) and formats[0] != 'pdf':
+                raise JobError("'return': 'bytes' of a paginated figure needs the pdf format")
+            # 直接绘制到内存中，不经过临时文件
+            data = render_bytes(config, spectrum_list, fmt=formats[0], release=release)
+            return [f"<memory>.{formats[0]}"], data
+
+        out_dir = job.get('out')
+        if not out_dir:
+            raise JobError("'out' is required unless 'return' is 'bytes'")
+        os.makedirs(out_dir, exist_ok=True)
+        save_path = output_path(job.get('name') or source, out_dir, config)
+        return draw_spectrum(config, spectrum_list, release=release, save_path=save_path), None
+
+    def handle(self, job):
+        """
+        执行一个绘制任务，并将结果或者异常转换为 HTTP 响应，不会抛出异常
+
+        Returns:
+            tuple(int, bytes, str, dict): 状态码、响应内容、Content-Type 以及其他响应头
+        """
+        start = time.perf_counter()
+        self.jobs += 1
+        name = job.get('toml') or job.get('name') or '<inline toml>'
+        try:
+            save_names, data = self.render(job)
+        except Exception as e:
+            self.failures += 1
+            result = RenderResult(name, error=f"{type(e).__name__}: {e}", elapsed=time.perf_counter() - start)
+            print(result)
+            body = encode_json(dict(ok=False, error=result.error, elapsed=result.elapsed))
+            return 400 if isinstance(e, JobError) else 500, body, 'application/json', {}
+
+        result = RenderResult(name, save_names=save_names, elapsed=time.perf_counter() - start)
+        print(result)
+        if data is None:
+            body = encode_json(dict(ok=True, save_names=save_names, elapsed=result.elapsed))
+            return 200, body, 'application/json', {}
+        fmt = os.path.splitext(save_names[0])[1].lstrip('.').lower()
+        headers = {'X-Pysub-Elapsed': f"{result.elapsed:.6f}", 'X-Pysub-Format': fmt}
+        return 200, data, CONTENT_TYPES.get(fmt, 'application/octet-stream'), headers
+
+
+def encode_json(value):
+    """将响应内容编码为 JSON"""
+    return json.dumps(value).encode('utf-8')
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    """
+    处理守护进程的 HTTP 请求：GET /status，POST /render 以及 POST /shutdown
+    """
+    server_version = f"pysub/{__version__}"
+
+    def log_message(self, format, *args):
+        # 每一个任务的结果已经由 RenderDaemon 打印
+        pass
+
+    def authorized(self):
+        """检查请求的 token，不正确时返回 403"""
+        if secrets.compare_digest(self.headers.get('X-Pysub-Token', ''), self.server.token):
+            return True
+        self.respond(403, encode_json(dict(ok=False, error="Invalid token")))
+        return False
+
+    def respond(self, status, body, content_type='application/json', headers=None):
+        """发送响应"""
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        if self.path == '/status':
+            self.respond(200, encode_json(self.server.daemon.status()))
+        else:
+            self.respond(404, encode_json(dict(ok=False, error=f"Unknown path: {self.path}")))
+
+    def do_POST(self):
+        if not self.authorized():
+            return
+        if self.path == '/shutdown':
+            self.respond(200, encode_json(dict(ok=True)))
+            # shutdown() 会等待当前的请求结束，因此需要在另一个线程中调用
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        if self.path != '/render':
+            self.respond(404, encode_json(dict(ok=False, error=f"Unknown path: {self.path}")))
+            return
+        try:
+            job = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if not isinstance(job, dict):
+                raise ValueError("The job must be a JSON object")
+        except ValueError as e:
+            self.respond(400, encode_json(dict(ok=False, error=f"Invalid job: {e}")))
+            return
+        self.respond(*self.server.daemon.handle(job))
+
+
+class DaemonServer(HTTPServer):
+    """
+    单线程的 HTTP 服务器，依次处理请求，保证同一时间只有一个任务在绘制
+
+    Attributes:
+        daemon (RenderDaemon): 执行绘制任务的对象
+        token (str): 请求需要携带的 token
+    """
+
+    def __init__(self, address, daemon, token):
+        super().__init__(address, DaemonHandler)
+        self.daemon = daemon
+        self.token = token
+
+
+def write_state(host, port, token):
+    """
+    将守护进程的地址和 token 写入 daemon.json，只有当前用户可以读取
+
+    Returns:
+        str: daemon.json 的路径
+    """
+    path = state_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+        json.dump(dict(host=host, port=port, token=token, pid=os.getpid()), file)
+    return path
+
+
+def read_state():
+    """读取 daemon.json，不存在时返回空的 dict"""
+    try:
+        with open(state_path(), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def serve_main(argv=None):
+    """
+    "pysub serve" 子命令的入口
+
+    Args:
+        argv(list[str]): 命令行参数，默认为 None，即 sys.argv[2:]
+
+    Returns:
+        int: 退出状态码
+    """
+    parser = argparse.ArgumentParser(prog='pysub serve',
+                                     description='Run a render daemon that keeps proplot and parsed data warm.')
+    parser.add_argument('--version', '-v', action='version', help='Show the version information',
+                        version=__version__)
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f'Port to listen on, 0 for any free port (default: {DEFAULT_PORT})')
+    parser.add_argument('--memory', type=float, default=1024, metavar='MB',
+                        help='Maximum size of parsed data kept in memory in MB (default: 1024)')
+    add_read_arguments(parser)
+    args = parser.parse_args(argv)
+
+    daemon = RenderDaemon(read_options(args), memory_size=int(args.memory * 1024 * 1024), use_hash=args.cache_hash)
+    print(f"Warmed up in {daemon.warm_up():.2f} s.")
+    token = secrets.token_hex(16)
+    server = DaemonServer((args.host, args.port), daemon, token)
+    host, port = server.server_address[:2]
+    path = write_state(host, port, token)
+    print(f"pysub daemon listening on http://{host}:{port}, state written to {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        # 只删除属于自己的 daemon.json
+        if read_state().get('pid') == os.getpid():
+            os.remove(path)
+    print(f"pysub daemon stopped after {daemon.jobs} job(s).")
+    return 0
+
+
+def request(state, method, path, job=None):
+    """
+    向守护进程发送请求
+
+    Args:
+        state(dict): 守护进程的 host、port 和 token
+        method(str): GET 或者 POST
+        path(str): 请求的路径，例如 /render
+        job(dict): POST 的 JSON 内容
+
+    Returns:
+        tuple(int, bytes, dict): 状态码、响应内容以及响应头
+    """
+    data = None if job is None else encode_json(job)
+    req = urllib.request.Request(f"http://{state['host']}:{state['port']}{path}", data=data, method=method,
+                                 headers={'Content-Type': 'application/json', 'X-Pysub-Token': state.get('token', '')})
+    try:
+        with urllib.request.urlopen(req) as response:
+            return response.status, response.read(), dict(response.headers)
+    except urllib.error.HTTPError as e:
+        return e.code, e.read(), dict(e.headers)
+
+
+def submit_main(argv=None):
+    """
+    "pysub submit" 子命令的入口
+
+    Args:
+        argv(list[str]): 命令行参数，默认为 None，即 sys.argv[2:]
+
+    Returns:
+        int: 退出状态码，0 表示绘制成功
+    """
+    parser = argparse.ArgumentParser(prog='pysub submit', description='Submit a render job to "pysub serve".')
+    parser.add_argument('--version', '-v', action='version', help='Show the version information',
+                        version=__version__)
+    parser.add_argument('input', nargs='?', metavar='TOML',
+                        help='toml file to render, "-" to read the toml from stdin')
+    parser.add_argument('--out', '-o', default='.', metavar='DIR',
+                        help='Folder of the rendered figure, named after the toml file (default: .)')
+    parser.add_argument('--name', default=None, help='File name of the figure without extension')
+    parser.add_argument('--bytes', dest='bytes_file', default=None, metavar='FILE',
+                        help='Return the figure itself and write it to FILE, "-" for stdout')
+    parser.add_argument('--host', default=None, help='Address of the daemon (default: from daemon.json)')
+    parser.add_argument('--port', type=int, default=None, help='Port of the daemon (default: from daemon.json)')
+    parser.add_argument('--status', action='store_true', help='Print the status of the daemon')
+    parser.add_argument('--shutdown', action='store_true', help='Stop the daemon')
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.input is None and not (args.status or args.shutdown):
+        parser.error("a toml file is required")
+
+    state = read_state()
+    state['host'] = args.host or state.get('host', '127.0.0.1')
+    state['port'] = args.port or state.get('port', DEFAULT_PORT)
+    try:
+        if args.status or args.shutdown:
+            status, body, _ = request(state, 'GET' if args.status else 'POST', '/status' if args.status else '/shutdown')
+            print(body.decode('utf-8'))
+            return 0 if status == 200 else 1
+
+        # 守护进程的工作目录与客户端不同，路径都需要转换为绝对路径
+        job = dict(config=config_options(args), name=args.name, out=os.path.abspath(args.out),
+                   **{'return': 'path' if args.bytes_file is None else 'bytes'})
+        if args.input == '-':
+            job.update(toml_text=sys.stdin.read(), folder=os.getcwd())
+        else:
+            job['toml'] = os.path.abspath(args.input)
+        status, body, headers = request(state, 'POST', '/render', job)
+    except urllib.error.URLError as e:
+        print(f"Error: No pysub daemon at {state['host']}:{state['port']} ({e.reason}), start one with \"pysub serve\".")
+        return 1
+
+    if status != 200:
+        print(f"Failed: {json.loads(body).get('error')}")
+        return 1
+    if args.bytes_file is None:
+        result = json.loads(body)
+        print(f"Rendered: {', '.join(result['save_names'])} ({result['elapsed']:.2f} s)")
+    elif args.bytes_file == '-':
+        sys.stdout.buffer.write(body)
+    else:
+        with open(args.bytes_file, 'wb') as file:
+            file.write(body)
+        print(f"Rendered: {args.bytes_file} ({float(headers.get('X-Pysub-Elapsed', 0)):.2f} s)")
+    return 0
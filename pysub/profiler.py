@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+profiler.py
+Per-stage timing of a pySubplots run.
+
+The reading and drawing functions wrap each stage in stage(), for example the toml parse,
+every read_path() call, pplt.figure, fig.subplots, the plot/format/legend calls of every
+panel and every savefig. stage() does nothing unless a hook is registered. Profiler is such
+a hook: it collects the timings, writes them as a JSON report and can also record a cProfile
+dump of the same run. Other tools can register their own hooks with add_hook().
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+@author:
+Kimariyb (kimariyb@163.com)
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 已经注册的 hook，每一个 hook 为 callback(name, start, elapsed, meta)
+_hooks = []
+
+
+def add_hook(callback):
+    """
+    注册一个 hook，之后每一个阶段结束时都会调用 callback(name, start, elapsed, meta)
+
+    Args:
+        callback(callable): name 为阶段的名称，start 为 time.perf_counter() 记录的开始时间，
+            elapsed 为用时 (秒)，meta 为该阶段的附加信息，例如 {'panel': 0} 或者 {'path': 'a.txt'}
+    """
+    _hooks.append(callback)
+
+
+def remove_hook(callback):
+    """取消注册一个 hook，hook 不存在时不做任何事情"""
+    if callback in _hooks:
+        _hooks.remove(callback)
+
+
+@contextmanager
+def stage(name, **meta):
+    """
+    记录一个阶段的用时，没有注册 hook 时不计时
+
+    Args:
+        name(str): 阶段的名称，例如 "read_path"、"plot"、"savefig"
+        **meta: 阶段的附加信息，例如 panel=0、path='a.txt'
+    """
+    if not _hooks:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for callback in list(_hooks):
+            callback(name, start, elapsed, meta)
+
+
+class Profiler:
+    """
+    收集各个阶段的用时，并生成 JSON 报告，可以同时使用 cProfile 记录同一次运行
+
+    Examples:
+        with Profiler(cprofile_path="run.prof") as profiler:
+            draw_spectrum(config, spectrum_list)
+        profiler.write("profile.json")
+
+    Attributes:
+        cprofile_path (str): cProfile 结果的保存路径，为 None 时不使用 cProfile
+        records (list[dict]): 每一个阶段的记录，包括 stage、start、elapsed 以及附加信息
+    """
+
+    def __init__(self, cprofile_path=None):
+        self.cprofile_path = cprofile_path
+        self.records = []
+        self._lock = threading.Lock()
+        self._start = None
+        self._elapsed = None
+        self._cprofile = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        add_hook(self.record)
+        if self.cprofile_path is not None:
+            import cProfile
+
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_path)
+            self._cprofile = None
+        remove_hook(self.record)
+        self._elapsed = time.perf_counter() - self._start
+        return False
+
+    def record(self, name, start, elapsed, meta):
+        """stage() 的 hook，记录一个阶段，读取数据文件时可能在多个线程中同时调用"""
+        with self._lock:
+            self.records.append(dict(stage=name, start=start - self._start, elapsed=elapsed, **meta))
+
+    def report(self):
+        """
+        汇总各个阶段的用时
+
+        Returns:
+            dict: 包括总用时 total、按阶段汇总的 stages、按子图汇总的 panels、按数据文件汇总的 inputs 以及所有的 records，
+                stages、panels 和 inputs 都按照总用时从大到小排列
+        """
+        elapsed = self._elapsed if self._elapsed is not None else time.perf_counter() - self._start
+        stages, panels, inputs = {}, {}, {}
+        for item in self.records:
+            summary = stages.setdefault(item['stage'], dict(count=0, total=0.0, max=0.0))
+            summary['count'] += 1
+            summary['total'] += item['elapsed']
+            summary['max'] = max(summary['max'], item['elapsed'])
+            if 'panel' in item:
+                panels[item['panel']] = panels.get(item['panel'], 0.0) + item['elapsed']
+            if 'path' in item:
+                inputs[item['path']] = inputs.get(item['path'], 0.0) + item['elapsed']
+        for summary in stages.values():
+            summary['mean'] = summary['total'] / summary['count']
+
+        def ranked(totals, key):
+            return [{key: name, 'total': total} for name, total in sorted(totals.items(), key=lambda item: -item[1])]
+
+        return dict(
+            total=elapsed,
+            stages=dict(sorted(stages.items(), key=lambda item: -item[1]['total'])),
+            panels=ranked(panels, 'panel'),
+            inputs=ranked(inputs, 'path'),
+            records=self.records,
+        )
+
+    def write(self, file_path):
+        """将 report() 写入 JSON 文件"""
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, indent=2)
+
+    def summary(self, limit=8):
+        """
+        得到用时最多的几个阶段的文字描述，用于在屏幕上打印
+
+        Args:
+            limit(int): 最多显示的阶段数量
+
+        Returns:
+            str: 每一行为一个阶段的次数、总用时和最大用时
+        """
+        report = self.report()
+        lines = [f"Profile: {report['total']:.3f} s in total"]
+        for name, item in list(report['stages'].items())[:limit]:
+            lines.append(f"  {name:<16}{item['count']:>6} x {item['total']:>9.3f} s  (max {item['max']:.3f} s)")
+        return "\n".join(lines)
+
+
+def add_profile_arguments(parser):
+    """
+    为 ArgumentParser 对象添加性能分析的参数
+
+    Args:
+        parser(ArgumentParser): ArgumentParser 对象
+    """
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile', metavar='JSON', default=None,
+                       help='Write the time spent in every stage (toml parse, read_path, figure, subplots, '
+                            'plot, format, legend, savefig) to a JSON report')
+    group.add_argument('--cprofile', metavar='FILE', default=None,
+                       help='Also record the run with cProfile and dump the stats to FILE')
+
+
+@contextmanager
+def profile_from_args(args):
+    """
+    根据 --profile 和 --cprofile 参数对代码块进行性能分析，结束后写入报告；两个参数都没有指定时不做任何事情
+
+    Args:
+        args(Namespace): 解析后的命令行参数
+    """
+    if args.profile is None and args.cprofile is None:
+        yield None
+        return
+    profiler = Profiler(cprofile_path=args.cprofile)
+    try:
+        with profiler:
+            yield profiler
+    finally:
+        print(profiler.summary())
+        if args.profile is not None:
+            profiler.write(args.profile)
+            print(f"Profile report written to {args.profile}")
+        if args.cprofile is not None:
+            print(f"cProfile stats written to {args.cprofile}")
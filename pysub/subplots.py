@@ -19,18 +19,27 @@ For details, see the LICENSE file.
 2023-09-02
 """
 import argparse
+import bz2
+import copy
+import gzip
+import io
+import lzma
 import math
 import os
+import re
 import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
 from pathlib import Path
 
-import pandas as pd
-import proplot as pplt
+import numpy as np
 import toml
-import wx
 
-from proplot import rc
+from pysub.broaden import Broadening
+from pysub.cache import MemoryCache, SpectrumCache, default_cache_dir, file_signature
+from pysub.profiler import stage
 
 # 获取当前文件被修改的最后一次时间
 time_last = os.path.getmtime(os.path.abspath(__file__))
@@ -42,6 +51,17 @@ __website__ = "https://github.com/kimariyb/py-subplots"
 __release__ = str(datetime.fromtimestamp(time_last).strftime("%b-%d-%Y"))
 
 
+# SubConfig 中可以通过 [config] 表或者命令行参数设置的属性
+CONFIG_KEYS = {'font_family', 'font_size', 'figure_size', 'sup_layout', 'save_dpi', 'save_format',
+               'is_serial', 'is_share', 'is_span', 'is_decimate', 'is_parallel_save', 'page_size'}
+
+# draw_curves() 绘制的曲线对象的 gid，用于在子图中找到曲线
+CURVES_GID = 'pysub-curves'
+
+# 由 Agg 渲染得到的位图格式，多个位图格式可以共用同一次渲染的结果
+RASTER_FORMATS = {'png', 'jpg', 'jpeg', 'tif', 'tiff', 'webp'}
+
+
 class SubConfig:
     """
     绘制多子图时所需要的配置类
@@ -53,10 +73,13 @@ class SubConfig:
         figure_size (tuple): Size of the figure.
         sup_layout (list): Layout of subplots.
         save_dpi (float): Resolution for saved files.
-        save_format (str): Format for saved files.
+        save_format (str or list): Format for saved files, or a list of formats.
         is_serial (bool): Whether to display serial numbers.
         is_share (bool): Whether to share axes.
         is_span (bool): Whether to share axis scales.
+        is_decimate (bool): Whether to decimate curves to the pixel width of the subplots.
+        is_parallel_save (bool): Whether to encode multiple raster formats in parallel.
+        page_size (int): Number of subplots per page, None to draw all subplots in one figure.
     """
 
     def __init__(self, **kwargs):
@@ -86,15 +109,25 @@ class SubConfig:
         else:
             self.sup_layout = self.auto_layout()
 
-        # 保存图片的 dpi，默认为 400
-        self.save_dpi = kwargs.get('save_dpi', 400)
-        # 保存图片的格式，默认为 PNG
+        # 保存图片的 dpi，默认为 300
+        self.save_dpi = kwargs.get('save_dpi', 300)
+        # 保存图片的格式，默认为 PNG；可以为多个格式组成的 list，例如 ['png', 'pdf', 'svg']
         self.save_format = kwargs.get('save_format', 'png')
+        if not self.save_formats():
+            raise ValueError("save_format must be a format or a list of formats, eg. 'png' or ['png', 'pdf']")
         # 是否显示序号，默认为 True
         self.is_serial = kwargs.get('is_serial', True)
         # 是否共享，默认为 True
         self.is_share = kwargs.get('is_share', True)
         self.is_span = kwargs.get('is_span', True)
+        # 是否按照子图的像素宽度对曲线降采样，默认为 False
+        self.is_decimate = kwargs.get('is_decimate', False)
+        # 保存多个位图格式时是否并行编码，默认为 False
+        self.is_parallel_save = kwargs.get('is_parallel_save', False)
+        # 每一页的子图数量，默认为 None，即所有子图绘制在同一个图像中
+        self.page_size = kwargs.get('page_size')
+        if self.page_size is not None and (not isinstance(self.page_size, int) or self.page_size < 1):
+            raise ValueError("page_size must be a positive int")
 
     def __str__(self):
         """
@@ -107,10 +140,13 @@ class SubConfig:
             f"figure_size={self.figure_size}",
             f"sup_layout={self.sup_layout}",
             f"save_dpi={self.save_dpi}",
-            f"save_format='{self.save_format}'",
+            f"save_format={self.save_format!r}",
             f"is_serial={self.is_serial}",
             f"is_share={self.is_share}",
-            f"is_span={self.is_span}"
+            f"is_span={self.is_span}",
+            f"is_decimate={self.is_decimate}",
+            f"is_parallel_save={self.is_parallel_save}",
+            f"page_size={self.page_size}"
         ]
         return "SubConfig(\n  " + ",\n  ".join(attributes) + "\n)"
 
@@ -123,6 +159,7 @@ class SubConfig:
             If the length is 15, it can be factored into 5 and 3, so it returns [5, 3].
             Note that if a number can only be factored into two numbers, the larger number comes first.
             If a number is a prime number and can only be factored into n and 1, it returns [n, 1].
+            A single subplot returns [1, 1].
 
         Args:
             self.sub_num (int): The length of the data collection.
@@ -141,7 +178,10 @@ class SubConfig:
                     return False
             return True
 
-        if is_prime(self.sub_num):
+        if self.sub_num == 1:
+            # 只有一个子图，例如分页时的最后一页
+            layout_list = [1, 1]
+        elif is_prime(self.sub_num):
             # 如果数据集合长度为质数，则按照 [n, 1] 的排版方式
             layout_list = [self.sub_num, 1]
         else:
@@ -153,6 +193,38 @@ class SubConfig:
 
         return layout_list
 
+    def is_paginated(self, count):
+        """
+        count 个子图是否需要分页绘制
+
+        Args:
+            count(int): 子图的数量
+
+        Returns:
+            bool: 设置了 page_size 并且子图数量超过 page_size 时为 True
+        """
+        return self.page_size is not None and count > self.page_size
+
+    def set_page_size(self):
+        """
+       设置 SubConfig 的 page_size 属性
+
+        Returns:
+            None
+        """
+        print("Type \"r\": Return to main menu")
+        your_input = input("Please input number of subplots per page, eg. 12, or 0 to draw all subplots in one figure\n")
+        if your_input.lower() == "r":
+            return
+        try:
+            page_size = int(your_input)
+        except ValueError:
+            print("Error: Invalid input. Please enter an integer.")
+            return
+        # 0 表示不分页
+        self.page_size = page_size if page_size > 0 else None
+        print("Setting successful!\n")
+
     def set_save_dpi(self):
         """
        设置 SubConfig 的 save_dpi 属性
@@ -234,6 +306,52 @@ class SubConfig:
             input("Press Enter to continue...\n")
         print("Setting successful!\n")
 
+    def toggle_decimate(self):
+        """
+       设置 SubConfig 的 is_decimate 属性
+
+        Returns:
+            None
+        """
+        print("Type \"r\": Return to main menu")
+        print("0 Turn off decimation of the curves")
+        print("1 Turn on decimation of the curves")
+        your_input = input("Please enter the option of your choice:\n")
+        if your_input.lower() == "r":
+            return
+        elif your_input == "0":
+            self.is_decimate = False
+        elif your_input == "1":
+            self.is_decimate = True
+        else:
+            print("Invalid input. Please press the Enter button and make a valid selection.")
+            input("Press Enter to continue...\n")
+        print("Setting successful!\n")
+
+    def panel_pixels(self):
+        """
+        根据图像大小、子图排版以及 dpi 估算每一个子图的像素宽度
+
+        Returns:
+            int: 每一个子图的像素宽度
+        """
+        return int(math.ceil(self.figure_size[0] / self.sup_layout[1] * self.save_dpi))
+
+    def save_formats(self):
+        """
+        将 save_format 统一为格式组成的 list，去掉空白、前缀的点以及重复的格式
+
+        Returns:
+            list[str]: 保存图片的所有格式
+        """
+        formats = [self.save_format] if isinstance(self.save_format, str) else list(self.save_format or [])
+        result = []
+        for fmt in formats:
+            fmt = str(fmt).strip().lstrip('.').lower()
+            if fmt and fmt not in result:
+                result.append(fmt)
+        return result
+
     def set_format(self):
         """
        设置 SubConfig 的 save_format 属性
@@ -242,11 +360,15 @@ class SubConfig:
             None
         """
         print("Type \"r\": Return to main menu")
-        your_input = input("Please input format of saving subplots file, eg. png\n")
+        your_input = input("Please input format of saving subplots file, eg. png or png,pdf,svg\n")
         if your_input.lower() == "r":
             return
-        # 将输入的内容赋值给 save_format
-        self.save_format = your_input
+        # 用逗号分隔多个格式，只有一个格式时仍然保存为 str
+        formats = [fmt.strip() for fmt in your_input.split(",") if fmt.strip()]
+        if not formats:
+            print("Error: Invalid input. Please enter at least one format.")
+            return
+        self.save_format = formats[0] if len(formats) == 1 else formats
         print("Setting successful!\n")
 
     def set_figure_size(self):
@@ -310,10 +432,72 @@ class SubConfig:
         print("Setting successful!\n")
 
 
+class DataHandle:
+    """
+    延迟读取数据文件的句柄，只记录读取数据文件所需要的信息，调用 load() 时才真正读取
+
+    Attributes:
+        file_path (str): 数据文件的路径
+        dtype: 数据的类型
+        cache (SpectrumCache): 磁盘缓存，可以为 None
+        block_size (int): 流式读取时每次读取的字节数，为 None 时不使用流式读取
+        broadening (Broadening): 数据文件为谱线数据时的展宽设置，可以为 None
+        x_range (list): 展宽得到的曲线的 x 轴范围，只在指定 broadening 时使用
+    """
+
+    def __init__(self, file_path, dtype=np.float64, cache=None, block_size=None, broadening=None, x_range=None):
+        self.file_path = file_path
+        self.dtype = dtype
+        self.cache = cache
+        self.block_size = block_size
+        self.broadening = broadening
+        self.x_range = x_range
+
+    def __str__(self):
+        return f"DataHandle(file_path='{self.file_path}', dtype={np.dtype(self.dtype).name})"
+
+    def load(self):
+        """
+        读取数据文件的内容
+
+        Returns:
+            data(ndarray): 形状为 (行数, 列数) 的 numpy 数组，指定 broadening 时为展宽后的曲线
+        """
+        data = read_path(self.file_path, dtype=self.dtype, cache=self.cache)
+        if self.broadening is not None:
+            data = self.broadening.apply(data, self.x_range)
+        return data
+
+    @property
+    def is_streaming(self):
+        """是否可以流式读取，只支持 txt 文件以及压缩的 txt 文件，谱线数据总是整个读取"""
+        return self.block_size is not None and self.broadening is None and data_suffix(self.file_path) == ".txt"
+
+    def stream(self, x_range, n_bins=0):
+        """
+        流式读取数据文件，只得到需要绘制的曲线，不会把整个文件读取到内存中
+
+        Args:
+            x_range(list): x 轴的范围
+            n_bins(int): 降采样的像素列数量，为 0 时不降采样
+
+        Returns:
+            tuple(ndarray, ndarray): 需要绘制的 x 值以及所有曲线的 y 值，y 值的形状为 (点数, 曲线数)
+        """
+        with stage("stream_curve", path=str(self.file_path)):
+            return stream_curve(self.file_path, x_range, n_bins, dtype=self.dtype, block_size=self.block_size)
+
+
 class Spectrum:
     """
     用于绘制图像的 Spectrum 类，这个类必须从 toml 文件中读取
 
+    Notes:
+        使用 __slots__ 而不是实例的 __dict__，曲线的 x 值和 y 值分别保存为连续的 numpy 数组，
+        绘制数百个子图时不需要为每一个子图保存 DataFrame 以及它的索引。数组的数据类型与读取时相同 (例如 --float32)。
+        数据文件第二列之后的每一列都是一条曲线 (例如多个构象或者多个温度的光谱共用同一个 x 轴)，
+        此时 colors、line_style 和 legend_text 可以为 list，依次对应每一条曲线。
+
     Attributes:
         x_limit (list): X轴坐标的最小值、最大值和间隔，例如 [0, 4000, 500]，列表类型。
         y_limit (list): Y轴坐标的最小值、最大值和间隔，例如 [0, 3000, 1000]，列表类型。
@@ -324,15 +508,23 @@ class Spectrum:
         legend_text (list or str): 图例的文本，可以是由字符串组成的列表类型，也可以是字符串类型。
         is_zero (bool): 是否启用零轴，布尔类型。
         is_legend (bool): 是否显示图例，布尔类型。
-        plot_data (DataFrame): 绘图数据，一个DataFrame对象。
+        x (ndarray): 曲线的 x 值，即数据文件的第一列。如果提供了 data_handle，则在第一次访问时才读取。
+        y (ndarray): 第一条曲线的 y 值，即数据文件的第二列。
+        ys (ndarray): 所有曲线的 y 值，即数据文件第二列之后的所有列，形状为 (行数, 曲线数)，每一列都是连续的。
+        x_order (int): x 值的顺序，见 sort_order()，读取数据之后第一次访问时计算一次。
+        data_handle (DataHandle): 延迟读取数据的句柄，可以为 None。
     """
+    __slots__ = ('x_limit', 'y_limit', 'x_label', 'y_label', 'colors', 'line_style', 'legend_text', 'is_zero',
+                 'is_legend', 'data_handle', '_x', '_y', '_x_order')
 
     def __init__(self, **kwargs):
         """
         初始化 Spectrum 对象。
 
         Args:
-            **kwargs: 关键字参数，包含 x_limit、y_limit、x_label、y_label、colors、line_style、legend_text、is_zero、is_legend 和 plot_data。
+            **kwargs: 关键字参数，包含 x_limit、y_limit、x_label、y_label、colors、line_style、legend_text、is_zero、is_legend、
+                plot_data 和 data_handle。plot_data 为形状为 (行数, 列数) 的数组或者 DataFrame，第一列为 x 值，
+                之后的每一列为一条曲线的 y 值。
         """
         # 构造函数逻辑
         # 如果未提供 x_limit，默认为 [0, 1, 0.1]
@@ -353,8 +545,84 @@ class Spectrum:
         self.is_zero = kwargs.get('is_zero', False)
         # 如果未提供 is_legend，默认为 True
         self.is_legend = kwargs.get('is_legend', True)
-        # 不提供默认值，如果未提供 plot_data，则为 None
+        # 不提供默认值，如果未提供 plot_data，则 x 和 y 为 None
         self.plot_data = kwargs.get('plot_data')
+        # 延迟读取数据的句柄，如果未提供 data_handle，则为 None
+        self.data_handle = kwargs.get('data_handle')
+
+    def _ensure_loaded(self):
+        """如果还没有读取并且存在 data_handle，则读取数据"""
+        if self._x is None and self.data_handle is not None:
+            self.plot_data = self.data_handle.load()
+
+    @property
+    def x(self):
+        """曲线的 x 值"""
+        self._ensure_loaded()
+        return self._x
+
+    @property
+    def y(self):
+        """第一条曲线的 y 值"""
+        self._ensure_loaded()
+        return None if self._y is None else self._y[:, 0]
+
+    @property
+    def ys(self):
+        """所有曲线的 y 值，形状为 (行数, 曲线数)"""
+        self._ensure_loaded()
+        return self._y
+
+    @property
+    def x_order(self):
+        """x 值的顺序，1 为升序，-1 为降序，0 为无序，没有数据时为 None"""
+        self._ensure_loaded()
+        if self._x is None:
+            return None
+        if self._x_order is None:
+            self._x_order = sort_order(self._x)
+        return self._x_order
+
+    @property
+    def plot_data(self):
+        """
+        绘图数据，由 x 值和所有曲线的 y 值组成的形状为 (行数, 列数) 的新数组，只为兼容保留，绘图时直接使用 x 和 ys
+        """
+        self._ensure_loaded()
+        if self._x is None:
+            return None
+        return np.column_stack((self._x, self._y))
+
+    @plot_data.setter
+    def plot_data(self, value):
+        # 新的数据在第一次需要时重新判断顺序
+        self._x_order = None
+        if value is None:
+            self._x = self._y = None
+            return
+        # DataFrame 只取其中的数组，不保留索引
+        data = value.to_numpy() if hasattr(value, 'to_numpy') else np.asarray(value)
+        if data.ndim != 2 or data.shape[1] < 2:
+            raise ValueError(f"plot_data must have at least two columns (x and y), got shape {data.shape}")
+        # x 值以及 y 值的每一列分别得到连续的数组；按行保存的数组会复制这些列，不再引用原来的二维数组，
+        # 按列保存的数组 (例如 pysub convert 生成的 npy 文件) 的每一列本身就是连续的，不会复制
+        self._x = np.ascontiguousarray(data[:, 0])
+        self._y = np.asfortranarray(data[:, 1:])
+
+    @property
+    def is_loaded(self):
+        """绘图数据是否已经读取到内存中"""
+        return self._x is not None
+
+    def release(self):
+        """
+        释放已经读取的绘图数据，只有存在 data_handle 时才会释放，下一次访问 x 或者 y 时会重新读取
+
+        Returns:
+            None
+        """
+        if self.data_handle is not None:
+            self._x = self._y = self._x_order = None
 
     def __str__(self):
         return f"Spectrum Object:\n" \
@@ -369,283 +637,1849 @@ class Spectrum:
                f"  is_zero: {self.is_zero}\n"
 
 
-def read_path(file_path):
+def _open_zstd(file_path):
     """
-    读取 toml 文件中 path 所指向的 txt 或 xlxs 文件的内容
+    以流的方式打开 zstd 压缩的文件，Python 3.14 以上使用标准库 compression.zstd，否则需要安装 zstandard
 
     Args:
-        file_path: toml 文件中 path 所表示的路径
+        file_path(str): zst 文件的路径
 
     Returns:
-        data(DataFrame): 返回一个 Pandas DataFrame 对象
-
+        file: 可以读取解压后内容的二进制文件对象
     """
-    file = Path(file_path)
-    # 根据文件的后缀是否为 txt 或者 xlsx 判断
-    if file.suffix == ".txt":
-        # 如果是 Multiwfn 输出的 txt 文件，调用 Pandas 的 read_csv 方法读取
-        data = pd.read_csv(file_path, delim_whitespace=True, header=None)
-    elif file.suffix == ".xlsx":
-        # 读取包含光谱数据的 Excel 文件，假设文件包含一个名为 Sheet1 的表格
-        data = pd.read_excel(file_path, sheet_name=0, dtype={'column_name': float})
+    try:
+        from compression import zstd
+    except ImportError:
+        pass
     else:
-        # 文件格式不支持
-        raise ValueError("Unsupported file format.")
+        return zstd.open(file_path, 'rb')
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Reading .zst files requires zstandard, install it with: pip install zstandard") from None
 
-    return data
+    return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
 
 
-def read_toml(toml_file):
+# 压缩文件的后缀到打开函数的映射，每一个打开函数返回可以读取解压后内容的二进制文件对象
+COMPRESSIONS = {
+    '.gz': gzip.open,
+    '.xz': lzma.open,
+    '.bz2': bz2.open,
+    '.zst': _open_zstd,
+}
+# 可以压缩的文本格式，其他格式本身就是二进制格式，或者需要随机访问
+COMPRESSIBLE_SUFFIXES = {'.txt', '.csv'}
+
+# 数值文本中允许出现的字符：数字、符号、小数点、指数、nan 与 inf (infinity) 的字母以及空白
+NUMBER_CHARS = b"0123456789+-.eEnNaAiIfFtTyY \t\n\v\f\r"
+
+
+def data_suffix(file_path):
     """
-    根据 toml 文件得到 spectrum 组成的集合
+    得到数据文件的格式后缀，压缩文件返回压缩之前的后缀，例如 "IR.txt.gz" 返回 ".txt"
 
     Args:
-        toml_file(str): toml 文件
+        file_path(str): 数据文件的路径
 
     Returns:
-        spectrum_list(list): 由 Spectrum 对象组成的 list 集合
+        str: 小写的后缀，压缩文件的格式不支持压缩时返回完整的后缀，例如 ".npy.gz"
     """
-    # 根据 toml 文件得到 spectrum 对象
-    with open(toml_file, 'r', encoding='utf-8') as file:
-        spectrums = toml.load(file)
+    path = Path(file_path)
+    suffix = path.suffix.lower()
+    if suffix in COMPRESSIONS:
+        inner = path.with_suffix('').suffix.lower()
+        return inner if inner in COMPRESSIBLE_SUFFIXES else inner + suffix
+    return suffix
 
-    # 获取 toml 文件的当前文件夹
-    current_folder = os.path.dirname(os.path.abspath(toml_file))
-    # 新建一个 list 用来存放 spectrum 对象
-    spectrum_list = []
-    # 解析文件内容
-    for spectrum in spectrums['file']:
-        # 拿到每一个 file 下的所有参数
-        path = spectrum['path']
-        if os.path.isabs(path):
-            # 如果是绝对路径，则直接使用该路径
-            data_source = path
-        else:
-            # 如果是相对路径，则与当前文件夹拼接
-            data_source = os.path.join(current_folder, path)
-        # 根据 data_source 得到数据
-        plot_data = read_path(data_source)
-
-        # 解析 toml 文件中的其他参数
-        colors = spectrum['colors']
-        styles = spectrum['styles']
-        legend = spectrum['legend']
-        xlim = spectrum['xlim']
-        ylim = spectrum['ylim']
-        x_label = spectrum['xlabel']
-        y_label = spectrum['ylabel']
-        is_zero = bool(spectrum['iszero'])
-        is_legend = bool(spectrum['islegend'])
-
-        # 初始化一个 spectrum 对象
-        spectrum = Spectrum(x_limit=xlim, y_limit=ylim, x_label=x_label, y_label=y_label, colors=colors,
-                            line_style=styles, legend_text=legend, is_zero=is_zero, is_legend=is_legend,
-                            plot_data=plot_data)
 
-        # 在 spectrum 追加每一个 spectrum 对象
-        spectrum_list.append(spectrum)
+def open_data(file_path):
+    """
+    以二进制方式打开数据文件，压缩文件在读取时以流的方式解压，不会写入临时文件
 
-    return spectrum_list
+    Args:
+        file_path(str): 数据文件的路径
+
+    Returns:
+        file: 二进制文件对象
+    """
+    opener = COMPRESSIONS.get(Path(file_path).suffix.lower())
+    return open(file_path, 'rb') if opener is None else opener(file_path)
 
 
-def validate(file):
+def read_multiwfn(file_path, dtype=np.float64):
     """
-    判断输入的文件是否为 toml 文件
+    读取 Multiwfn 输出的 txt 文件，直接得到 numpy 数组而不经过 DataFrame
+
+    Notes:
+        Multiwfn 输出的 txt 文件每一行都是以空白分隔的浮点数，例如 "4000.00000   3.10493824E-002"，
+        因此可以一次性读取整个文件，再交给 numpy 的 C 解析器解析，列数由第一行决定
 
     Args:
-        file(str): toml 文件的路径
+        file_path(str): txt 文件的路径，也可以是 gz、xz、bz2 或者 zst 压缩的 txt 文件
+        dtype: 解析得到的数组的数据类型，默认为 np.float64，也可以为 np.float32 以节省内存
+
+    Returns:
+        data(ndarray): 形状为 (行数, 列数) 的 numpy 数组
     """
-    # 首先判断输入的是否为 toml 文件，如果不是，则抛出异常。并在屏幕上打印不支持该文件
-    if not file.endswith(".toml"):
-        raise ValueError("Error: Unsupported file format. Only TOML files are supported.\n")
+    with open_data(file_path) as file:
+        raw = file.read()
 
-    # 判断输入的 toml 文件是否存在，如果不存在，则抛出异常。并在屏幕上打印未找到该文件
-    if not os.path.isfile(file):
-        raise FileNotFoundError("Error: File not found.\n")
+    # 第一行的数值个数即为列数
+    n_columns = len(raw.lstrip().split(b"\n", 1)[0].split())
+    if n_columns == 0:
+        raise ValueError(f"Empty data file: {file_path}")
 
+    return _parse_rows(raw, n_columns, dtype, file_path)
 
-def welcome_view():
-    """显示程序的基本信息、配置信息以及版权信息。
+
+def _token_layout(raw):
+    """
+    得到只含有 NUMBER_CHARS 中字符的文本中每一个以空白分隔的单词的起始位置，以及每一行的结束位置
+
+    Args:
+        raw(bytes): 文本
 
     Returns:
-        None
+        tuple(ndarray, ndarray): 单词的起始位置以及每一行的结束位置 (换行符的位置，最后一行没有换行符时为文本的长度)
     """
-    # 程序最后输出版本和基础信息
-    print(f"pySubplots -- A python script for plotting multiple subplots.")
-    print(f"Version: {__version__}, release date: {__release__}")
-    print(f"Developer: {__developer__}")
-    print(f"Address: {__address__}")
-    print(f"pySubplots home website: {__website__}\n")
-    # 获取当前日期和时间
-    now = datetime.now().strftime("%b-%d-%Y, %H:%M:%S")
-    # 程序结束后提示版权信息和问候语
-    print(f"(Copyright (c) 2023 Kimariyb. Currently timeline: {now})\n")
+    data = np.frombuffer(raw, dtype=np.uint8)
+    if not data.size:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    # NUMBER_CHARS 中只有空白小于 '+'
+    blank = data < ord('+')
+    # 每一个单词的第一个字符：自身不是空白，并且前一个字符是空白或者位于开头
+    starts = np.flatnonzero(blank[:-1] > blank[1:]) + 1
+    if not blank[0]:
+        starts = np.insert(starts, 0, 0)
+    ends = np.flatnonzero(data == ord('\n'))
+    if data[-1] != ord('\n'):
+        ends = np.append(ends, data.size)
+    return starts, ends
+
+
+def _rows_complete(starts, ends, n_columns):
+    """
+    检查每一行的单词个数都为 n_columns (空行除外)
 
+    Args:
+        starts(ndarray): 单词的起始位置，见 _token_layout()
+        ends(ndarray): 每一行的结束位置，见 _token_layout()
+        n_columns(int): 列数
 
-def select_file():
-    """通过命令行或者 GUI 界面选择一个文件，这个文件必须是 toml 文件，并且满足程序所指定的 toml 文件内容
+    Returns:
+        bool: 每一个非空行都恰好有 n_columns 个单词时为 True
+    """
+    if starts.size == ends.size * n_columns:
+        # 没有空行时不需要逐行计数：第 k 行的第一个单词在上一行结束之后，最后一个单词在这一行结束之前
+        first, last = starts[::n_columns], starts[n_columns - 1::n_columns]
+        return bool(np.all(first[1:] > ends[:-1]) and np.all(last < ends))
+    counts = np.diff(np.searchsorted(starts, ends), prepend=0)
+    return bool(np.all((counts == 0) | (counts == n_columns)))
 
-    Notes:
-        1. 如果直接写入 toml 文件的绝对路径，则直接返回 toml_path
-        2. 如果输入 Enter 则弹出 GUI 界面选择 toml 文件
-        3. 如果输入 q 则退出整个程序
+
+def _parse_rows(raw, n_columns, dtype, file_path):
+    """
+    用 numpy 的 C 解析器将以空白分隔的文本解析为形状为 (行数, n_columns) 的数组
+
+    Args:
+        raw(bytes): 由完整的行组成的文本
+        n_columns(int): 列数
+        dtype: 数组的数据类型
+        file_path(str): 数据文件的路径，只用于错误信息
 
     Returns:
-        toml_path(str): 返回一个 toml 文件路径
+        data(ndarray): 形状为 (行数, n_columns) 的 numpy 数组
     """
-    # 创建文件对话框
-    dialog = wx.FileDialog(None, "Select toml file", style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST)
-    while True:
-        # 输入的文本
-        input_str = input("Input toml file path, for example E:\\Hello\\World.toml\n"
-                          "Hint: Press ENTER button directly can select file in a GUI window. "
-                          "If you want to exit the program, simply type the letter \"q\" and press Enter.\n")
-        # 如果输入为 "q"，则退出主程序
-        if input_str.lower() == "q":
-            print("The program has exited！")
-            exit()
-        # 对应与直接输入 Enter，如果输入 ENTER 则显示对话框，不会退出主程序
-        if not input_str:
-            # 弹出文件选择对话框
-            if dialog.ShowModal() == wx.ID_CANCEL:
-                # 如果没有选择文件，即选择取消，则打印提示信息，并回到 input_str 输入文本这里
-                print("Hint: You did not select a file.\n")
-                # 返回 None 表示未选择文件, 继续主循环
-                continue
-            input_path = dialog.GetPath()
-            try:
-                validate(input_path)
-            except (ValueError, FileNotFoundError) as e:
-                print(str(e))
-                # 继续主循环
-                continue
-            print("Hint: Selected toml file path:", input_path)
-            # 销毁对话框
-            dialog.Destroy()
-            # 返回 input_path
-            return input_path
-        # 对应直接填写文件路径
-        else:
-            # 对于直接输入了路径的情况，执行验证逻辑
-            try:
-                validate(input_str)
-            except (ValueError, FileNotFoundError) as e:
-                print(str(e))
-                # 继续主循环
-                continue
-            print("Hint: Selected toml file path:", input_str)
-            # 返回 input_str
-            return input_str
+    # numpy 在遇到无法解析的内容时只会发出 DeprecationWarning 并截断结果。这里不修改全局的警告过滤器
+    # (读取数据的线程池中会同时调用本函数)，而是先检查文本中的字符，再将解析得到的数值个数与文本中的单词个数比较，
+    # 数值个数不同说明解析在中途停止
+    if raw.translate(None, NUMBER_CHARS):
+        raise ValueError(f"Unable to parse data file: {file_path}")
+    # 逐行检查单词个数，否则各行长短不一的文件 (例如 "1 2\n3 4 5\n6\n") 会被错误地重新分组为 n_columns 列
+    starts, ends = _token_layout(raw)
+    if not _rows_complete(starts, ends, n_columns):
+        raise ValueError(f"Inconsistent number of columns in data file: {file_path}")
+    try:
+        values = np.fromstring(raw, dtype=dtype, sep=" ")
+    except (DeprecationWarning, ValueError):
+        raise ValueError(f"Unable to parse data file: {file_path}") from None
+    if values.size != starts.size:
+        raise ValueError(f"Unable to parse data file: {file_path}")
+    # 在最后一个单词中间截断时数值个数不变 (例如 4- 被解析为 4)，因此单独检查最后一个单词；
+    # 只切出文本末尾的一小段，避免复制整个文本
+    if values.size:
+        tail = raw[-64:].split()
+        tail = tail if len(tail) > 1 or len(raw) <= 64 else raw.split()
+        try:
+            float(tail[-1])
+        except ValueError:
+            raise ValueError(f"Unable to parse data file: {file_path}") from None
+
+    return values.reshape(-1, n_columns)
+
+
+def iter_multiwfn(file_path, dtype=np.float64, block_size=1 << 24):
+    """
+    按照固定大小的块依次读取 Multiwfn 输出的 txt 文件，每次只解析一个块，内存占用与文件大小无关
 
+    Notes:
+        每一个块在最后一个换行符处截断，剩余的不完整的行拼接到下一个块的开头，因此每一个块都由完整的行组成。
+        压缩文件同样按块解压，block_size 为解压之后的字节数
+
+    Args:
+        file_path(str): txt 文件的路径，也可以是压缩的 txt 文件
+        dtype: 解析得到的数组的数据类型，默认为 np.float64
+        block_size(int): 每次读取的字节数，默认为 16 MiB
 
-def draw_spectrum(config: SubConfig, spectrum_list):
+    Yields:
+        data(ndarray): 一个块中的数据，形状为 (行数, 列数) 的 numpy 数组
+    """
+    n_columns = 0
+    rest = b""
+    with open_data(file_path) as file:
+        while True:
+            chunk = file.read(block_size)
+            raw = rest + chunk
+            if chunk:
+                # 在最后一个换行符处截断，剩余部分留给下一个块
+                end = raw.rfind(b"\n") + 1
+                if end == 0:
+                    rest = raw
+                    continue
+                raw, rest = raw[:end], raw[end:]
+            if not n_columns:
+                # 第一行的数值个数即为列数
+                n_columns = len(raw.lstrip().split(b"\n", 1)[0].split())
+            if n_columns:
+                block = _parse_rows(raw, n_columns, dtype, file_path)
+                if len(block):
+                    yield block
+            if not chunk:
+                break
+    if not n_columns:
+        raise ValueError(f"Empty data file: {file_path}")
+
+
+def read_xlsx(file_path, dtype=np.float64):
     """
-    根据 SubConfig 对象和 Spectrum 对象组成的集合绘制多子图的图片
+    读取 Excel 文件的第一个表格，第一行为表头
 
     Args:
-        config(SubConfig): 一个 SubConfig 对象
-        spectrum_list(list[Spectrum...]): 一个由 Spectrum 对象组成的 list 集合
+        file_path(str): xlsx 文件的路径
+        dtype: 数组的数据类型，默认为 np.float64
+
+    Returns:
+        data(ndarray): 形状为 (行数, 列数) 的 numpy 数组
     """
-    # 设置全局属性
-    rc['font.family'] = config.font_family
-    rc['label.size'] = config.font_size[1]
-    rc['font.size'] = config.font_size[0]
-    rc['tick.width'] = 1.3
-    rc['meta.width'] = 1.3
-    rc['label.weight'] = 'bold'
-    rc['axes.labelpad'] = 8.0
-    rc['tick.labelweight'] = 'bold'
-    rc['ytick.major.size'] = 4.6
-    rc['ytick.minor.size'] = 2.5
-    rc['xtick.major.size'] = 4.6
-    rc['xtick.minor.size'] = 2.5
+    # 只有 xlsx 文件需要 pandas
+    import pandas as pd
 
-    # 创建子图和坐标轴
-    fig = pplt.figure(figsize=config.figure_size, dpi=300, span=config.is_span, share=config.is_share)
-    axs = fig.subplots(nrows=config.sup_layout[0], ncols=config.sup_layout[1])
-
-    for ax, spectrum in zip(axs, spectrum_list):
-        # 第一列作为 x 值，第二列作为 y 值
-        x = spectrum.plot_data.iloc[:, 0]
-        y = spectrum.plot_data.iloc[:, 1]
-        # 绘制单曲线图
-        ax.plot(x, y, color=spectrum.colors, linestyle=spectrum.line_style, label=spectrum.legend_text,
-                linewidth=1.3)
-
-        ax.format(
-            xlabel=spectrum.x_label, ylabel=spectrum.y_label,
-            xlim=(spectrum.x_limit[0], spectrum.x_limit[1]), ylim=(spectrum.y_limit[0], spectrum.y_limit[1]),
-            xminorlocator=(spectrum.x_limit[2] / 2), yminorlocator=(spectrum.y_limit[2] / 2)
-        )
+    return pd.read_excel(file_path, sheet_name=0).to_numpy(dtype=dtype)
 
-        # 如果开启显示图例，则执行下面的代码
-        if spectrum.is_legend:
-            # 显示图例
-            ax.legend(loc='best', ncols=1, fontweight='bold', fontsize=12.5, frame=False, bbox_to_anchor=(0.95, 0.96))
-        # 如果开启显示 Zero 轴，则执行下面的代码
-        if spectrum.is_zero:
-            # 显示 Zero 轴
-            ax.axhline(y=0, color='black', linewidth=1.25)
 
-    # 设置一个标志，根据 config 判断是否开启子图的序号
-    if config.is_serial:
-        serial_flag = "(a)"
-    else:
-        serial_flag = False
+def read_csv(file_path, dtype=np.float64):
+    """
+    读取以逗号分隔的 csv 文件，第一行不是数值时作为表头跳过
+
+    Notes:
+        将逗号替换为空格之后，与 Multiwfn 的 txt 文件一样交给 numpy 的 C 解析器一次性解析
+
+    Args:
+        file_path(str): csv 文件的路径，也可以是压缩的 csv 文件
+        dtype: 数组的数据类型，默认为 np.float64
+
+    Returns:
+        data(ndarray): 形状为 (行数, 列数) 的 numpy 数组
+    """
+    with open_data(file_path) as file:
+        raw = file.read()
 
-    axs.format(grid=False, abc=serial_flag, abcloc="ul")
+    first, _, rest = raw.lstrip().partition(b"\n")
+    try:
+        [float(value) for value in first.replace(b",", b" ").split()]
+    except ValueError:
+        # 第一行为表头
+        first, _, rest = rest.lstrip().partition(b"\n")
+    n_columns = len(first.replace(b",", b" ").split())
+    if n_columns == 0:
+        raise ValueError(f"Empty data file: {file_path}")
 
-    # 文件名初始值
-    save_name = f"figure.{config.save_format}"
-    i = 1
-    # 首先检查当前路径是否存在以 figure.save_type 为文件名的文件
-    while os.path.exists(save_name):
-        # 文件名已存在，添加数字后缀
-        save_name = f"figure{i}.{config.save_format}"
-        i += 1
-    # 保存图像，保存图像的名字为 figure + save_format
-    fig.savefig(save_name, dpi=300, bbox_inches="tight", pad_inches=0.2)
-    # 输出保存成功的信息
-    print("Saving successful!\n")
+    return _parse_rows((first + b"\n" + rest).replace(b",", b" "), n_columns, dtype, file_path)
 
 
-def main_view(input_file):
+def read_npy(file_path, dtype=np.float64):
     """
-    pySubplots 的主程序界面，这个界面是一个交互式的界面。用户可以输入指令自定义的绘制用户想要绘制的 subplots
+    以内存映射的方式读取 .npy 文件，不复制数据
+
+    Notes:
+        pysub convert 以列优先 (Fortran) 的顺序保存数组，此时每一列在文件中都是连续的，
+        Spectrum 中的 x 值和 y 值直接为内存映射的视图，只有绘图时访问到的部分才会被读取
 
     Args:
-        input_file(str): toml 文件路径
+        file_path(str): npy 文件的路径
+        dtype: 数组的数据类型，与文件中的类型不同时会复制并转换
 
     Returns:
-        None
+        data(ndarray): 形状为 (行数, 列数) 的 numpy 数组
     """
-    # 读取 toml 文件，根据 toml 文件得到 spectrum_list
-    spectrum_list = read_toml(input_file)
-    # 初始化一个 SubConfig 对象，之后的操作都是操作这个 SubConfig 对象
-    config = SubConfig(sub_num=len(spectrum_list))
+    data = np.load(file_path, mmap_mode='r')
+    if data.ndim != 2:
+        raise ValueError(f"Expected a 2-D array of shape (rows, columns) in {file_path}, got shape {data.shape}")
+    return data if data.dtype == dtype else data.astype(dtype)
 
-    while True:
-        print(" \"q\": Exit program gracefully\t \"r\": Load a new file")
-        print("********************************************************")
-        print("****************** Main function menu ******************")
-        print("********************************************************")
-        print(f"-4 Set figure layout of subplots, current: {config.sup_layout}")
-        print(f"-3 Showing the serial of subplots, current: {config.is_serial}")
-        print(f"-2 Set whether to share axis ticks , current: {config.is_span}")
-        print(f"-1 Set whether to share axis labels, current: {config.is_share}")
-        print("0 Save graphical file of the spectrum in current folder")
-        print(f"1 Set font family of the spectrum, current: {config.font_family}")
-        print(f"2 Set font size of the spectrum, current: {config.font_size}")
-        print(f"3 Set figure size of spectrum file, current: {config.figure_size}")
-        print(f"4 Set format of saving spectrum file, current: {config.save_format}")
-        print(f"5 Set dpi of saving spectrum, current: {config.save_dpi}")
 
-        # 接受用户的指令，并根据用户的指令
-        choice = input()
-        # 如果输入 0，则按照当前参数绘制 Spectrum，调用 draw_spectrum() 方法
-        if choice == "0":
-            draw_spectrum(config=config, spectrum_list=spectrum_list)
-            continue
+def read_npz(file_path, dtype=np.float64):
+    """
+    读取 .npz 文件中名为 data 的数组，没有 data 时读取第一个数组
+
+    Args:
+        file_path(str): npz 文件的路径
+        dtype: 数组的数据类型
+
+    Returns:
+        data(ndarray): 形状为 (行数, 列数) 的 numpy 数组
+    """
+    with np.load(file_path) as archive:
+        if not archive.files:
+            raise ValueError(f"Empty data file: {file_path}")
+        data = archive['data' if 'data' in archive.files else archive.files[0]]
+    if data.ndim != 2:
+        raise ValueError(f"Expected a 2-D array of shape (rows, columns) in {file_path}, got shape {data.shape}")
+    return data.astype(dtype, copy=False)
+
+
+def read_parquet(file_path, dtype=np.float64):
+    """
+    读取 parquet 文件中的所有列，需要安装 pyarrow
+
+    Args:
+        file_path(str): parquet 文件的路径
+        dtype: 数组的数据类型
+
+    Returns:
+        data(ndarray): 形状为 (行数, 列数) 的 numpy 数组
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading .parquet files requires pyarrow, install it with: pip install pyarrow") from None
+
+    table = pq.read_table(file_path, memory_map=True)
+    data = np.empty((table.num_rows, table.num_columns), dtype=dtype)
+    for index, column in enumerate(table.columns):
+        data[:, index] = column.to_numpy()
+    return data
+
+
+def read_hdf5(file_path, dtype=np.float64):
+    """
+    读取 HDF5 文件中名为 data 的数据集，没有 data 时读取第一个数据集，需要安装 h5py
+
+    Args:
+        file_path(str): h5 或者 hdf5 文件的路径
+        dtype: 数组的数据类型
+
+    Returns:
+        data(ndarray): 形状为 (行数, 列数) 的 numpy 数组
+    """
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("Reading HDF5 files requires h5py, install it with: pip install h5py") from None
+
+    with h5py.File(file_path, 'r') as file:
+        if 'data' in file:
+            dataset = file['data']
+        else:
+            datasets = [item for item in file.values() if isinstance(item, h5py.Dataset)]
+            if not datasets:
+                raise ValueError(f"No dataset found in {file_path}")
+            dataset = datasets[0]
+        if dataset.ndim != 2:
+            raise ValueError(f"Expected a 2-D dataset of shape (rows, columns) in {file_path}, "
+                             f"got shape {dataset.shape}")
+        data = np.empty(dataset.shape, dtype=dtype)
+        dataset.read_direct(data)
+    return data
+
+
+# 数据文件的后缀到读取函数的映射，每一个读取函数为 reader(file_path, dtype) -> ndarray
+READERS = {
+    '.txt': read_multiwfn,
+    '.xlsx': read_xlsx,
+    '.csv': read_csv,
+    '.npy': read_npy,
+    '.npz': read_npz,
+    '.parquet': read_parquet,
+    '.h5': read_hdf5,
+    '.hdf5': read_hdf5,
+}
+# 本身就以内存映射的方式读取的格式，不需要磁盘缓存
+MAPPED_SUFFIXES = {'.npy'}
+
+
+def read_path(file_path, dtype=np.float64, cache=None):
+    """
+    读取 toml 文件中 path 所指向的数据文件的内容，根据文件的后缀在 READERS 中选择读取函数，
+    txt 和 csv 文件可以用 gz、xz、bz2 或者 zst 压缩，例如 "IR.txt.gz"，读取时以流的方式解压
+
+    Args:
+        file_path: toml 文件中 path 所表示的路径
+        dtype: 数据的类型，默认为 np.float64，也可以为 np.float32 以节省内存
+        cache(SpectrumCache or MemoryCache): 磁盘缓存或者内存缓存，如果数据文件没有变化，则直接使用缓存中的数组，
+            默认为 None
+
+    Returns:
+        data(ndarray): 形状为 (行数, 列数) 的 numpy 数组
+
+    """
+    # 记录读取每一个数据文件的用时
+    with stage("read_path", path=str(file_path)):
+        suffix = data_suffix(file_path)
+        reader = READERS.get(suffix)
+        if reader is None:
+            # 文件格式不支持
+            raise ValueError("Unsupported file format.")
+        if suffix in MAPPED_SUFFIXES:
+            cache = None
+
+        # 如果开启了缓存，并且数据文件没有变化，直接使用缓存中的数组；
+        # 缓存的键由读取之前的大小和修改时间决定，读取的过程中文件被修改时不写入缓存
+        if cache is not None:
+            signature = file_signature(file_path)
+            cached = cache.load(file_path, dtype, signature)
+            if cached is not None:
+                return cached
+
+        # 例如 Multiwfn 输出的 txt 文件由 read_multiwfn 直接解析为数组
+        data = reader(file_path, dtype=dtype)
+
+        # 将解析得到的数组写入缓存，内存缓存返回共享的只读数组
+        if cache is not None:
+            data = cache.store(file_path, data, dtype, signature)
+
+        return data
+
+
+class DataLoadError(Exception):
+    """
+    读取 toml 文件中的数据文件失败时抛出的异常，会记录所有读取失败的文件
+
+    Attributes:
+        failures (list[tuple[str, Exception]]): 由读取失败的文件路径和对应异常组成的列表
+    """
+
+    def __init__(self, failures):
+        self.failures = failures
+        message = "\n".join(f"  {path}: {error}" for path, error in failures)
+        super().__init__(f"Error: Failed to load {len(failures)} data file(s):\n{message}\n")
+
+
+def load_data(data_sources, workers=1, executor="thread", dtype=np.float64, cache=None):
+    """
+    读取多个数据文件的内容，可以选择使用线程池或者进程池并发读取
+
+    Notes:
+        同一个路径只读取一次，返回的集合中对应的位置为同一个数组。
+        使用进程池时，worker 进程无法访问当前进程的 MemoryCache：先在当前进程中查找内存缓存，
+        只把没有命中的文件交给 worker，worker 只使用下一级缓存，读取的结果再写入内存缓存
+
+    Args:
+        data_sources(list[str]): 数据文件路径组成的集合
+        workers(int): 并发读取的 worker 数量，为 1 时依次读取
+        executor(str): 并发读取的方式，可以选择 "thread" 或者 "process"
+        dtype: 数据的类型，默认为 np.float64
+        cache(SpectrumCache or MemoryCache): 磁盘缓存或者内存缓存，默认为 None
+
+    Returns:
+        data_list(list[ndarray]): 与 data_sources 顺序一致的数组集合
+
+    Raises:
+        DataLoadError: 只要有一个文件读取失败，读取完所有文件之后抛出，并记录所有失败的文件
+    """
+    if executor not in ("thread", "process"):
+        raise ValueError("executor must be either 'thread' or 'process'")
+
+    # 同一个数据文件只读取一次，保持第一次出现的顺序
+    unique_sources = list(dict.fromkeys(data_sources))
+    loaded = {}
+    failures = []
+    if workers is None or workers > 1:
+        memory = cache if executor == "process" and isinstance(cache, MemoryCache) else None
+        pending = unique_sources
+        # 在交给 worker 之前记录每一个文件的大小和修改时间，worker 读取的过程中文件被修改时不写入内存缓存
+        signatures = {}
+        if memory is not None:
+            pending = []
+            for data_source in unique_sources:
+                try:
+                    signatures[data_source] = file_signature(data_source)
+                    data = memory.load(data_source, dtype, signatures[data_source])
+                except Exception as e:
+                    failures.append((data_source, e))
+                    continue
+                if data is None:
+                    pending.append(data_source)
+                else:
+                    loaded[data_source] = data
+        worker_cache = cache if memory is None else memory.backend
+
+        pool_class = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+        with pool_class(max_workers=workers) as pool:
+            # 先提交所有任务，再按照提交的顺序收集结果，保证与 toml 文件中的顺序一致
+            futures = [pool.submit(read_path, data_source, dtype, worker_cache) for data_source in pending]
+            for data_source, future in zip(pending, futures):
+                try:
+                    data = future.result()
+                    if memory is not None:
+                        data = memory.put(data_source, data, dtype, signatures[data_source])
+                    loaded[data_source] = data
+                except Exception as e:
+                    failures.append((data_source, e))
+    else:
+        for data_source in unique_sources:
+            try:
+                loaded[data_source] = read_path(data_source, dtype=dtype, cache=cache)
+            except Exception as e:
+                failures.append((data_source, e))
+
+    # 不在第一个错误处停止，而是一次性报告所有读取失败的文件
+    if failures:
+        raise DataLoadError(failures)
+
+    return [loaded[data_source] for data_source in data_sources]
+
+
+def resolve_source(path, folder):
+    """
+    得到 [[file]] 中 path 所指向的数据文件路径
+
+    Args:
+        path(str): [[file]] 中的 path，可以是绝对路径，也可以是相对于 toml 文件的路径
+        folder(str): toml 文件所在的文件夹
+
+    Returns:
+        str: 数据文件的路径
+    """
+    if os.path.isabs(path):
+        # 如果是绝对路径，则直接使用该路径
+        return path
+    # 如果是相对路径，则与当前文件夹拼接
+    return os.path.join(folder, path)
+
+
+def spectrum_from_block(block, plot_data=None, data_handle=None):
+    """
+    根据 toml 文件中的一个 [[file]] 表初始化一个 Spectrum 对象
+
+    Args:
+        block(dict): toml 文件中的一个 [[file]] 表
+        plot_data(ndarray): 绘图数据，默认为 None
+        data_handle(DataHandle): 延迟读取数据的句柄，默认为 None
+
+    Returns:
+        Spectrum: 一个 Spectrum 对象
+    """
+    # 解析 toml 文件中的其他参数
+    colors = block['colors']
+    styles = block['styles']
+    legend = block['legend']
+    xlim = block['xlim']
+    ylim = block['ylim']
+    x_label = block['xlabel']
+    y_label = block['ylabel']
+    is_zero = bool(block['iszero'])
+    is_legend = bool(block['islegend'])
+
+    # 初始化一个 spectrum 对象
+    return Spectrum(x_limit=xlim, y_limit=ylim, x_label=x_label, y_label=y_label, colors=colors,
+                    line_style=styles, legend_text=legend, is_zero=is_zero, is_legend=is_legend,
+                    plot_data=plot_data, data_handle=data_handle)
+
+
+def load_spectra(blocks, folder, workers=1, executor="thread", dtype=np.float64, cache=None, lazy=False,
+                 block_size=None):
+    """
+    根据 toml 文件中的多个 [[file]] 表得到 spectrum 组成的集合
+
+    Notes:
+        含有 broaden 表的 [[file]] 表所指向的数据文件为谱线数据 (第一列为位置，之后的每一列为一条曲线的强度)，
+        读取后按照 broaden 表的设置展宽为 xlim 范围内的曲线，见 pysub.broaden.Broadening
+
+    Args:
+        blocks(list[dict]): toml 文件中的 [[file]] 表组成的集合
+        folder(str): toml 文件所在的文件夹
+        workers, executor, dtype, cache, lazy, block_size: 与 read_toml() 的参数相同
+
+    Returns:
+        spectrum_list(list): 由 Spectrum 对象组成的 list 集合，顺序与 blocks 一致
+    """
+    # 先得到每一个 file 所指向的数据文件路径
+    data_sources = [resolve_source(block['path'], folder) for block in blocks]
+    # 在读取数据之前检查 broaden 表的设置
+    broadenings = [Broadening(**block['broaden']) if 'broaden' in block else None for block in blocks]
+    # 流式读取时同样延迟到绘图时才读取
+    lazy = lazy or block_size is not None
+    if lazy:
+        # 延迟读取时只检查数据文件是否存在以及格式是否支持，同样一次性报告所有有问题的文件
+        failures = []
+        for data_source in data_sources:
+            if not os.path.isfile(data_source):
+                failures.append((data_source, FileNotFoundError("File not found.")))
+            elif data_suffix(data_source) not in READERS:
+                failures.append((data_source, ValueError("Unsupported file format.")))
+        if failures:
+            raise DataLoadError(failures)
+        data_list = [None] * len(data_sources)
+    else:
+        # 通过内存缓存读取，引用同一个文件的 [[file]] 表共享同一个只读数组，
+        # 没有传入 MemoryCache 时使用只在这一次读取中有效的内存缓存 (按照路径、大小和修改时间寻址，不额外读取文件)
+        if not isinstance(cache, MemoryCache):
+            cache = MemoryCache(max_size=None, backend=cache)
+        # 根据 data_sources 得到数据，顺序与 toml 文件中的顺序一致
+        data_list = load_data(data_sources, workers=workers, executor=executor, dtype=dtype, cache=cache)
+
+    # 新建一个 list 用来存放 spectrum 对象
+    spectrum_list = []
+    for index, (block, data_source, broadening) in enumerate(zip(blocks, data_sources, broadenings)):
+        # 延迟读取时，为 spectrum 对象提供一个读取数据的句柄
+        data_handle = None
+        if lazy:
+            data_handle = DataHandle(data_source, dtype=dtype, cache=cache, block_size=block_size,
+                                     broadening=broadening, x_range=block['xlim'][:2])
+        elif broadening is not None:
+            # 谱线数据展宽为曲线，共享的谱线数组保持不变
+            data_list[index] = broadening.apply(data_list[index], block['xlim'][:2])
+        # 在 spectrum 追加每一个 spectrum 对象
+        spectrum_list.append(spectrum_from_block(block, plot_data=data_list[index], data_handle=data_handle))
+        # Spectrum 只保留需要的两列 (共享数组的两列为视图，否则为复制)，立即释放对原来数组的引用
+        data_list[index] = None
+
+    return spectrum_list
+
+
+def read_toml(toml_file, workers=1, executor="thread", dtype=np.float64, cache=None, lazy=False, block_size=None):
+    """
+    根据 toml 文件得到 spectrum 组成的集合
+
+    Args:
+        toml_file(str): toml 文件
+        workers(int): 读取数据文件时并发的 worker 数量，默认为 1，即依次读取
+        executor(str): 并发读取的方式，可以选择 "thread" 或者 "process"，默认为 "thread"
+        dtype: 数据的类型，默认为 np.float64，也可以为 np.float32 以节省内存
+        cache(SpectrumCache or MemoryCache): 磁盘缓存或者内存缓存，默认为 None，即不使用缓存；
+            不延迟读取时，同一个 toml 文件中引用同一个数据文件的 [[file]] 表共享同一个数组 (含有 broaden 表时共享的是谱线数组，
+            展宽得到的曲线各自独立)，传入 MemoryCache 时多个 toml 文件之间也共享；延迟读取 (lazy 或者 block_size) 时
+            每一个 [[file]] 表在绘图时各自读取，只有传入 MemoryCache 并且不是流式读取时才共享
+        lazy(bool): 是否延迟读取数据文件，开启时只检查数据文件是否存在，在第一次访问曲线的数据时才读取
+        block_size(int): 流式读取 txt 文件时每次读取的字节数，默认为 None，即一次性读取整个文件；
+            指定时隐含 lazy，绘图时边读取边截取和降采样，不使用磁盘缓存
+
+    Returns:
+        spectrum_list(list): 由 Spectrum 对象组成的 list 集合
+    """
+    # 根据 toml 文件得到 spectrum 对象
+    with open(toml_file, 'r', encoding='utf-8') as file, stage("read_toml", path=str(toml_file)):
+        spectrums = toml.load(file)
+
+    # 获取 toml 文件的当前文件夹
+    current_folder = os.path.dirname(os.path.abspath(toml_file))
+    return load_spectra(spectrums['file'], current_folder, workers=workers, executor=executor, dtype=dtype,
+                        cache=cache, lazy=lazy, block_size=block_size)
+
+
+def read_config(toml_file):
+    """
+    读取 toml 文件中的 [config] 表，得到 SubConfig 的关键字参数
+
+    Notes:
+        [config] 表中的键与 SubConfig 的属性名相同，例如 font_family、font_size、figure_size、sup_layout、
+        save_dpi、save_format、is_serial、is_share、is_span、is_decimate、is_parallel_save 和 page_size，
+        save_format 可以为多个格式组成的数组，没有 [config] 表时返回空的 dict
+
+    Args:
+        toml_file(str): toml 文件
+
+    Returns:
+        dict: SubConfig 的关键字参数
+    """
+    with open(toml_file, 'r', encoding='utf-8') as file:
+        return parse_config(toml.load(file).get('config', {}))
+
+
+def parse_config(table):
+    """
+    检查 [config] 表或者其他来源 (例如 JSON) 的设置，并转换为 SubConfig 的关键字参数
+
+    Args:
+        table(dict): 键为 SubConfig 属性名的 dict
+
+    Returns:
+        dict: SubConfig 的关键字参数
+
+    Raises:
+        ValueError: 包含不是 SubConfig 设置的键
+    """
+    options = dict(table)
+    unknown = set(options) - CONFIG_KEYS
+    if unknown:
+        raise ValueError(f"Unknown keys in [config] table: {', '.join(sorted(unknown))}")
+    # toml 中没有 tuple 类型，figure_size 需要转换为 tuple
+    if 'figure_size' in options:
+        options['figure_size'] = tuple(options['figure_size'])
+    # 只指定了一个格式时仍然为 str
+    if isinstance(options.get('save_format'), list) and len(options['save_format']) == 1:
+        options['save_format'] = options['save_format'][0]
+    return options
+
+
+def validate(file):
+    """
+    判断输入的文件是否为 toml 文件
+
+    Args:
+        file(str): toml 文件的路径
+    """
+    # 首先判断输入的是否为 toml 文件，如果不是，则抛出异常。并在屏幕上打印不支持该文件
+    if not file.endswith(".toml"):
+        raise ValueError("Error: Unsupported file format. Only TOML files are supported.\n")
+
+    # 判断输入的 toml 文件是否存在，如果不存在，则抛出异常。并在屏幕上打印未找到该文件
+    if not os.path.isfile(file):
+        raise FileNotFoundError("Error: File not found.\n")
+
+
+def welcome_view():
+    """显示程序的基本信息、配置信息以及版权信息。
+
+    Returns:
+        None
+    """
+    # 程序最后输出版本和基础信息
+    print(f"pySubplots -- A python script for plotting multiple subplots.")
+    print(f"Version: {__version__}, release date: {__release__}")
+    print(f"Developer: {__developer__}")
+    print(f"Address: {__address__}")
+    print(f"pySubplots home website: {__website__}\n")
+    # 获取当前日期和时间
+    now = datetime.now().strftime("%b-%d-%Y, %H:%M:%S")
+    # 程序结束后提示版权信息和问候语
+    print(f"(Copyright (c) 2023 Kimariyb. Currently timeline: {now})\n")
+
+
+def select_file():
+    """通过命令行或者 GUI 界面选择一个文件，这个文件必须是 toml 文件，并且满足程序所指定的 toml 文件内容
+
+    Notes:
+        1. 如果直接写入 toml 文件的绝对路径，则直接返回 toml_path
+        2. 如果输入 Enter 则弹出 GUI 界面选择 toml 文件
+        3. 如果输入 q 则退出整个程序
+
+    Returns:
+        toml_path(str): 返回一个 toml 文件路径
+    """
+    # 文件对话框只在需要时创建，直接输入路径时不需要 wxPython
+    dialog = None
+    while True:
+        # 输入的文本
+        input_str = input("Input toml file path, for example E:\\Hello\\World.toml\n"
+                          "Hint: Press ENTER button directly can select file in a GUI window. "
+                          "If you want to exit the program, simply type the letter \"q\" and press Enter.\n")
+        # 如果输入为 "q"，则退出主程序
+        if input_str.lower() == "q":
+            print("The program has exited！")
+            exit()
+        # 对应与直接输入 Enter，如果输入 ENTER 则显示对话框，不会退出主程序
+        if not input_str:
+            # 在第一次需要时导入 wxPython，如果还没有 wxPython 应用程序对象则创建一个
+            import wx
+            app = wx.GetApp() or wx.App()
+            if dialog is None:
+                # 创建文件对话框
+                dialog = wx.FileDialog(None, "Select toml file", style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST)
+            # 弹出文件选择对话框
+            if dialog.ShowModal() == wx.ID_CANCEL:
+                # 如果没有选择文件，即选择取消，则打印提示信息，并回到 input_str 输入文本这里
+                print("Hint: You did not select a file.\n")
+                # 返回 None 表示未选择文件, 继续主循环
+                continue
+            input_path = dialog.GetPath()
+            try:
+                validate(input_path)
+            except (ValueError, FileNotFoundError) as e:
+                print(str(e))
+                # 继续主循环
+                continue
+            print("Hint: Selected toml file path:", input_path)
+            # 销毁对话框
+            dialog.Destroy()
+            # 返回 input_path
+            return input_path
+        # 对应直接填写文件路径
+        else:
+            # 对于直接输入了路径的情况，执行验证逻辑
+            try:
+                validate(input_str)
+            except (ValueError, FileNotFoundError) as e:
+                print(str(e))
+                # 继续主循环
+                continue
+            print("Hint: Selected toml file path:", input_str)
+            # 如果创建过对话框，则销毁对话框
+            if dialog is not None:
+                dialog.Destroy()
+            # 返回 input_str
+            return input_str
+
+
+def _bisect(x, value, descending, right=False):
+    """
+    用 np.searchsorted 在有序的数组 x 中查找 value 的插入位置，x 可以为升序或者降序
+
+    Args:
+        x(ndarray): 有序的数组
+        value(float): 需要查找的值
+        descending(bool): x 是否为降序
+        right(bool): 与 x 中的元素相等时，是否返回右侧的位置
+
+    Returns:
+        int: 插入位置，对于降序数组，返回第一个小于 (right 为 True 时为小于等于) value 的位置
+    """
+    if descending:
+        # 在反转的视图 (升序) 中查找，大于 (或者大于等于) value 的元素都位于插入位置之前
+        return len(x) - int(np.searchsorted(x[::-1], value, side='left' if right else 'right'))
+    return int(np.searchsorted(x, value, side='right' if right else 'left'))
+
+
+def sort_order(x):
+    """
+    判断 x 的顺序，只扫描一次数组，不生成 np.diff 的中间数组
+
+    Args:
+        x(ndarray): 曲线的 x 值
+
+    Returns:
+        int: 1 为升序 (包括少于两个点的情况)，-1 为降序，0 为无序 (包括含有 NaN 的情况)
+    """
+    if len(x) < 2:
+        return 1
+    if x[0] > x[-1]:
+        return -1 if np.all(x[:-1] >= x[1:]) else 0
+    return 1 if np.all(x[:-1] <= x[1:]) else 0
+
+
+def clip_range(x, y, x_range, order=None):
+    """
+    截取 x 在 x_range 范围内的数据，两侧各多保留一个点，使曲线能够一直连接到坐标轴的边界
+
+    Notes:
+        x 需要是有序的，升序或者降序均可 (Multiwfn 输出的频率为降序)，范围的位置通过二分查找得到，
+        返回的是原数组的视图，不会复制数据。如果 x 不是有序的，则直接返回原数据。
+        判断顺序需要扫描整个数组，因此 Spectrum 在读取数据之后只判断一次 (Spectrum.x_order)，绘图时通过 order 传入。
+
+    Args:
+        x(ndarray): 曲线的 x 值
+        y(ndarray): 曲线的 y 值，也可以是形状为 (点数, 曲线数) 的数组，即共享 x 值的多条曲线
+        x_range(list): x 轴的范围，例如 [0, 4000]
+        order(int): x 的顺序，见 sort_order()，默认为 None，即在这里判断
+
+    Returns:
+        tuple(ndarray, ndarray): 截取后的 x 值和 y 值
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(x) < 2:
+        return x, y
+    # 只有有序的数据才能使用二分查找
+    if order is None:
+        order = sort_order(x)
+    if order == 0:
+        return x, y
+    descending = order < 0
+
+    lower, upper = min(x_range), max(x_range)
+    if descending:
+        # 降序时，先遇到较大的边界
+        start = _bisect(x, upper, descending=True)
+        stop = _bisect(x, lower, descending=True, right=True)
+    else:
+        start = _bisect(x, lower, descending=False)
+        stop = _bisect(x, upper, descending=False, right=True)
+    # 两侧各多保留一个点
+    start = max(start - 1, 0)
+    stop = min(stop + 1, len(x))
+
+    return x[start:stop], y[start:stop]
+
+
+def decimate(x, y, n_bins, x_range):
+    """
+    按照像素列对曲线降采样，每一个像素列只保留第一个点、最后一个点、最小值和最大值
+
+    Notes:
+        x_range 被均匀地划分为 n_bins 个像素列，范围左侧和右侧的点分别归为单独的一列。
+        由于每一列的极值和首尾的点都被保留，降采样后绘制的曲线与原曲线在像素上是一致的，峰不会被削平。
+        x 需要是有序的 (升序或者降序均可)，这样同一列的点是连续的。
+        共享 x 值的多条曲线保留每一条曲线所需要的点的并集，降采样后的曲线仍然共享 x 值。
+
+    Args:
+        x(ndarray): 曲线的 x 值
+        y(ndarray): 曲线的 y 值，也可以是形状为 (点数, 曲线数) 的数组
+        n_bins(int): 像素列的数量
+        x_range(list): x 轴的范围，例如 [0, 4000]
+
+    Returns:
+        tuple(ndarray, ndarray): 降采样后的 x 值和 y 值
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    # 点数不多时不需要降采样
+    if n_bins <= 0 or len(x) <= 4 * n_bins:
+        return x, y
+
+    lower, upper = min(x_range), max(x_range)
+    # 每一个点所在的像素列，范围以外的点分别归为 -1 列和 n_bins 列
+    bins = np.floor((x - lower) * (n_bins / (upper - lower)))
+    bins = np.clip(bins, -1, n_bins).astype(np.int64)
+    # 每一列的起始位置以及点数
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bins)) + 1))
+    counts = np.diff(np.append(starts, len(x)))
+    segment = np.repeat(np.arange(len(starts)), counts)
+
+    # 保留每一列的第一个点和最后一个点
+    keep = np.zeros(len(x), dtype=bool)
+    keep[starts] = True
+    keep[starts + counts - 1] = True
+    # 保留每一条曲线在每一列中第一次出现的最小值和最大值
+    for curve in (y.T if y.ndim == 2 else [y]):
+        for reduce in (np.minimum, np.maximum):
+            hits = np.flatnonzero(curve == np.repeat(reduce.reduceat(curve, starts), counts))
+            keep[hits[np.unique(segment[hits], return_index=True)[1]]] = True
+    keep = np.flatnonzero(keep)
+
+    return x[keep], y[keep]
+
+
+def stream_curve(file_path, x_range, n_bins=0, dtype=np.float64, block_size=1 << 24):
+    """
+    流式读取 Multiwfn 输出的 txt 文件，在读取的同时截取 x_range 范围内的数据并按照像素列降采样
+
+    Notes:
+        结果与 clip_range() 和 decimate() 相同：x 需要是有序的，范围两侧各多保留一个点，x 超出范围之后不再读取文件剩余的部分。
+        开启降采样时，保留的点数超过 4 * n_bins * (曲线数 + 1) 就再次降采样，因此峰值内存只与 block_size、n_bins 和曲线数有关，
+        与文件大小无关。第二列之后的每一列都是一条曲线。
+        如果 x 不是有序的，则与 clip_range() 一样不截取数据，此时退回到读取整个文件。
+
+    Args:
+        file_path(str): txt 文件的路径，也可以是压缩的 txt 文件
+        x_range(list): x 轴的范围，例如 [0, 4000]
+        n_bins(int): 降采样的像素列数量，默认为 0，即不降采样
+        dtype: 数据的类型，默认为 np.float64
+        block_size(int): 每次读取的字节数，默认为 16 MiB
+
+    Returns:
+        tuple(ndarray, ndarray): 需要绘制的 x 值以及所有曲线的 y 值，y 值的形状为 (点数, 曲线数)
+    """
+    lower, upper = min(x_range), max(x_range)
+    xs, ys = [], []
+    # 范围之前的最后一个点，如果下一个块从范围内开始，则它是左侧多保留的点
+    pending = None
+    # 上一个块的最后一个 x 值，用于检查整个文件是否有序
+    last = None
+
+    def keep(x, y):
+        nonlocal xs, ys
+        # 复制数据，不保留对整个块的引用
+        xs.append(x.copy())
+        ys.append(y.copy())
+        if n_bins > 0 and sum(map(len, xs)) > 4 * n_bins * (y.shape[1] + 1):
+            # 每一个像素列的首尾点和极值在再次降采样后保持不变
+            x, y = decimate(np.concatenate(xs), np.concatenate(ys), n_bins, x_range)
+            xs, ys = [x], [y]
+
+    blocks = iter_multiwfn(file_path, dtype=dtype, block_size=block_size)
+    try:
+        for block, descending in _directed_blocks(blocks):
+            x, y = block[:, 0], block[:, 1:]
+            # 检查与上一个块连接之后是否仍然有序
+            joined = x if last is None else np.concatenate(([last], x))
+            steps = np.diff(joined)
+            if not (np.all(steps <= 0) if descending else np.all(steps >= 0)):
+                break
+            last = x[-1]
+
+            # before 为范围之前的点数，inside 为范围之前以及范围之内的点数
+            if descending:
+                before = _bisect(x, upper, descending=True)
+                inside = _bisect(x, lower, descending=True, right=True)
+            else:
+                before = _bisect(x, lower, descending=False)
+                inside = _bisect(x, upper, descending=False, right=True)
+
+            if before == len(x):
+                # 整个块都在范围之前
+                pending = (x[-1:], y[-1:])
+                continue
+            if before == 0 and pending is not None:
+                keep(*pending)
+            pending = None
+            start = max(before - 1, 0)
+            stop = min(inside + 1, len(x))
+            if start < stop:
+                keep(x[start:stop], y[start:stop])
+            if inside < len(x):
+                # 已经超出范围，不需要读取剩余的部分
+                return _join_curve(xs, ys, n_bins, x_range)
+        else:
+            # 所有的点都在范围之前时，与 clip_range() 一样保留最后一个点
+            if pending is not None:
+                keep(*pending)
+            return _join_curve(xs, ys, n_bins, x_range)
+    finally:
+        blocks.close()
+
+    # x 不是有序的，读取整个文件
+    data = read_multiwfn(file_path, dtype=dtype)
+    return _join_curve([data[:, 0]], [data[:, 1:]], n_bins, x_range)
+
+
+def _directed_blocks(blocks):
+    """
+    为 iter_multiwfn() 得到的每一个块附上 x 的顺序，开头 x 值全部相同的块会与之后的块合并，直到能够判断顺序
+
+    Yields:
+        tuple(ndarray, bool): 一个块以及 x 是否为降序
+    """
+    held = None
+    descending = None
+    for block in blocks:
+        if descending is None:
+            if held is not None:
+                block = np.concatenate((held, block))
+            x = block[:, 0]
+            distinct = np.flatnonzero(x != x[0])
+            if len(distinct) == 0:
+                held = block
+                continue
+            descending = bool(x[distinct[0]] < x[0])
+        yield block, descending
+    if descending is None and held is not None:
+        # 所有的 x 值都相同，按照升序处理
+        yield held, False
+
+
+def _join_curve(xs, ys, n_bins, x_range):
+    """将 stream_curve() 保留的各段数据拼接起来，开启降采样时再降采样一次"""
+    x, y = np.concatenate(xs), np.concatenate(ys)
+    if n_bins > 0:
+        x, y = decimate(x, y, n_bins, x_range)
+    return x, y
+
+
+def set_rc(config: SubConfig):
+    """
+    根据 SubConfig 对象设置 proplot 的全局属性
+
+    Args:
+        config(SubConfig): 一个 SubConfig 对象
+    """
+    from proplot import rc
+
+    # 设置全局属性
+    rc['font.family'] = config.font_family
+    rc['label.size'] = config.font_size[1]
+    rc['font.size'] = config.font_size[0]
+    rc['tick.width'] = 1.3
+    rc['meta.width'] = 1.3
+    rc['label.weight'] = 'bold'
+    rc['axes.labelpad'] = 8.0
+    rc['tick.labelweight'] = 'bold'
+    rc['ytick.major.size'] = 4.6
+    rc['ytick.minor.size'] = 2.5
+    rc['xtick.major.size'] = 4.6
+    rc['xtick.minor.size'] = 2.5
+
+
+def prepare_curve(spectrum, config: SubConfig):
+    """
+    得到一个 Spectrum 对象需要绘制的所有曲线，只保留 x_limit 范围内的数据，开启降采样时对曲线降采样
+
+    Args:
+        spectrum(Spectrum): 一个 Spectrum 对象
+        config(SubConfig): 一个 SubConfig 对象
+
+    Returns:
+        tuple(ndarray, ndarray): 需要绘制的 x 值以及所有曲线的 y 值，y 值的形状为 (点数, 曲线数)
+    """
+    n_bins = config.panel_pixels() if config.is_decimate else 0
+    # 流式读取时，在读取的同时截取和降采样，不把整个文件读取到内存中
+    handle = spectrum.data_handle
+    if not spectrum.is_loaded and handle is not None and handle.is_streaming:
+        return handle.stream(spectrum.x_limit[:2], n_bins)
+
+    # 第一列作为 x 值，之后的每一列作为一条曲线的 y 值，直接使用 Spectrum 中连续的数组，不经过 pandas
+    x, y = spectrum.x, spectrum.ys
+    # 只保留 x_limit 范围内的数据，范围以外的数据不需要绘制
+    x, y = clip_range(x, y, spectrum.x_limit[:2], spectrum.x_order)
+    # 如果开启降采样，则按照子图的像素宽度对曲线降采样
+    if n_bins > 0:
+        x, y = decimate(x, y, n_bins, spectrum.x_limit[:2])
+    return x, y
+
+
+def curve_styles(spectrum, n_curves):
+    """
+    得到一个 Spectrum 对象中每一条曲线的颜色、线型以及图例文本
+
+    Notes:
+        colors 和 line_style 为 list 时依次对应每一条曲线，数量少于曲线数时循环使用，为 str 时所有曲线相同；
+        legend_text 为 list 时依次对应每一条曲线，之后的曲线没有图例，为 str 时只有第一条曲线有图例
+
+    Args:
+        spectrum(Spectrum): 一个 Spectrum 对象
+        n_curves(int): 曲线的数量
+
+    Returns:
+        tuple(list, list, list): 每一条曲线的颜色、线型以及图例文本，没有图例的曲线为 None
+    """
+    def cycle(value):
+        values = value if isinstance(value, list) else [value]
+        return [values[index % len(values)] for index in range(n_curves)]
+
+    legends = spectrum.legend_text if isinstance(spectrum.legend_text, list) else [spectrum.legend_text]
+    labels = [legends[index] if index < len(legends) else None for index in range(n_curves)]
+    return cycle(spectrum.colors), cycle(spectrum.line_style), labels
+
+
+def curve_segments(x, ys):
+    """
+    将共享 x 值的多条曲线转换为 LineCollection 所需要的线段数组，只分配一次内存
+
+    Args:
+        x(ndarray): 曲线的 x 值
+        ys(ndarray): 所有曲线的 y 值，形状为 (点数, 曲线数)
+
+    Returns:
+        segments(ndarray): 形状为 (曲线数, 点数, 2) 的数组
+    """
+    segments = np.empty((ys.shape[1], len(x), 2), dtype=np.result_type(x, ys))
+    segments[:, :, 0] = x
+    segments[:, :, 1] = ys.T
+    return segments
+
+
+def draw_curves(ax, x, ys, spectrum):
+    """
+    在一个子图中绘制一个 Spectrum 对象的所有曲线
+
+    Notes:
+        只有一条曲线时使用 ax.plot()，绘制结果与单曲线图相同；有多条曲线时，所有曲线合并为一个 LineCollection，
+        每一条曲线的颜色和线型由 curve_styles() 得到。无论曲线有多少条，子图中都只增加一个对象，
+        创建、布局和保存的开销不随曲线数增加。LineCollection 的每一条曲线不会单独出现在图例中，
+        因此为有图例文本的曲线创建不添加到子图中的 Line2D 作为图例的句柄。
+        曲线对象的 gid 为 CURVES_GID，set_curves() 通过它找到曲线。
+
+    Args:
+        ax(Axes): 子图
+        x(ndarray): 曲线的 x 值
+        ys(ndarray): 所有曲线的 y 值，形状为 (点数, 曲线数)
+        spectrum(Spectrum): 一个 Spectrum 对象，提供颜色、线型以及图例文本
+
+    Returns:
+        list[Line2D] or None: 图例的句柄，只有一条曲线时为 None，即由 ax.legend() 自动得到
+    """
+    colors, styles, labels = curve_styles(spectrum, ys.shape[1])
+    if ys.shape[1] == 1:
+        ax.plot(x, ys[:, 0], color=colors[0], linestyle=styles[0], label=labels[0], linewidth=1.3, gid=CURVES_GID)
+        return None
+
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+
+    ax.add_collection(LineCollection(curve_segments(x, ys), colors=colors, linestyles=styles, linewidths=1.3,
+                                     gid=CURVES_GID))
+    # 与 ax.plot() 一样根据曲线更新坐标轴的范围，之后的 ax.format() 再设置为 x_limit 和 y_limit
+    ax.autoscale_view()
+    return [Line2D([], [], color=color, linestyle=style, linewidth=1.3, label=label)
+            for color, style, label in zip(colors, styles, labels) if label is not None]
+
+
+def set_curves(ax, x, ys):
+    """
+    替换子图中由 draw_curves() 绘制的曲线的数据，不需要重新绘制整个图像
+
+    Args:
+        ax(Axes): 子图
+        x(ndarray): 新的 x 值
+        ys(ndarray): 所有曲线新的 y 值，形状为 (点数, 曲线数)
+
+    Returns:
+        bool: 是否替换成功，曲线的数量发生变化时为 False，此时需要重新绘制
+    """
+    from matplotlib.collections import LineCollection
+
+    artist = next((item for item in [*ax.lines, *ax.collections] if item.get_gid() == CURVES_GID), None)
+    if isinstance(artist, LineCollection):
+        if len(artist.get_segments()) != ys.shape[1]:
+            return False
+        artist.set_segments(curve_segments(x, ys))
+        return True
+    if artist is None or ys.shape[1] != 1:
+        return False
+    artist.set_data(x, ys[:, 0])
+    return True
+
+
+def serial_flag(config: SubConfig):
+    """
+    根据 config 判断是否开启子图的序号
+
+    Returns:
+        str or bool: 开启时为 "(a)"，否则为 False
+    """
+    return "(a)" if config.is_serial else False
+
+
+def build_figure(config: SubConfig, spectrum_list, release=False):
+    """
+    根据 SubConfig 对象和 Spectrum 对象组成的集合创建多子图的图像，但是不保存
+
+    Args:
+        config(SubConfig): 一个 SubConfig 对象
+        spectrum_list(list[Spectrum...]): 一个由 Spectrum 对象组成的 list 集合
+        release(bool): 是否在绘制完每一个子图后释放延迟读取的数据，默认为 False
+
+    Returns:
+        tuple(Figure, SubplotGrid): 图像以及所有的子图
+    """
+    # 在需要绘图时才导入 proplot，避免 --help、--version 等命令付出导入 proplot 的时间
+    import proplot as pplt
+
+    # 设置全局属性
+    set_rc(config)
+
+    # 创建子图和坐标轴
+    with stage("figure"):
+        fig = pplt.figure(figsize=config.figure_size, dpi=300, span=config.is_span, share=config.is_share)
+    with stage("subplots"):
+        axs = fig.subplots(nrows=config.sup_layout[0], ncols=config.sup_layout[1])
+
+    for panel, (ax, spectrum) in enumerate(zip(axs, spectrum_list)):
+        with stage("prepare_curve", panel=panel):
+            x, ys = prepare_curve(spectrum, config)
+        # 绘制子图中的所有曲线
+        with stage("plot", panel=panel):
+            handles = draw_curves(ax, x, ys, spectrum)
+
+        with stage("format", panel=panel):
+            ax.format(
+                xlabel=spectrum.x_label, ylabel=spectrum.y_label,
+                xlim=(spectrum.x_limit[0], spectrum.x_limit[1]), ylim=(spectrum.y_limit[0], spectrum.y_limit[1]),
+                xminorlocator=(spectrum.x_limit[2] / 2), yminorlocator=(spectrum.y_limit[2] / 2)
+            )
+
+        # 如果开启显示图例，则执行下面的代码
+        if spectrum.is_legend:
+            # 显示图例
+            with stage("legend", panel=panel):
+                ax.legend(handles=handles, loc='best', ncols=1, fontweight='bold', fontsize=12.5, frame=False,
+                          bbox_to_anchor=(0.95, 0.96))
+        # 如果开启显示 Zero 轴，则执行下面的代码
+        if spectrum.is_zero:
+            # 显示 Zero 轴
+            ax.axhline(y=0, color='black', linewidth=1.25)
+        # 如果开启释放数据，则释放延迟读取的数据，下一次绘制时重新读取
+        if release:
+            spectrum.release()
+
+    with stage("format"):
+        axs.format(grid=False, abc=serial_flag(config), abcloc="ul")
+
+    return fig, axs
+
+
+def restyle_figure(fig, axs, config: SubConfig):
+    """
+    在已经创建好的图像上修改字体、字号以及子图的序号，不需要重新绘制曲线
+
+    Args:
+        fig(Figure): build_figure() 创建的图像
+        axs(SubplotGrid): build_figure() 创建的所有子图
+        config(SubConfig): 一个 SubConfig 对象
+    """
+    from matplotlib.text import Text
+
+    # 之后新创建的文本同样使用新的设置
+    set_rc(config)
+    # 修改所有文本的字体
+    for text in fig.findobj(Text):
+        text.set_fontfamily(config.font_family)
+    # 修改刻度标签以及坐标轴标签的字号
+    for ax in axs:
+        ax.tick_params(labelsize=config.font_size[0])
+        ax.xaxis.label.set_fontsize(config.font_size[1])
+        ax.yaxis.label.set_fontsize(config.font_size[1])
+    # 重新设置子图的序号
+    axs.format(abc=serial_flag(config), abcloc="ul",
+               rc_kw={'font.family': config.font_family, 'font.size': config.font_size[0],
+                      'label.size': config.font_size[1]})
+
+
+def reserve_paths(formats, prefix="figure"):
+    """
+    在当前文件夹中为每一种格式占用一个未使用的文件名 {prefix}.{format}、{prefix}1.{format}、{prefix}2.{format} ...
+
+    Args:
+        formats(list[str]): 保存图片的所有格式，所有格式使用相同的文件名
+        prefix(str): 文件名的前缀，默认为 figure
+
+    Returns:
+        list[str]: 与 formats 顺序一致的保存路径，对应的空文件已经创建
+    """
+    return reserve_stem(formats, lambda stem: [f"{stem}.{fmt}" for fmt in formats], prefix)[1]
+
+
+def reserve_stem(formats, names, prefix="figure"):
+    """
+    在当前文件夹中占用一个未使用的文件名 {prefix}、{prefix}1、{prefix}2 ...，names(stem) 给出的所有文件都被占用
+
+    Notes:
+        只扫描一次文件夹，从已有的最大序号之后开始，而不是逐个检查文件是否存在；分页保存的文件 {prefix}N_{页码}.{format}
+        同样计入已有的序号。文件名以 O_EXCL 方式创建空文件来占用，多个线程或者进程同时保存时不会得到相同的文件名
+
+    Args:
+        formats(list[str]): 保存图片的所有格式
+        names(callable): 由文件名 (不含扩展名) 得到需要占用的所有文件
+        prefix(str): 文件名的前缀，默认为 figure
+
+    Returns:
+        tuple(str, list[str]): 文件名 (不含扩展名) 以及 names(stem) 给出的保存路径，对应的空文件已经创建
+    """
+    pattern = re.compile(rf"{re.escape(prefix)}(\d*)(?:_\d+)?\.({'|'.join(re.escape(fmt) for fmt in formats)})$")
+    index = 0
+    with os.scandir(".") as entries:
+        for entry in entries:
+            match = pattern.match(entry.name)
+            if match:
+                index = max(index, int(match.group(1) or 0) + 1)
+
+    while True:
+        stem = prefix if index == 0 else f"{prefix}{index}"
+        created = []
+        try:
+            for save_name in names(stem):
+                os.close(os.open(save_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+                created.append(save_name)
+            return stem, created
+        except FileExistsError:
+            # 其他进程刚刚占用了这个文件名，释放已经占用的文件，尝试下一个序号
+            for save_name in created:
+                os.remove(save_name)
+            index += 1
+
+
+def figure_paths(formats, save_path=None):
+    """
+    得到每一种格式的图片保存路径，所有格式使用相同的文件名
+
+    Args:
+        formats(list[str]): 保存图片的所有格式
+        save_path(str): 图片的保存路径，默认为 None，即在当前文件夹中调用 reserve_paths() 占用 figure.format
+            或者带数字后缀的文件名
+
+    Returns:
+        list[str]: 与 formats 顺序一致的保存路径
+    """
+    if save_path is not None:
+        # 只有一种格式时直接保存到该路径，有多种格式时将扩展名替换为各个格式
+        if len(formats) == 1:
+            return [save_path]
+        stem = os.path.splitext(save_path)[0]
+        return [f"{stem}.{fmt}" for fmt in formats]
+    return reserve_paths(formats)
+
+
+def release_paths(save_names):
+    """删除 reserve_paths() 占用之后没有写入内容的空文件，用于保存失败的情况"""
+    for save_name in save_names:
+        try:
+            if os.path.getsize(save_name) == 0:
+                os.remove(save_name)
+        except OSError:
+            continue
+
+
+@contextmanager
+def atomic_file(save_name):
+    """
+    以原子的方式写入文件：先写入同一个文件夹中的临时文件，成功后再重命名为 save_name
+
+    Notes:
+        其他进程 (例如网页服务或者文件同步) 不会读到只写了一部分的图片，写入失败时 save_name 保持不变
+
+    Args:
+        save_name(str): 文件的保存路径
+
+    Yields:
+        file: 以二进制方式打开的临时文件
+    """
+    temp_path = f"{save_name}.tmp{os.getpid()}-{threading.get_ident()}"
+    descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            yield file
+        os.replace(temp_path, save_name)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def savefig_options(config: SubConfig):
+    """保存图片时传递给 savefig 的关键字参数"""
+    return dict(dpi=config.save_dpi, bbox_inches="tight", pad_inches=0.2)
+
+
+def encode_raster(png_data, save_name, fmt, dpi):
+    """
+    将 Agg 渲染得到的 PNG 数据转换为其他位图格式并保存
+
+    Args:
+        png_data(bytes): PNG 格式的图片数据
+        save_name(str): 图片的保存路径
+        fmt(str): 图片的格式
+        dpi(float): 写入图片的 dpi
+    """
+    if fmt == "png":
+        with atomic_file(save_name) as file, stage("encode", format=fmt):
+            file.write(png_data)
+        return
+
+    # Pillow 是 matplotlib 的依赖，matplotlib 本身也通过 Pillow 保存 jpg、tiff 和 webp
+    from PIL import Image
+
+    with Image.open(io.BytesIO(png_data)) as image, atomic_file(save_name) as file, stage("encode", format=fmt):
+        if fmt in ("jpg", "jpeg"):
+            # JPEG 不支持透明通道。savefig 已经绘制了图像的背景色，剩下的透明像素 (背景色透明或者半透明时) 与 matplotlib
+            # 直接保存 jpg 时一样和白色混合，而不是直接丢弃透明通道 (透明像素的 RGB 值通常为黑色)
+            image = image.convert("RGBA")
+            flat = Image.new("RGB", image.size, (255, 255, 255))
+            flat.paste(image, mask=image)
+            image = flat
+        image.save(file, format=Image.registered_extensions()[f".{fmt}"], dpi=(dpi, dpi))
+
+
+def save_figure(fig, config: SubConfig, save_path=None):
+    """
+    按照 SubConfig 对象中的格式和 dpi 保存图像，save_format 为多个格式时同一个图像依次保存为每一种格式
+
+    Notes:
+        有两个及以上的位图格式时，只用 Agg 渲染一次，得到的 PNG 数据再转换为其他位图格式；
+        开启 is_parallel_save 时，位图格式在多个线程中并行编码。矢量格式 (pdf、svg 等) 依次调用 savefig 保存。
+        每一个文件都通过 atomic_file() 写入。
+
+    Args:
+        fig(Figure): 需要保存的图像
+        config(SubConfig): 一个 SubConfig 对象
+        save_path(str): 图片的保存路径，默认为 None，即在当前文件夹中保存为 figure.save_format，
+            如果文件已经存在，则添加数字后缀；有多种格式时，扩展名替换为各个格式
+
+    Returns:
+        save_names(list[str]): 与 config.save_formats() 顺序一致的保存路径
+    """
+    formats = config.save_formats()
+    save_names = figure_paths(formats, save_path)
+    try:
+        write_formats(fig, config, save_names, formats)
+    except BaseException:
+        if save_path is None:
+            release_paths(save_names)
+        raise
+    return save_names
+
+
+def write_formats(fig, config: SubConfig, save_names, formats):
+    """将同一个图像保存为每一种格式，见 save_figure()"""
+    savefig_kw = savefig_options(config)
+    raster = [(save_name, fmt) for save_name, fmt in zip(save_names, formats) if fmt in RASTER_FORMATS]
+    if len(raster) > 1:
+        # 所有位图格式共用同一次 Agg 渲染的结果
+        buffer = io.BytesIO()
+        with stage("savefig", format="png"):
+            fig.savefig(buffer, format="png", **savefig_kw)
+        png_data = buffer.getvalue()
+        if config.is_parallel_save:
+            with ThreadPoolExecutor(max_workers=len(raster)) as executor:
+                futures = [executor.submit(encode_raster, png_data, save_name, fmt, config.save_dpi)
+                           for save_name, fmt in raster]
+                for future in futures:
+                    future.result()
+        else:
+            for save_name, fmt in raster:
+                encode_raster(png_data, save_name, fmt, config.save_dpi)
+        raster_names = {save_name for save_name, _ in raster}
+    else:
+        raster_names = set()
+
+    for save_name, fmt in zip(save_names, formats):
+        if save_name not in raster_names:
+            with atomic_file(save_name) as file, stage("savefig", format=fmt):
+                fig.savefig(file, format=fmt, **savefig_kw)
+
+
+def paginate(config: SubConfig, spectrum_list):
+    """
+    按照 config.page_size 将 spectrum_list 分页，每一页根据自己的子图数量调用 auto_layout() 排版
+
+    Args:
+        config(SubConfig): 一个 SubConfig 对象
+        spectrum_list(list[Spectrum...]): 一个由 Spectrum 对象组成的 list 集合
+
+    Yields:
+        tuple(SubConfig, list[Spectrum...]): 每一页的 SubConfig 副本以及该页的 Spectrum 对象
+    """
+    for start in range(0, len(spectrum_list), config.page_size):
+        page = spectrum_list[start:start + config.page_size]
+        page_config = copy.copy(config)
+        page_config.sub_num = len(page)
+        page_config.sup_layout = page_config.auto_layout()
+        yield page_config, page
+
+
+def iter_pages(config: SubConfig, spectrum_list, release=False):
+    """
+    依次创建每一页的图像，使用者处理完一页之后，关闭这一页的图像再创建下一页
+
+    Yields:
+        tuple(int, SubConfig, Figure): 从 1 开始的页码、这一页的 SubConfig 副本以及这一页的图像
+    """
+    import proplot as pplt
+
+    for number, (page_config, page) in enumerate(paginate(config, spectrum_list), start=1):
+        fig, _ = build_figure(page_config, page, release=release)
+        try:
+            yield number, page_config, fig
+        finally:
+            pplt.close(fig)
+
+
+def draw_pages(config: SubConfig, spectrum_list, release=False, save_path=None):
+    """
+    分页绘制：每 page_size 个子图为一页，pdf 格式的所有页写入同一个多页 pdf 文件，其他格式每一页保存为一个带页码的文件
+
+    Notes:
+        每一页的图像保存之后立即关闭，再创建下一页，因此图像所占用的内存只与 page_size 有关，与子图的总数无关。
+        配合 release (--lazy) 使用时，每一页的数据同样在绘制之后释放。
+        其他格式的文件名为 "{文件名}_{页码}.{格式}"，例如 figure_01.png、figure_02.png，页码至少两位，超过 99 页时
+        与总页数的位数相同 (例如 figure_001.png)。
+
+    Args:
+        config(SubConfig): 一个 SubConfig 对象
+        spectrum_list(list[Spectrum...]): 一个由 Spectrum 对象组成的 list 集合
+        release(bool): 是否在绘制完每一个子图后释放延迟读取的数据，默认为 False
+        save_path(str): 图片的保存路径，默认为 None，即在当前文件夹中保存为 figure.save_format
+
+    Returns:
+        save_names(list[str]): 多页 pdf 文件以及每一页其他格式的图片的保存路径
+    """
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    formats = config.save_formats()
+    others = [fmt for fmt in formats if fmt != "pdf"]
+    # 页码至少两位，页数更多时与总页数的位数相同，使文件名按页码排序
+    pages = math.ceil(len(spectrum_list) / config.page_size)
+    width = max(2, len(str(pages)))
+
+    def page_names(stem):
+        """多页 pdf 文件以及每一页其他格式的图片，即实际写入的所有文件"""
+        names = [f"{stem}.pdf"] if "pdf" in formats else []
+        return names + [f"{stem}_{number:0{width}d}.{fmt}" for number in range(1, pages + 1) for fmt in others]
+
+    if save_path is None:
+        # 占用实际写入的每一个文件名，之后运行时不会覆盖这一次保存的某一页
+        stem, reserved = reserve_stem(formats, page_names)
+    else:
+        stem, reserved = os.path.splitext(save_path)[0], []
+
+    save_names = []
+    try:
+        with ExitStack() as stack:
+            pdf = None
+            if "pdf" in formats:
+                pdf = stack.enter_context(PdfPages(stack.enter_context(atomic_file(f"{stem}.pdf"))))
+            for number, page_config, fig in iter_pages(config, spectrum_list, release=release):
+                if pdf is not None:
+                    with stage("savefig", format="pdf", page=number):
+                        pdf.savefig(fig, **savefig_options(config))
+                if others:
+                    page_config.save_format = others
+                    save_names.extend(save_figure(fig, page_config, f"{stem}_{number:0{width}d}.{others[0]}"))
+        if pdf is not None:
+            save_names.insert(0, f"{stem}.pdf")
+    finally:
+        # 绘制失败时删除占用之后没有写入的文件
+        release_paths(reserved)
+
+    return save_names
+
+
+def render_to_buffer(config: SubConfig, spectrum_list, buffer=None, fmt=None, release=False):
+    """
+    将图片绘制到内存中 (或者任意可写的二进制文件对象)，不在磁盘上创建任何文件
+
+    Notes:
+        分页绘制 (子图数量超过 page_size) 时只支持 pdf 格式，所有页写入同一个多页 pdf
+
+    Args:
+        config(SubConfig): 一个 SubConfig 对象
+        spectrum_list(list[Spectrum...]): 一个由 Spectrum 对象组成的 list 集合
+        buffer(file): 可写的二进制文件对象，默认为 None，即新建一个 BytesIO
+        fmt(str): 图片的格式，默认为 None，即 config.save_formats() 的第一个格式
+        release(bool): 是否在绘制完每一个子图后释放延迟读取的数据，默认为 False
+
+    Returns:
+        buffer(file): 写入了图片的文件对象，新建的 BytesIO 已经回到开头
+    """
+    import proplot as pplt
+
+    fmt = (fmt or config.save_formats()[0]).strip().lstrip(".").lower()
+    created = buffer is None
+    if created:
+        buffer = io.BytesIO()
+
+    if config.is_paginated(len(spectrum_list)):
+        if fmt != "pdf":
+            raise ValueError(f"Paginated figures can only be rendered to memory as pdf, not {fmt}")
+        from matplotlib.backends.backend_pdf import PdfPages
+
+        with PdfPages(buffer) as pdf:
+            for number, _, fig in iter_pages(config, spectrum_list, release=release):
+                with stage("savefig", format="pdf", page=number):
+                    pdf.savefig(fig, **savefig_options(config))
+    else:
+        fig, _ = build_figure(config, spectrum_list, release=release)
+        try:
+            with stage("savefig", format=fmt):
+                fig.savefig(buffer, format=fmt, **savefig_options(config))
+        finally:
+            pplt.close(fig)
+
+    if created:
+        buffer.seek(0)
+    return buffer
+
+
+def render_bytes(config: SubConfig, spectrum_list, fmt=None, release=False):
+    """
+    将图片绘制为内存中的字节串，参数与 render_to_buffer() 相同
+
+    Examples:
+        data = render_bytes(SubConfig(sub_num=len(spectrum_list)), spectrum_list, fmt="png")
+
+    Returns:
+        bytes: 图片的内容
+    """
+    return render_to_buffer(config, spectrum_list, fmt=fmt, release=release).getvalue()
+
+
+def draw_spectrum(config: SubConfig, spectrum_list, release=False, save_path=None):
+    """
+    根据 SubConfig 对象和 Spectrum 对象组成的集合绘制多子图的图片，子图数量超过 page_size 时调用 draw_pages() 分页绘制
+
+    Args:
+        config(SubConfig): 一个 SubConfig 对象
+        spectrum_list(list[Spectrum...]): 一个由 Spectrum 对象组成的 list 集合
+        release(bool): 是否在绘制完每一个子图后释放延迟读取的数据，默认为 False
+        save_path(str): 图片的保存路径，默认为 None，即在当前文件夹中保存为 figure.save_format，
+            如果文件已经存在，则添加数字后缀；文件以原子的方式写入
+
+    Returns:
+        save_names(list[str]): 每一种格式的图片保存路径
+    """
+    import proplot as pplt
+
+    if config.is_paginated(len(spectrum_list)):
+        return draw_pages(config, spectrum_list, release=release, save_path=save_path)
+
+    fig, axs = build_figure(config, spectrum_list, release=release)
+    try:
+        save_names = save_figure(fig, config, save_path)
+    finally:
+        # 关闭图像，释放图像所占用的内存
+        pplt.close(fig)
+
+    return save_names
+
+
+class RenderSession:
+    """
+    交互式界面中保存已经创建好的图像，根据设置的变化决定只需要重新保存、重新设置样式还是重新绘制
+
+    Notes:
+        只修改保存格式或者 dpi 时 (EXPORT_KEYS) 直接重新保存；只修改字体、字号或者子图序号时 (STYLE_KEYS)
+        在已有的子图上修改样式；修改排版、图片大小等其他设置或者重新加载数据时重新绘制。
+
+    Attributes:
+        spectrum_list (list[Spectrum...]): 一个由 Spectrum 对象组成的 list 集合
+        release (bool): 绘制后是否释放延迟读取的数据
+        fig (Figure): 已经创建好的图像，还没有绘制时为 None
+        axs (SubplotGrid): 已经创建好的所有子图
+    """
+    # 只影响保存的设置
+    EXPORT_KEYS = {'save_format', 'save_dpi', 'is_parallel_save'}
+    # 只影响样式的设置
+    STYLE_KEYS = {'font_family', 'font_size', 'is_serial'}
+
+    def __init__(self, spectrum_list, release=False):
+        self.spectrum_list = spectrum_list
+        self.release = release
+        self.fig = None
+        self.axs = None
+        # 创建图像时 SubConfig 的各个属性
+        self._state = None
+        # 创建图像时所使用的 SubConfig 对象的副本
+        self._config = None
+
+    @staticmethod
+    def config_state(config: SubConfig):
+        """得到 SubConfig 对象各个属性的快照"""
+        return copy.deepcopy({key: getattr(config, key) for key in CONFIG_KEYS | {'sub_num'}})
+
+    def classify(self, config: SubConfig):
+        """
+        判断与上一次绘制相比，设置发生了哪一类变化
+
+        Args:
+            config(SubConfig): 一个 SubConfig 对象
+
+        Returns:
+            str: "build" 需要重新绘制，"style" 需要重新设置样式，"export" 只需要重新保存
+        """
+        if self.fig is None:
+            return "build"
+        state = self.config_state(config)
+        changed = {key for key in state if state[key] != self._state[key]}
+        if changed - self.EXPORT_KEYS - self.STYLE_KEYS:
+            return "build"
+        # 降采样的点数由 dpi 决定，开启降采样时修改 dpi 需要重新绘制
+        if config.is_decimate and 'save_dpi' in changed:
+            return "build"
+        if changed & self.STYLE_KEYS:
+            return "style"
+        return "export"
+
+    def render(self, config: SubConfig, save_path=None):
+        """
+        根据设置的变化，以尽可能小的代价保存图片
+
+        Args:
+            config(SubConfig): 一个 SubConfig 对象
+            save_path(str): 图片的保存路径，默认为 None
+
+        Returns:
+            save_names(list[str]): 每一种格式的图片保存路径
+        """
+        # 分页绘制时每一页绘制之后立即关闭，不保存图像
+        if config.is_paginated(len(self.spectrum_list)):
+            self.close()
+            return draw_pages(config, self.spectrum_list, release=self.release, save_path=save_path)
+        change = self.classify(config)
+        if change == "build":
+            self.close()
+            self.fig, self.axs = build_figure(config, self.spectrum_list, release=self.release)
+            self._config = copy.deepcopy(config)
+        elif change == "style":
+            restyle_figure(self.fig, self.axs, config)
+        self._state = self.config_state(config)
+        return save_figure(self.fig, config, save_path)
+
+    def update_spectrum(self, index, spectrum):
+        """
+        只有一个子图的数据发生变化时，替换该子图的 Spectrum 对象，并直接修改已有曲线的数据，不需要重新绘制整个图像
+
+        Notes:
+            该子图在 toml 文件中的其他设置 (颜色、范围、图例等) 必须没有变化，否则应该调用 reset()
+
+        Args:
+            index(int): 子图的序号
+            spectrum(Spectrum): 新的 Spectrum 对象
+        """
+        self.spectrum_list[index] = spectrum
+        if self.fig is None:
+            return
+        x, ys = prepare_curve(spectrum, self._config)
+        if self.release:
+            spectrum.release()
+        if not set_curves(self.axs[index], x, ys):
+            # 曲线的数量发生了变化，下一次保存时重新绘制
+            self.close()
+
+    def reset(self, spectrum_list):
+        """
+        数据发生变化时，替换 spectrum_list，下一次保存时重新绘制
+
+        Args:
+            spectrum_list(list[Spectrum...]): 新的 Spectrum 对象组成的 list 集合
+        """
+        self.close()
+        self.spectrum_list = spectrum_list
+
+    def close(self):
+        """关闭已经创建的图像，释放内存"""
+        if self.fig is not None:
+            import proplot as pplt
+
+            pplt.close(self.fig)
+        self.fig = None
+        self.axs = None
+        self._state = None
+        self._config = None
+
+
+def main_view(input_file, **kwargs):
+    """
+    pySubplots 的主程序界面，这个界面是一个交互式的界面。用户可以输入指令自定义的绘制用户想要绘制的 subplots
+
+    Args:
+        input_file(str): toml 文件路径
+        **kwargs: 传递给 read_toml() 的关键字参数，例如 workers、executor 和 dtype
+
+    Returns:
+        None
+    """
+    # 读取 toml 文件，根据 toml 文件得到 spectrum_list
+    spectrum_list = read_toml(input_file, **kwargs)
+    # 初始化一个 SubConfig 对象，之后的操作都是操作这个 SubConfig 对象
+    config = SubConfig(sub_num=len(spectrum_list))
+    # 保存已经创建好的图像，再次保存时只在必要时重新绘制；延迟读取时，绘制完成后释放数据，修改设置时不占用内存
+    session = RenderSession(spectrum_list, release=kwargs.get('lazy', False))
+
+    while True:
+        print(" \"q\": Exit program gracefully\t \"r\": Load a new file")
+        print("********************************************************")
+        print("****************** Main function menu ******************")
+        print("********************************************************")
+        print(f"-4 Set figure layout of subplots, current: {config.sup_layout}")
+        print(f"-3 Showing the serial of subplots, current: {config.is_serial}")
+        print(f"-2 Set whether to share axis ticks , current: {config.is_span}")
+        print(f"-1 Set whether to share axis labels, current: {config.is_share}")
+        print("0 Save graphical file of the spectrum in current folder")
+        print(f"1 Set font family of the spectrum, current: {config.font_family}")
+        print(f"2 Set font size of the spectrum, current: {config.font_size}")
+        print(f"3 Set figure size of spectrum file, current: {config.figure_size}")
+        print(f"4 Set format of saving spectrum file, current: {','.join(config.save_formats())}")
+        print(f"5 Set dpi of saving spectrum, current: {config.save_dpi}")
+        print(f"6 Set whether to decimate curves, current: {config.is_decimate}")
+        print(f"7 Set number of subplots per page, current: {config.page_size or 'all in one figure'}")
+
+        # 接受用户的指令，并根据用户的指令
+        choice = input()
+        # 如果输入 0，则按照当前参数保存 Spectrum，只有排版或者数据变化时才重新绘制
+        if choice == "0":
+            session.render(config)
+            # 输出保存成功的信息
+            print("Saving successful!\n")
+            continue
         # 如果输入 1，调用 set_font_family() 修改字体
         elif choice == "1":
             config.set_font_family()
@@ -666,6 +2500,14 @@ def main_view(input_file):
         elif choice == "5":
             config.set_save_dpi()
             continue
+        # 如果输入 6，设置是否对曲线降采样
+        elif choice == "6":
+            config.toggle_decimate()
+            continue
+        # 如果输入 7，设置每一页的子图数量
+        elif choice == "7":
+            config.set_page_size()
+            continue
         # 如果输入 -1，设置是否启动共用坐标轴标签
         elif choice == "-1":
             config.toggle_share()
@@ -691,7 +2533,14 @@ def main_view(input_file):
         # 如果输入 r 则重新加载一个新的 toml 文件
         elif choice.lower() == "r":
             toml_file = select_file()
-            spectrum_list = read_toml(toml_file)
+            try:
+                spectrum_list = read_toml(toml_file, **kwargs)
+            except DataLoadError as e:
+                # 读取失败时保留原来的 spectrum_list，并打印所有读取失败的文件
+                print(str(e))
+                continue
+            # 数据发生变化，下一次保存时重新绘制
+            session.reset(spectrum_list)
             continue
         # 如果输入的内容不符合要求，提示按下空格重新选择。
         else:
@@ -700,14 +2549,136 @@ def main_view(input_file):
             input("Press Enter to continue...\n")
 
 
+def add_read_arguments(parser):
+    """
+    为 ArgumentParser 对象添加读取数据文件的参数
+
+    Args:
+        parser(ArgumentParser): ArgumentParser 对象
+    """
+    # 添加并发读取数据文件的参数
+    parser.add_argument('--workers', '-j', type=int, default=1,
+                        help='Number of workers used to load data files concurrently (default: 1)')
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                        help='Pool used for concurrent loading, thread or process (default: thread)')
+    # 添加使用单精度浮点数读取数据的参数
+    parser.add_argument('--float32', action='store_true',
+                        help='Load spectrum data as float32 to reduce memory usage')
+    # 添加延迟读取数据文件的参数
+    parser.add_argument('--lazy', action='store_true',
+                        help='Load data files only when drawing and release them afterwards')
+    # 添加流式读取数据文件的参数
+    parser.add_argument('--stream', nargs='?', type=float, const=16, default=None, metavar='MB',
+                        help='Stream txt files in blocks of MB megabytes while drawing, clipping and decimating '
+                             'on the fly, so memory does not grow with file size (default block: 16)')
+    # 添加磁盘缓存的参数
+    parser.add_argument('--cache', nargs='?', const=default_cache_dir(), default=None, metavar='DIR',
+                        help=f'Cache parsed data files in DIR (default: {default_cache_dir()})')
+    parser.add_argument('--cache-size', type=float, default=1024, metavar='MB',
+                        help='Maximum size of the cache in MB, least recently used entries are evicted '
+                             '(default: 1024)')
+    parser.add_argument('--cache-hash', action='store_true',
+                        help='Also key cache entries by a hash of the file contents; the in-memory cache of '
+                             'render and serve then parses identical files at different paths once')
+
+
+def read_options(args):
+    """
+    根据命令行参数得到传递给 read_toml() 的关键字参数
+
+    Args:
+        args(Namespace): 解析后的命令行参数
+
+    Returns:
+        dict: 传递给 read_toml() 的关键字参数
+    """
+    # 如果指定了 --cache，则使用磁盘缓存
+    cache = None
+    if args.cache is not None:
+        cache = SpectrumCache(args.cache, max_size=int(args.cache_size * 1024 * 1024), use_hash=args.cache_hash)
+    block_size = None if args.stream is None else max(int(args.stream * 1024 * 1024), 1)
+    return dict(workers=args.workers, executor=args.executor, dtype=np.float32 if args.float32 else np.float64,
+                cache=cache, lazy=args.lazy, block_size=block_size)
+
+
+def add_config_arguments(parser):
+    """
+    为 ArgumentParser 对象添加 SubConfig 的参数，没有指定的参数为 None，即使用 toml 文件或者 SubConfig 的默认值
+
+    Args:
+        parser(ArgumentParser): ArgumentParser 对象
+    """
+    group = parser.add_argument_group('figure settings')
+    group.add_argument('--font-family', dest='font_family', metavar='FAMILY', help='Font family, eg. Arial')
+    group.add_argument('--font-size', dest='font_size', type=float, nargs=2, metavar=('REGULAR', 'LABEL'),
+                       help='Regular and label font size, eg. 10.5 12')
+    group.add_argument('--figure-size', dest='figure_size', type=float, nargs=2, metavar=('WIDTH', 'HEIGHT'),
+                       help='Figure size in inches, eg. 10 10')
+    group.add_argument('--layout', dest='sup_layout', type=int, nargs=2, metavar=('ROWS', 'COLS'),
+                       help='Layout of subplots, eg. 2 2')
+    group.add_argument('--dpi', dest='save_dpi', type=float, metavar='DPI', help='Dpi of the saved figure, eg. 400')
+    group.add_argument('--format', dest='save_format', nargs='+', metavar='FORMAT',
+                       help='Format(s) of the saved figure, eg. png or png pdf svg')
+    group.add_argument('--page-size', dest='page_size', type=int, metavar='N',
+                       help='Draw N subplots per page, into one multi-page pdf or numbered files of other formats')
+    # 布尔类型的参数同时提供开启和关闭两个选项
+    for name, dest, text in [('serial', 'is_serial', 'the serial of subplots'),
+                             ('share', 'is_share', 'sharing axis labels'),
+                             ('span', 'is_span', 'sharing axis ticks'),
+                             ('decimate', 'is_decimate', 'decimation of the curves'),
+                             ('parallel-save', 'is_parallel_save', 'parallel encoding of raster formats')]:
+        group.add_argument(f'--{name}', dest=dest, action='store_const', const=True, help=f'Turn on {text}')
+        group.add_argument(f'--no-{name}', dest=dest, action='store_const', const=False, help=f'Turn off {text}')
+
+
+def config_options(args):
+    """
+    根据命令行参数得到 SubConfig 的关键字参数，只包含命令行中指定了的参数
+
+    Args:
+        args(Namespace): 解析后的命令行参数
+
+    Returns:
+        dict: SubConfig 的关键字参数
+    """
+    options = {}
+    for name in CONFIG_KEYS:
+        value = getattr(args, name, None)
+        if value is not None:
+            options[name] = value
+    if 'figure_size' in options:
+        options['figure_size'] = tuple(options['figure_size'])
+    # 只指定了一个格式时仍然为 str
+    if isinstance(options.get('save_format'), list) and len(options['save_format']) == 1:
+        options['save_format'] = options['save_format'][0]
+    return options
+
+
 def main():
+    # 使用 render 子命令时，以非交互的方式批量绘制
+    if len(sys.argv) > 1 and sys.argv[1] == 'render':
+        from pysub.batch import render_main
+        sys.exit(render_main(sys.argv[2:]))
+    # 使用 convert 子命令时，将数据文件转换为读取更快的格式
+    if len(sys.argv) > 1 and sys.argv[1] == 'convert':
+        from pysub.convert import convert_main
+        sys.exit(convert_main(sys.argv[2:]))
+    # 使用 serve 子命令时，启动常驻的绘制守护进程，submit 子命令向它提交绘制任务
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        from pysub.daemon import serve_main
+        sys.exit(serve_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'submit':
+        from pysub.daemon import submit_main
+        sys.exit(submit_main(sys.argv[2:]))
     # 命令行运行方式
     if len(sys.argv) > 1:
-        # 处理命令行参数
-        arg = sys.argv[1]
         # 创建 ArgumentParser 对象
         parser = argparse.ArgumentParser(prog='pysub', add_help=False,
-                                         description='pySubplots -- A python script for plotting multiple subplots.')
+                                         description='pySubplots -- A python script for plotting multiple subplots.',
+                                         epilog='Use "pysub render --help" to render toml files without prompting, '
+                                                '"pysub convert --help" to convert data files to a faster format, '
+                                                '"pysub serve --help" and "pysub submit --help" to render through '
+                                                'a long-lived daemon.')
         # 添加 -h 参数
         parser.add_argument('--help', '-h', action='help', help='Show this help message and exit')
         # 添加版权信息和参数
@@ -715,6 +2686,11 @@ def main():
                             version=__version__)
         # 添加输入文件参数
         parser.add_argument('input', type=str, help='toml file')
+        # 添加读取数据文件的参数
+        add_read_arguments(parser)
+        # 添加性能分析的参数
+        from pysub.profiler import add_profile_arguments, profile_from_args
+        add_profile_arguments(parser)
 
         # 解析参数
         args = parser.parse_args()
@@ -722,18 +2698,14 @@ def main():
         input_file = args.input
         # 展示开始界面
         welcome_view()
-        # 进入主程序
-        main_view(input_file=input_file)
+        # 进入主程序，指定了 --profile 或者 --cprofile 时，退出后写入性能分析的报告
+        with profile_from_args(args):
+            main_view(input_file=input_file, **read_options(args))
     # 否则就直接进入主程序
     else:
         # 展示开始界面
         welcome_view()
-        # 创建一个 wxPython 应用程序对象
-        app = wx.App()
-        # 选择需要解析的 toml 文件路径
+        # 选择需要解析的 toml 文件路径，需要时才会创建 wxPython 应用程序对象
         selected_file = select_file()
         # 进入主程序
         main_view(input_file=selected_file)
-
-
-
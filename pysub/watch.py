@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+watch.py
+Watch a toml file and its data files, and re-render the figure when they change.
+
+The toml file and every data file it references are polled with os.stat. After a change
+has settled for the debounce interval, only the [[file]] entries whose data file or toml
+block changed are reloaded. If only data changed, the curves of the existing figure are
+replaced in place; a changed block or [config] table falls back to RenderSession.
+
+This file is part of pySubplots.
+pySubplots is a python script for plotting multiple subplots.
+
+@author:
+Kimariyb (kimariyb@163.com)
+
+@license:
+Licensed under the MIT License.
+For details, see the LICENSE file.
+"""
+import os
+import time
+
+import toml
+
+from pysub.batch import output_path
+from pysub.subplots import RenderSession, SubConfig, load_spectra, read_config, resolve_source
+
+
+def snapshot(paths):
+    """
+    记录每一个文件的修改时间和大小
+
+    Args:
+        paths(list[str]): 文件路径组成的集合
+
+    Returns:
+        dict: 文件路径到 (修改时间, 大小) 的映射，文件不存在时为 None
+    """
+    stats = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stats[path] = None
+    return stats
+
+
+def wait_stable(paths, stats, debounce, interval):
+    """
+    等待文件在 debounce 秒内不再变化，避免在文件写入过程中重新加载
+
+    Args:
+        paths(list[str]): 文件路径组成的集合
+        stats(dict): 最近一次的 snapshot()
+        debounce(float): 文件需要保持不变的时间，单位为秒
+        interval(float): 轮询的间隔，单位为秒
+
+    Returns:
+        dict: 文件稳定之后的 snapshot()
+    """
+    stable_since = time.monotonic()
+    while time.monotonic() - stable_since < debounce:
+        time.sleep(min(interval, debounce))
+        current = snapshot(paths)
+        if current != stats:
+            stats = current
+            stable_since = time.monotonic()
+    return stats
+
+
+class TomlWatcher:
+    """
+    监视一个 toml 文件以及它所引用的所有数据文件，只重新加载发生变化的 Spectrum 对象
+
+    Attributes:
+        toml_file (str): toml 文件路径
+        out_dir (str): 保存图片的文件夹
+        overrides (dict): 覆盖 [config] 表的 SubConfig 关键字参数
+        read_kwargs (dict): 传递给 load_spectra() 的关键字参数
+        session (RenderSession): 保存已经创建好的图像
+    """
+
+    def __init__(self, toml_file, out_dir, overrides=None, **kwargs):
+        self.toml_file = toml_file
+        self.out_dir = out_dir
+        self.overrides = overrides or {}
+        self.read_kwargs = kwargs
+        self.folder = os.path.dirname(os.path.abspath(toml_file))
+        self.blocks = []
+        self.config = None
+        self.session = None
+
+    def sources(self):
+        """toml 文件中每一个 [[file]] 所指向的数据文件路径"""
+        return [resolve_source(block['path'], self.folder) for block in self.blocks]
+
+    def paths(self):
+        """需要监视的所有文件"""
+        return [self.toml_file] + sorted(set(self.sources()))
+
+    def read_blocks(self):
+        """读取 toml 文件中的 [[file]] 表以及 [config] 表"""
+        with open(self.toml_file, 'r', encoding='utf-8') as file:
+            blocks = toml.load(file)['file']
+        options = read_config(self.toml_file)
+        options.update(self.overrides)
+        return blocks, SubConfig(sub_num=len(blocks), **options)
+
+    def load(self):
+        """
+        第一次加载 toml 文件以及所有数据文件，并绘制图像
+
+        Returns:
+            save_names(list[str]): 每一种格式的图片保存路径
+        """
+        self.blocks, self.config = self.read_blocks()
+        spectrum_list = load_spectra(self.blocks, self.folder, **self.read_kwargs)
+        self.session = RenderSession(spectrum_list, release=self.read_kwargs.get('lazy', False))
+        return self.session.render(self.config, output_path(self.toml_file, self.out_dir, self.config))
+
+    def reload(self, old_stats, new_stats):
+        """
+        只重新加载发生变化的 Spectrum 对象，并重新绘制图像
+
+        Args:
+            old_stats(dict): 上一次的 snapshot()
+            new_stats(dict): 这一次的 snapshot()
+
+        Returns:
+            int: 重新加载的 Spectrum 对象的数量
+        """
+        changed_files = {path for path in new_stats if new_stats[path] != old_stats.get(path)}
+        blocks, config = self.blocks, self.config
+        if self.toml_file in changed_files:
+            blocks, config = self.read_blocks()
+
+        if len(blocks) != len(self.blocks):
+            # 子图的数量发生变化，重新加载所有的数据
+            spectrum_list = load_spectra(blocks, self.folder, **self.read_kwargs)
+            self.session.reset(spectrum_list)
+            reloaded = list(range(len(blocks)))
+        else:
+            # 只重新加载 [[file]] 表或者数据文件发生变化的子图
+            restyled = [index for index, (old, new) in enumerate(zip(self.blocks, blocks)) if old != new]
+            sources = [resolve_source(block['path'], self.folder) for block in blocks]
+            data_only = [index for index, source in enumerate(sources)
+                         if source in changed_files and index not in restyled]
+            reloaded = restyled + data_only
+            spectra = load_spectra([blocks[index] for index in reloaded], self.folder, **self.read_kwargs)
+            spectrum_list = list(self.session.spectrum_list)
+            for index, spectrum in zip(reloaded, spectra):
+                spectrum_list[index] = spectrum
+            if restyled:
+                # [[file]] 表中的设置发生变化，需要重新绘制
+                self.session.reset(spectrum_list)
+            else:
+                # 只有数据发生变化，直接替换已有曲线的数据
+                for index in data_only:
+                    self.session.update_spectrum(index, spectrum_list[index])
+
+        self.blocks, self.config = blocks, config
+        self.session.render(self.config, output_path(self.toml_file, self.out_dir, self.config))
+        return len(reloaded)
+
+    def run(self, interval=0.5, debounce=0.3):
+        """
+        持续监视文件，发生变化时自动重新绘制，按下 Ctrl+C 退出
+
+        Args:
+            interval(float): 轮询的间隔，单位为秒
+            debounce(float): 文件需要保持不变的时间，单位为秒
+        """
+        start = time.perf_counter()
+        save_names = self.load()
+        print(f"Rendered: {self.toml_file} -> {', '.join(save_names)} ({time.perf_counter() - start:.2f} s)")
+        print(f"Watching {len(self.paths())} files, press Ctrl+C to stop.")
+        stats = snapshot(self.paths())
+        # 重新加载失败时的 snapshot：文件没有再次变化时不重复尝试
+        failed = None
+        try:
+            while True:
+                time.sleep(interval)
+                current = snapshot(self.paths())
+                if current == stats or current == failed:
+                    continue
+                current = wait_stable(self.paths(), current, debounce, interval)
+                start = time.perf_counter()
+                try:
+                    reloaded = self.reload(stats, current)
+                except Exception as e:
+                    # 保留上一次成功的状态以及 stats，文件再次变化时与上一次成功时的文件比较，重新尝试
+                    print(f"Failed to reload {self.toml_file}\n{type(e).__name__}: {e}")
+                    failed = current
+                else:
+                    print(f"Re-rendered: {self.toml_file}, {reloaded} spectra reloaded "
+                          f"({time.perf_counter() - start:.2f} s)")
+                    # 保留重新加载之前的 snapshot，绘制期间保存的修改在下一次轮询时仍然会被发现；
+                    # toml 文件可能引用了新的数据文件，只为新的文件记录状态
+                    paths = self.paths()
+                    stats = {**snapshot([path for path in paths if path not in current]),
+                             **{path: current[path] for path in paths if path in current}}
+                    failed = None
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+        finally:
+            self.session.close()
@@ -13,6 +13,12 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url='https://github.com/kimariyb/py-subplots',
     packages=setuptools.find_packages(),
+    # 读取 parquet 和 HDF5 文件所需要的可选依赖
+    extras_require={
+        'parquet': ['pyarrow'],
+        'hdf5': ['h5py'],
+        'zstd': ['zstandard'],
+    },
     entry_points={
         'console_scripts': [
             'subplots=pysub.subplots:main',